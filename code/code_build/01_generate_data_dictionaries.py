@@ -0,0 +1,163 @@
+import os
+import sys
+import struct
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+# Data dictionaries for the four master panels without loading them.
+# 01_generate_data_dictionaries.do runs use + describe, replace on every
+# panel, reading gigabytes of data for a few hundred rows of metadata. A
+# .dta file (format 117 / 118 / 119, Stata 13 and later) opens with a header
+# (release, byte order, K variables, N rows, data label, timestamp) and a
+# map of byte offsets to each section, so the variable table (types, names,
+# formats, value-label names, variable labels) and the value labels at the
+# end of the file are read by seeking straight to them; the data section is
+# never touched. All files are read at the same time.
+#
+# Per panel, in $projRoot/output/data_dictionaries:
+#   <file>_dictionary.csv     Variable_Name, Data_Type, Stata_Format, Variable_Label (as the .do exports it)
+#   <file>_value_labels.csv   Label_Name, Value, Value_Label, Variables (the variables that use the label)
+# plus data_dictionaries_summary.csv: one row per panel with release, rows, variables and label sets.
+#
+#   python 01_generate_data_dictionaries.py                 -> the four master panels
+#   python 01_generate_data_dictionaries.py a.dta b.dta     -> any other .dta files (names or paths under dataRoot)
+
+DATA_ROOT = os.environ.get("NP_DATA_ROOT") or r"C:\Users\omarf\Dropbox\personal_files_omar_farrag\Research\general_cms_data\publishable_data"
+OUTPUT_ROOT = os.environ.get("NP_OUTPUT_ROOT") or r"C:\Users\omarf\Dropbox\personal_files_omar_farrag\Research\projects\NYS_npPolicy\output\summary_stats"
+DICT_ROOT = os.path.join(os.path.dirname(OUTPUT_ROOT.rstrip("\\/")), "data_dictionaries")
+
+MASTER_FILES = ["master_facility_inpatient_2013_2023", "master_facility_outpatient_asc_2015_2024",
+                "master_provider_inpatient_2013_2023", "master_provider_outpatient_asc_2015_2023"]
+
+# --- 1. .dta LAYOUT (117 / 118 / 119) ---
+# Field widths per release: K bytes, N bytes, data label length bytes, name, format, label widths (118+ hold UTF-8)
+RELEASES = {
+    117: {"k": 2, "n": 4, "label_len": 1, "name": 33, "format": 49, "varlab": 81, "encoding": "latin-1"},
+    118: {"k": 2, "n": 8, "label_len": 2, "name": 129, "format": 57, "varlab": 321, "encoding": "utf-8"},
+    119: {"k": 4, "n": 8, "label_len": 2, "name": 129, "format": 57, "varlab": 321, "encoding": "utf-8"},
+}
+# Type codes of <variable_types>: 1-2045 are str#
+TYPE_NAMES = {32768: "strL", 65526: "double", 65527: "float", 65528: "long", 65529: "int", 65530: "byte"}
+# <map> entries, in file order
+MAP_KEYS = ["stata_data", "map", "variable_types", "varnames", "sortlist", "formats", "value_label_names", "variable_labels",
+            "characteristics", "data", "strls", "value_labels", "stata_data_close", "eof"]
+
+
+def _expect(f, tag):
+    got = f.read(len(tag))
+    if got != tag:
+        raise ValueError(f"{f.name}: expected {tag!r} at byte {f.tell() - len(got)}, found {got!r}")
+
+
+def _text(raw, encoding):
+    return raw.split(b"\0", 1)[0].decode(encoding, errors="replace")
+
+
+def _fixed(f, count, width, encoding):
+    return [_text(f.read(width), encoding) for _ in range(count)]
+
+
+# --- 2. READ ONE FILE'S METADATA ---
+def read_header(f):
+    _expect(f, b"<stata_dta><header><release>")
+    release = int(f.read(3))
+    if release not in RELEASES:
+        raise ValueError(f"{f.name}: .dta release {release} not supported (117-119, Stata 13+)")
+    spec = RELEASES[release]
+    _expect(f, b"</release><byteorder>")
+    order = "<" if f.read(3) == b"LSF" else ">"
+    _expect(f, b"</byteorder><K>")
+    k = int.from_bytes(f.read(spec["k"]), "little" if order == "<" else "big")
+    _expect(f, b"</K><N>")
+    n = int.from_bytes(f.read(spec["n"]), "little" if order == "<" else "big")
+    _expect(f, b"</N><label>")
+    label = f.read(int.from_bytes(f.read(spec["label_len"]), "little" if order == "<" else "big"))
+    _expect(f, b"</label><timestamp>")
+    stamp = f.read(f.read(1)[0])
+    _expect(f, b"</timestamp></header><map>")
+    offsets = dict(zip(MAP_KEYS, struct.unpack(f"{order}14Q", f.read(14 * 8))))
+    return {"release": release, "order": order, "k": k, "n": n, "data_label": _text(label, spec["encoding"]),
+            "time_stamp": _text(stamp, spec["encoding"]).strip(), "offsets": offsets}
+
+
+def read_variables(f, head):
+    spec, k, at = RELEASES[head["release"]], head["k"], head["offsets"]
+    f.seek(at["variable_types"])
+    _expect(f, b"<variable_types>")
+    codes = struct.unpack(f"{head['order']}{k}H", f.read(2 * k))
+    sections = {}
+    for key, width in (("varnames", "name"), ("formats", "format"), ("value_label_names", "name"), ("variable_labels", "varlab")):
+        f.seek(at[key])
+        _expect(f, f"<{key}>".encode())
+        sections[key] = _fixed(f, k, spec[width], spec["encoding"])
+    return pd.DataFrame({
+        "Variable_Name": sections["varnames"],
+        "Data_Type": [f"str{c}" if c <= 2045 else TYPE_NAMES.get(c, str(c)) for c in codes],
+        "Stata_Format": sections["formats"],
+        "Variable_Label": sections["variable_labels"],
+        "Value_Label": sections["value_label_names"],
+    })
+
+
+def read_value_labels(f, head):
+    # <lbl> len, labname, 3 bytes padding, then n, txtlen, off[n], val[n], txt
+    spec, order = RELEASES[head["release"]], head["order"]
+    f.seek(head["offsets"]["value_labels"])
+    _expect(f, b"<value_labels>")
+    rows = []
+    while f.read(5) == b"<lbl>":
+        (length,) = struct.unpack(f"{order}i", f.read(4))
+        name = _text(f.read(spec["name"]), spec["encoding"])
+        f.read(3)
+        table = f.read(length)
+        count, txt_len = struct.unpack(f"{order}2i", table[:8])
+        offs = struct.unpack(f"{order}{count}i", table[8:8 + 4 * count])
+        vals = struct.unpack(f"{order}{count}i", table[8 + 4 * count:8 + 8 * count])
+        txt = table[8 + 8 * count:8 + 8 * count + txt_len]
+        rows += [(name, v, _text(txt[o:], spec["encoding"])) for v, o in zip(vals, offs)]
+        _expect(f, b"</lbl>")
+    return pd.DataFrame(rows, columns=["Label_Name", "Value", "Value_Label"])
+
+
+def dta_dictionary(path):
+    start = time.perf_counter()
+    with open(path, "rb") as f:
+        head = read_header(f)
+        variables = read_variables(f, head)
+        labels = read_value_labels(f, head)
+    users = variables[variables["Value_Label"] != ""].groupby("Value_Label", sort=False)["Variable_Name"].agg(" ".join)
+    labels["Variables"] = labels["Label_Name"].map(users).fillna("")
+    summary = {"File": os.path.splitext(os.path.basename(path))[0], "Release": head["release"], "Rows": head["n"],
+               "Variables": head["k"], "Value_Label_Sets": labels["Label_Name"].nunique(), "Data_Label": head["data_label"],
+               "Time_Stamp": head["time_stamp"], "File_MB": round(os.path.getsize(path) / 2 ** 20, 1), "Seconds": time.perf_counter() - start}
+    return variables, labels, summary
+
+
+# --- 3. WRITE ---
+def write_dictionary(path, out_dir):
+    variables, labels, summary = dta_dictionary(path)
+    stem = os.path.join(out_dir, summary["File"])
+    variables.drop(columns="Value_Label").to_csv(f"{stem}_dictionary.csv", index=False, lineterminator="\n")
+    labels.to_csv(f"{stem}_value_labels.csv", index=False, lineterminator="\n")
+    return summary
+
+
+def run_dictionaries(files, out_dir=None):
+    out_dir = out_dir or DICT_ROOT
+    os.makedirs(out_dir, exist_ok=True)
+    paths = [f if os.path.isabs(f) or os.path.exists(f) else os.path.join(DATA_ROOT, f if f.endswith(".dta") else f"{f}.dta") for f in files]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, len(paths))) as executor:
+        summaries = list(executor.map(lambda p: write_dictionary(p, out_dir), paths))
+    for s in summaries:
+        print(f"  > {s['File']}: {s['Variables']} variables, {s['Rows']:,} rows, {s['Value_Label_Sets']} value label sets "
+              f"({s['File_MB']} MB file, {s['Seconds']:.2f}s)")
+    pd.DataFrame(summaries).drop(columns="Seconds").to_csv(os.path.join(out_dir, "data_dictionaries_summary.csv"), index=False, lineterminator="\n")
+    print(f"=== {len(summaries)} data dictionaries in {time.perf_counter() - start:.2f}s -> {out_dir} ===")
+    return summaries
+
+
+if __name__ == "__main__":
+    run_dictionaries(sys.argv[1:] or MASTER_FILES)
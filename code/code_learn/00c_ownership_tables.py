@@ -1,25 +1,48 @@
 import pandas as pd
 import os
-import subprocess
+from tex_compile import TexCompilePool
+import run_profile
+from build_manifest import BuildManifest, MANIFEST_NAME, write_if_changed
 
 # =====================================================
 # PATHS
 # =====================================================
 
-out_root = r"C:\Users\omarf\Dropbox\personal_files_omar_farrag\Research\projects\NYS_npPolicy\output\summary_stats\in_patient\demographics"
+# NP_OUTPUT_ROOT points the script at another summary_stats tree (e.g. a synthetic benchmark tree)
+out_root = os.path.join(os.environ.get("NP_OUTPUT_ROOT") or r"C:\Users\omarf\Dropbox\personal_files_omar_farrag\Research\projects\NYS_npPolicy\output\summary_stats", "in_patient", "demographics")
 
 csv_dir = os.path.join(out_root, "tables_csv")
 tex_dir = os.path.join(out_root, "tables_pdf")
 
 os.makedirs(tex_dir, exist_ok=True)
 
+# Tables whose input CSVs and generator code are unchanged are not recompiled
+manifest = BuildManifest(os.path.join(out_root, MANIFEST_NAME), code_files=[__file__])
+
+# All tables are queued and compiled together at the end; batch mode builds
+# one document per preamble and splits it back into the per-table PDFs
+tex_batch = None  # True = single pdflatex run per preamble (or NP_TEX_BATCH=1)
+tex_keep_combined = False  # True = also keep the combined appendix PDF(s)
+tex_pool = TexCompilePool(tex_dir, batch=tex_batch, keep_combined=tex_keep_combined, combined_name="ownership_appendix", keep_tex=True)
+
+# Per-stage timing/memory report in out_root/run_reports when switched on
+profile_run = None  # True = write the report (or NP_PROFILE=1)
+run_profile.start(enabled=profile_run)
+
 print("=== GENERATING JOURNAL-QUALITY LATEX TABLES ===")
 
 # =====================================================
-# LATEX COMPILATION FUNCTION
+# LATEX COMPILATION FUNCTION (QUEUES INTO THE POOL)
 # =====================================================
 
-def compile_to_pdf(filename_base, table_content, landscape=False):
+def compile_to_pdf(filename_base, table_content, landscape=False, inputs=()):
+
+    inputs = [os.path.join(csv_dir, f) for f in inputs]
+    pdf_path = os.path.join(tex_dir, f"{filename_base}.pdf")
+
+    if manifest.is_fresh(filename_base, inputs, [pdf_path]):
+        print(f" -> Up to date, skipped: {filename_base}.pdf")
+        return
 
     orientation = ""
     if landscape:
@@ -46,28 +69,11 @@ def compile_to_pdf(filename_base, table_content, landscape=False):
 
     tex_path = os.path.join(tex_dir, f"{filename_base}.tex")
 
-    with open(tex_path, "w", encoding="utf-8") as f:
-        f.write(doc)
-
-    try:
-        subprocess.run(
-            [
-                "pdflatex",
-                "-interaction=nonstopmode",
-                "-output-directory",
-                tex_dir,
-                tex_path
-            ],
-            check=True,
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL
-        )
-
-        print(f" -> Successfully compiled: {filename_base}.pdf")
+    with run_profile.stage("latex", filename_base, outputs=[tex_path]):
+        write_if_changed(tex_path, doc)
 
-    except Exception as e:
-        print(f" -> WARNING: Compilation failed for {filename_base}.tex")
-        print(e)
+    tex_pool.submit(filename_base, doc)
+    manifest.record(filename_base, inputs)
 
 # =====================================================
 # SAFE RESIZE FUNCTION
@@ -152,12 +158,10 @@ Raw ownership classifications reflect the Provider of Services
 \end{table}
 """
 
-with open(
+write_if_changed(
     os.path.join(tex_dir, "tab1_ownership_taxonomy_fragment.tex"),
-    "w",
-    encoding="utf-8"
-) as f:
-    f.write(taxonomy_tex)
+    taxonomy_tex
+)
 
 compile_to_pdf(
     "tab1_ownership_taxonomy",
@@ -169,12 +173,13 @@ compile_to_pdf(
 # GROUPED OWNERSHIP COUNTS
 # =====================================================
 
-df_grp = pd.read_csv(
-    os.path.join(
-        csv_dir,
-        "ownership_grouped_unique_full_sample.csv"
+with run_profile.stage("read_csv", "ownership_grouped_unique_full_sample.csv"):
+    df_grp = pd.read_csv(
+        os.path.join(
+            csv_dir,
+            "ownership_grouped_unique_full_sample.csv"
+        )
     )
-)
 
 # FIX: Stata exported the text labels, not numbers. 
 # No numeric conversion needed. Just drop NaNs and keep the big three.
@@ -235,7 +240,8 @@ during the 2007--2024 sample period.
 
 compile_to_pdf(
     "tab2a_grouped_counts",
-    grouped_tex
+    grouped_tex,
+    inputs=["ownership_grouped_unique_full_sample.csv"]
 )
 
 
@@ -245,12 +251,13 @@ compile_to_pdf(
 # CMS OWNERSHIP COUNTS
 # =====================================================
 
-df_fine = pd.read_csv(
-    os.path.join(
-        csv_dir,
-        "ownership_fine_unique_full_sample.csv"
+with run_profile.stage("read_csv", "ownership_fine_unique_full_sample.csv"):
+    df_fine = pd.read_csv(
+        os.path.join(
+            csv_dir,
+            "ownership_fine_unique_full_sample.csv"
+        )
     )
-)
 
 df_fine = df_fine.dropna(subset=["own_str"])
 
@@ -305,7 +312,8 @@ Counts reflect unique facilities observed during the
 
 compile_to_pdf(
     "tab2b_cms_counts",
-    cms_tex
+    cms_tex,
+    inputs=["ownership_fine_unique_full_sample.csv"]
 )
 
 
@@ -314,28 +322,30 @@ compile_to_pdf(
 # GROUPED OWNERSHIP BY YEAR
 # =====================================================
 
-df3 = pd.read_csv(
-    os.path.join(
-        csv_dir,
-        "ownership_grouped_by_year.csv"
+with run_profile.stage("read_csv", "ownership_grouped_by_year.csv"):
+    df3 = pd.read_csv(
+        os.path.join(
+            csv_dir,
+            "ownership_grouped_by_year.csv"
+        )
     )
-)
 
 # FIX: Just like Table 2A, filter directly by the text labels
 df3 = df3.dropna(subset=["own_category"])
 valid_cats = ["Government", "For-Profit", "Non-Profit"]
 df3 = df3[df3["own_category"].isin(valid_cats)]
 
-pivot3 = (
-    df3.pivot_table(
-        index="own_category",
-        columns="year",
-        values="fac_count",
-        aggfunc="sum"
+with run_profile.stage("pivot_table", "tab3_grouped_by_year"):
+    pivot3 = (
+        df3.pivot_table(
+            index="own_category",
+            columns="year",
+            values="fac_count",
+            aggfunc="sum"
+        )
+        .fillna(0)
+        .astype(int)
     )
-    .fillna(0)
-    .astype(int)
-)
 
 # Chronological ordering
 pivot3 = pivot3[sorted(pivot3.columns)]
@@ -383,7 +393,8 @@ table3_tex += r"""
 compile_to_pdf(
     "tab3_grouped_by_year",
     table3_tex,
-    landscape=True
+    landscape=True,
+    inputs=["ownership_grouped_by_year.csv"]
 )
 
 # =====================================================
@@ -392,12 +403,13 @@ compile_to_pdf(
 # PANEL FORMAT
 # =====================================================
 
-df4 = pd.read_csv(
-    os.path.join(
-        csv_dir,
-        "ownership_fine_by_year.csv"
+with run_profile.stage("read_csv", "ownership_fine_by_year.csv"):
+    df4 = pd.read_csv(
+        os.path.join(
+            csv_dir,
+            "ownership_fine_by_year.csv"
+        )
     )
-)
 
 df4 = df4.dropna(subset=["own_str"])
 
@@ -407,16 +419,17 @@ df4["own_str"] = (
     .str.title()
 )
 
-pivot4 = (
-    df4.pivot_table(
-        index="own_str",
-        columns="year",
-        values="fac_count",
-        aggfunc="sum"
+with run_profile.stage("pivot_table", "tab4_cms_by_year"):
+    pivot4 = (
+        df4.pivot_table(
+            index="own_str",
+            columns="year",
+            values="fac_count",
+            aggfunc="sum"
+        )
+        .fillna(0)
+        .astype(int)
     )
-    .fillna(0)
-    .astype(int)
-)
 
 pivot4 = pivot4[sorted(pivot4.columns)]
 
@@ -507,7 +520,14 @@ table4_tex += r"""
 compile_to_pdf(
     "tab4_cms_by_year",
     table4_tex,
-    landscape=True
+    landscape=True,
+    inputs=["ownership_fine_by_year.csv"]
 )
 
+for job_name, _ in tex_pool.run():
+    manifest.forget(job_name)
+
+manifest.save()
+run_profile.finish(out_root)
+
 print("=== ALL TABLES COMPLETED ===")
@@ -1,22 +1,28 @@
 import os
 import glob
 import pandas as pd
-import subprocess
+from tex_compile import TexCompilePool
+import run_profile
+from report_engine import generate_demographic_latex, DEMOGRAPHIC_STYLES
 
 # =====================================================
 # PATHS
 # =====================================================
-out_root = r"C:\Users\omarf\Dropbox\personal_files_omar_farrag\Research\projects\NYS_npPolicy\output\summary_stats\demographics_nys"
+# Set NP_OUTPUT_ROOT to run against another summary_stats tree
+out_root = os.path.join(os.environ.get("NP_OUTPUT_ROOT") or r"C:\Users\omarf\Dropbox\personal_files_omar_farrag\Research\projects\NYS_npPolicy\output\summary_stats", "demographics_nys")
 csv_dir = os.path.join(out_root, "tables_csv")
 tex_dir = os.path.join(out_root, "tables_pdf")
 os.makedirs(tex_dir, exist_ok=True)
 
-print("=== GENERATING NYS JOURNAL-QUALITY LATEX TABLES ===")
+# Every table is queued and compiled at the end; batch mode builds one document
+# per preamble (portrait / pdflscape) and splits it into the per-table PDFs
+tex_batch = None  # True = single pdflatex run per preamble (or NP_TEX_BATCH=1)
+tex_keep_combined = False  # True = also keep the combined appendix PDF(s)
+tex_pool = TexCompilePool(tex_dir, batch=tex_batch, keep_combined=tex_keep_combined, combined_name="nys_demographics_appendix", keep_tex=True)
+profile_run = None  # True = per-stage timing/memory report in out_root/run_reports (or NP_PROFILE=1)
+run_profile.start(enabled=profile_run)
 
-# Maps for clean provider labeling (Handles Stata numeric exports gracefully)
-auth_map = {"1": "Restricted", "1.0": "Restricted", "2": "Reduced", "2.0": "Reduced", "3": "Full Practice", "3.0": "Full Practice"}
-own_map = {"1": "Government", "1.0": "Government", "2": "For-Profit", "2.0": "For-Profit", "3": "Non-Profit", "3.0": "Non-Profit"}
-prov_map = {"1": "MD/DO", "1.0": "MD/DO", "2": "Nurse Practitioner", "2.0": "Nurse Practitioner", "3": "Physician Assistant", "3.0": "Physician Assistant"}
+print("=== GENERATING NYS JOURNAL-QUALITY LATEX TABLES ===")
 
 # =====================================================
 # CORE FUNCTIONS
@@ -38,14 +44,10 @@ def compile_to_pdf(filename_base, table_content, landscape=False):
 \end{{document}}
 """
     tex_path = os.path.join(tex_dir, f"{filename_base}.tex")
-    with open(tex_path, "w", encoding="utf-8") as f:
-        f.write(doc)
-    try:
-        subprocess.run(["pdflatex", "-interaction=nonstopmode", "-output-directory", tex_dir, tex_path],
-                       check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        print(f" -> Successfully compiled: {filename_base}.pdf")
-    except Exception as e:
-        print(f" -> WARNING: Compilation failed for {filename_base}.tex")
+    with run_profile.stage("latex", filename_base, outputs=[tex_path]):
+        with open(tex_path, "w", encoding="utf-8") as f:
+            f.write(doc)
+    tex_pool.submit(filename_base, doc)
 
 def latex_resize(tex):
     lines = tex.splitlines()
@@ -61,78 +63,6 @@ def latex_resize(tex):
             out.append(line)
     return "\n".join(out)
 
-# =====================================================
-# SECTION A: PROVIDER TABLES LOGIC
-# =====================================================
-def generate_full_latex(df, row_var_name, title_desc, filename):
-    headers = " & ".join([f"\\textbf{{{c}}}" for c in df.columns])
-    rows = ""
-    for idx in df.index:
-        row_vals = []
-        for col in df.columns:
-            val = df.loc[idx, col]
-            row_vals.append("-" if pd.isna(val) else f"{int(val):,}")
-        rows += f"        {idx} & " + " & ".join(row_vals) + " \\\\\n"
-
-    latex = f"""\\begin{{table}}[htbp]
-\\centering
-\\caption{{Full Sample Unique NYS Provider Count: {title_desc}}}
-\\label{{tab:{filename}}}
-\\begin{{threeparttable}}
-\\begin{{tabular}}{{l{"c" * len(df.columns)}}}
-\\toprule
-\\textbf{{{row_var_name}}} & {headers} \\\\
-\\midrule
-{rows}\\bottomrule
-\\end{{tabular}}
-\\begin{{tablenotes}}[flushleft]
-\\footnotesize
-\\item Notes: Counts represent unique billing providers in New York across the panel.
-\\end{{tablenotes}}
-\\end{{threeparttable}}
-\\end{{table}}"""
-    compile_to_pdf(filename, latex)
-
-def generate_yearly_latex(df, row_var_name, valid_row_idx, title_desc, filename):
-    years = [str(y) for y in df.columns]
-    headers = " & ".join([f"\\textbf{{{y}}}" for y in years])
-    
-    rows = ""
-    for prov in ["MD/DO", "Nurse Practitioner", "Physician Assistant"]:
-        if prov in df.index.get_level_values(0):
-            rows += f"        \\multicolumn{{{len(years) + 1}}}{{l}}{{\\textbf{{{prov}}}}} \\\\\n        \\midrule\n"
-            for r_idx in valid_row_idx:
-                if (prov, r_idx) in df.index:
-                    row_vals = []
-                    for col in df.columns:
-                        val = df.loc[(prov, r_idx), col]
-                        row_vals.append("-" if pd.isna(val) else f"{int(val):,}")
-                    rows += f"        \\hspace{{0.5cm}} {r_idx} & " + " & ".join(row_vals) + " \\\\\n"
-            rows += "        \\midrule\n"
-
-    latex = f"""\\begin{{landscape}}
-\\begin{{table}}[htbp]
-\\centering
-\\caption{{Yearly Active NYS Provider Count: {title_desc}}}
-\\label{{tab:{filename}}}
-\\begin{{threeparttable}}
-\\resizebox{{\\textwidth}}{{!}}{{
-\\begin{{tabular}}{{l{"c" * len(years)}}}
-\\toprule
-\\textbf{{{row_var_name}}} & {headers} \\\\
-\\midrule
-{rows}\\bottomrule
-\\end{{tabular}}
-}}
-\\begin{{tablenotes}}[flushleft]
-\\footnotesize
-\\item Notes: Yearly counts represent active billing providers per year in New York.
-\\end{{tablenotes}}
-\\end{{threeparttable}}
-\\end{{table}}
-\\end{{landscape}}"""
-    compile_to_pdf(filename, latex, landscape=True)
-
 # =====================================================
 # SECTION B: SCAN AND ROUTE FILES
 # =====================================================
@@ -140,11 +70,10 @@ csv_files = glob.glob(os.path.join(csv_dir, "*.csv"))
 
 for file in csv_files:
     filename = os.path.basename(file).replace(".csv", "")
-    prefix = "Inpatient" if "inpatient" in filename else "Outpatient ASC"
     
     # --- ROUTE 1: FACILITY OWNERSHIP LOGIC ---
     if filename.startswith("ownership"):
-        df = pd.read_csv(file)
+        with run_profile.stage("read_csv", filename): df = pd.read_csv(file)
         
         # 1. Unique Grouped
         if "grouped_unique" in filename:
@@ -198,47 +127,12 @@ for file in csv_files:
 
     # --- ROUTE 2: PROVIDER DEMOGRAPHICS LOGIC ---
     elif filename.startswith("inpatient") or filename.startswith("outpatient"):
-        df = pd.read_csv(file)
-        df['prov_type'] = df['prov_type'].astype(str).replace(prov_map)
-        
-        # A. FULL SAMPLE
-        if "full" in filename:
-            if "auth" in filename:
-                df['np_authority'] = df['np_authority'].astype(str).replace(auth_map)
-                pv = df.pivot_table(index='np_authority', columns='prov_type', values='provider_count', aggfunc='sum')
-                valid_idx = [i for i in ["Restricted", "Reduced", "Full Practice"] if i in pv.index]
-                row_name, title = "State NP Authority", "By Authority and Provider Type"
-            elif "own" in filename:
-                df['own_category'] = df['own_category'].astype(str).replace(own_map)
-                pv = df.pivot_table(index='own_category', columns='prov_type', values='provider_count', aggfunc='sum')
-                valid_idx = [i for i in ["Government", "Non-Profit", "For-Profit"] if i in pv.index]
-                row_name, title = "Hospital Ownership", "By Ownership and Provider Type"
-            elif "gender" in filename:
-                pv = df.pivot_table(index='is_female', columns='prov_type', values='provider_count', aggfunc='sum')
-                valid_idx = [i for i in ["Female", "Male"] if i in pv.index]
-                row_name, title = "Provider Gender", "By Gender and Provider Type"
-
-            valid_col = [c for c in ["MD/DO", "Nurse Practitioner", "Physician Assistant"] if c in pv.columns]
-            pv = pv.reindex(index=valid_idx, columns=valid_col)
-            generate_full_latex(pv, row_name, f"{prefix} {title}", filename)
-
-        # B. YEARLY TIMELINE
-        elif "year" in filename:
-            if "auth" in filename:
-                df['np_authority'] = df['np_authority'].astype(str).replace(auth_map)
-                pv = df.pivot_table(index=['prov_type', 'np_authority'], columns='year', values='provider_count', aggfunc='sum')
-                valid_idx = ["Restricted", "Reduced", "Full Practice"]
-                row_name, title = "State NP Authority", "By Authority and Provider Type"
-            elif "own" in filename:
-                df['own_category'] = df['own_category'].astype(str).replace(own_map)
-                pv = df.pivot_table(index=['prov_type', 'own_category'], columns='year', values='provider_count', aggfunc='sum')
-                valid_idx = ["Government", "Non-Profit", "For-Profit"]
-                row_name, title = "Hospital Ownership", "By Ownership and Provider Type"
-            elif "gender" in filename:
-                pv = df.pivot_table(index=['prov_type', 'is_female'], columns='year', values='provider_count', aggfunc='sum')
-                valid_idx = ["Female", "Male"]
-                row_name, title = "Provider Gender", "By Gender and Provider Type"
+        # Same provider-count tables as 00b, in the NYS threeparttable style
+        with run_profile.stage("read_csv", filename): df = pd.read_csv(file)
+        table = generate_demographic_latex(df, filename, DEMOGRAPHIC_STYLES["nys"])
+        if table: compile_to_pdf(filename, table[0], landscape=table[1])
 
-            generate_yearly_latex(pv, row_name, valid_idx, f"{prefix} {title}", filename)
+tex_pool.run()
+run_profile.finish(out_root)
 
 print("=== ALL NYS TABLES COMPLETED ===")
\ No newline at end of file
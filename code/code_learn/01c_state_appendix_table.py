@@ -1,10 +1,11 @@
 import os
-import subprocess
 import pandas as pd
+from tex_compile import TexCompilePool
 from itertools import zip_longest
 
 # --- 1. DEFINE PATHS ---
-base_dir = r"C:\Users\omarf\Dropbox\personal_files_omar_farrag\Research\projects\NYS_npPolicy\output\summary_stats\in_patient\macro_stats"
+# summary_stats root can be overridden with NP_OUTPUT_ROOT
+base_dir = os.path.join(os.environ.get("NP_OUTPUT_ROOT") or r"C:\Users\omarf\Dropbox\personal_files_omar_farrag\Research\projects\NYS_npPolicy\output\summary_stats", "in_patient", "macro_stats")
 tex_dir = os.path.join(base_dir, "tables_tex")
 pdf_dir = os.path.join(base_dir, "tables_pdf", "appendix")
 
@@ -80,24 +81,12 @@ standalone_tex = f"""\\documentclass[12pt]{{article}}
 {latex_fragment}
 \\end{{document}}"""
 
-temp_tex_path = os.path.join(pdf_dir, "appendix_np_authority.tex")
-with open(temp_tex_path, 'w') as f:
-    f.write(standalone_tex)
+# Same preamble as the report_engine portrait tables, so it compiles against the same cached format
+fmt_dir = os.path.join(os.path.dirname(os.path.dirname(base_dir)), "_fmt_cache")
+tex_pool = TexCompilePool(pdf_dir, workers=1, fmt_dir=fmt_dir)
+tex_pool.submit("appendix_np_authority", standalone_tex)
 
-try:
-    subprocess.run(
-        ['pdflatex', '-interaction=nonstopmode', f'-output-directory={pdf_dir}', temp_tex_path],
-        stdout=subprocess.DEVNULL,
-        stderr=subprocess.DEVNULL,
-        check=True
-    )
-    # Clean up clutter
-    for ext in ['.aux', '.log', '.tex']:
-        clutter_file = os.path.join(pdf_dir, f"appendix_np_authority{ext}")
-        if os.path.exists(clutter_file):
-            os.remove(clutter_file)
-            
+if not tex_pool.run():
     print(f"Successfully generated Appendix Table PDF at: {pdf_dir}")
-
-except subprocess.CalledProcessError:
-    print("[WARNING] Compilation failed. Check LaTeX syntax.")
\ No newline at end of file
+else:
+    print("[WARNING] Compilation failed. Check LaTeX syntax.")
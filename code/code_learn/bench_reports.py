@@ -0,0 +1,303 @@
+import os
+import sys
+import json
+import glob
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+
+import numpy as np
+import pandas as pd
+
+# Synthetic-scale benchmark for the summary-stat reporting scripts.
+# Builds a fake summary_stats tree with the exact file names the Stata
+# collapse steps write ({var}_by_auth_ownership.csv, {var}_by_auth_year.csv,
+# {var}_universal*.csv, ownership_*_by_year.csv, inpatient_*_x_provtype_*),
+# at a chosen number of variables, years and ownership categories, then
+#   1. times each phase of the report engine in-process
+#      (ingest, pivot, LaTeX emit, heatmap render, pdflatex), per setting
+#   2. times 00b, 00c, 00e and 01b-04b end to end on the same tree
+#      (NP_OUTPUT_ROOT points them at it, NP_FORCE_REBUILD=1 disables skipping)
+# and writes everything to one JSON file, so runs on different commits can be
+# diffed. Runs on a plain Linux box; pdflatex is timed only if it is on PATH.
+#
+#   python bench_reports.py --vars 20 --years 2007-2024 --out bench_results.json
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SCRIPTS = ["00b_demographic_tables.py", "00c_ownership_tables.py", "00e_nys_demographic_tables.py",
+           "01b_tables_and_heatmaps.py", "02b_tables_and_heatmaps.py", "03b_tables_and_heatmaps.py", "04b_tables_and_heatmaps.py"]
+PHASES = ["ingest", "pivot", "latex", "heatmap", "pdflatex"]
+
+AUTH = ["Restricted", "Reduced", "Full Practice"]
+OWN = ["Government", "For-Profit", "Non-Profit"]
+PROV = ["MD/DO", "Nurse Practitioner", "Physician Assistant"]
+FINE_OWN = ["Government - Federal", "Government - State", "Government - Local", "Government - Hospital District",
+            "Voluntary Non-Profit - Church", "Voluntary Non-Profit - Private", "Voluntary Non-Profit - Other",
+            "Proprietary", "Physician", "Tribal"]
+
+# setting folder -> (group column, group levels, group file suffix)
+OUTCOME_TREES = {
+    os.path.join("in_patient", "macro_stats"): ("own_category", OWN, "_by_auth_ownership.csv"),
+    os.path.join("in_patient", "micro_stats"): ("prov_type", PROV, "_by_auth_provtype.csv"),
+    os.path.join("out_patient", "macro_stats"): (None, None, None),
+    os.path.join("out_patient", "micro_stats"): ("prov_type", PROV, "_by_auth_provtype.csv"),
+}
+
+
+# --- 1. SYNTHETIC TREE ---
+def _stats(rng, n):
+    return {"mean_val": rng.normal(50, 10, n), "sd_val": rng.uniform(1, 5, n), "n_val": rng.integers(10, 1000, n)}
+
+
+def _write(csv_dir, name, df):
+    df.to_csv(os.path.join(csv_dir, name), index=False)
+
+
+def fine_categories(n):
+    base = [s.upper() for s in FINE_OWN]
+    return base[:n] + [f"OTHER OWNERSHIP {k + 1}" for k in range(n - len(base))]
+
+
+def generate_tree(root, n_vars, years, n_fine, seed=0):
+    rng = np.random.default_rng(seed)
+    n_files = 0
+
+    for sub, (gcol, glevels, gsuffix) in OUTCOME_TREES.items():
+        csv_dir = os.path.join(root, sub, "tables_csv")
+        os.makedirs(csv_dir, exist_ok=True)
+        for k in range(n_vars):
+            for var in [f"bench_var_{k + 1}", f"d_bench_var_{k + 1}"]:
+                _write(csv_dir, f"{var}_by_authority.csv", pd.DataFrame({"np_authority": AUTH, **_stats(rng, 3)}))
+                if gcol:
+                    rows = [(a, g) for a in AUTH for g in glevels]
+                    _write(csv_dir, var + gsuffix, pd.DataFrame(rows, columns=["np_authority", gcol]).assign(**_stats(rng, len(rows))))
+                rows = [(a, y) for a in AUTH for y in years]
+                _write(csv_dir, f"{var}_by_auth_year.csv", pd.DataFrame(rows, columns=["np_authority", "year"]).assign(**_stats(rng, len(rows))))
+                _write(csv_dir, f"{var}_universal.csv", pd.DataFrame({"overall": ["National"], **_stats(rng, 1)}))
+                _write(csv_dir, f"{var}_universal_by_year.csv", pd.DataFrame({"overall": "National", "year": list(years), **_stats(rng, len(years))}))
+                n_files += 5 if gcol else 4
+
+    # Provider counts (00b national, 00e NYS) and facility ownership (00c, 00e)
+    fine = fine_categories(n_fine)
+    for sub, provider_counts, ownership in [("demographics", True, False), ("demographics_nys", True, True),
+                                            (os.path.join("in_patient", "demographics"), False, True)]:
+        csv_dir = os.path.join(root, sub, "tables_csv")
+        os.makedirs(csv_dir, exist_ok=True)
+        if provider_counts:
+            for setting in ["inpatient", "outpatient"]:
+                for dim, col, levels in [("auth", "np_authority", AUTH), ("own", "own_category", OWN), ("gender", "is_female", ["Female", "Male", "Unknown"])]:
+                    if setting == "outpatient" and dim == "own": continue
+                    rows = [(p, v) for p in PROV for v in levels]
+                    _write(csv_dir, f"{setting}_{dim}_x_provtype_full.csv", pd.DataFrame(rows, columns=["prov_type", col]).assign(provider_count=rng.integers(0, 50000, len(rows))))
+                    rows = [(y, p, v) for y in years for p in PROV for v in levels]
+                    _write(csv_dir, f"{setting}_{dim}_x_provtype_year.csv", pd.DataFrame(rows, columns=["year", "prov_type", col]).assign(provider_count=rng.integers(0, 5000, len(rows))))
+                    n_files += 2
+        if ownership:
+            _write(csv_dir, "ownership_fine_unique_full_sample.csv", pd.DataFrame({"own_str": fine, "fac_count": rng.integers(1, 900, len(fine))}))
+            _write(csv_dir, "ownership_grouped_unique_full_sample.csv", pd.DataFrame({"own_category": OWN, "fac_count": rng.integers(1, 900, 3)}))
+            rows = [(y, f) for y in years for f in fine]
+            _write(csv_dir, "ownership_fine_by_year.csv", pd.DataFrame(rows, columns=["year", "own_str"]).assign(fac_count=rng.integers(1, 90, len(rows))))
+            rows = [(y, o) for y in years for o in OWN]
+            _write(csv_dir, "ownership_grouped_by_year.csv", pd.DataFrame(rows, columns=["year", "own_category"]).assign(fac_count=rng.integers(1, 90, len(rows))))
+            n_files += 4
+    return n_files
+
+
+# --- 2. IN-PROCESS PHASES (report engine) ---
+def bench_outcome_setting(engine, cfg, skip, heat_workers, tex_workers):
+    times = dict.fromkeys(PHASES)
+    base_dir = cfg["base_dir"]
+    pdf_dir, heat_dir = os.path.join(base_dir, "tables_pdf"), os.path.join(base_dir, "heatmaps")
+    os.makedirs(pdf_dir, exist_ok=True)
+    os.makedirs(heat_dir, exist_ok=True)
+    grouping = engine.GROUPINGS[cfg["grouping"]] if cfg["grouping"] else None
+
+    start = time.perf_counter()
+    tables = engine.CsvTables(os.path.join(base_dir, "tables_csv"))
+    times["ingest"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    items = []
+    for var_name in tables.var_names([grouping["kind"], "by_auth_year"] if grouping else ["by_auth_year"]):
+        uni = tables.get(var_name, "universal")
+        uni_year = tables.get(var_name, "universal_by_year")
+        item = {"var": var_name, "uni_val": f"{uni['mean_val'].iloc[0]:.3f}" if uni is not None and not uni.empty else "-",
+                "uni_year": dict(zip(uni_year["year"], uni_year["mean_val"])) if uni_year is not None else {}}
+        if grouping and tables.has(var_name, grouping["kind"]):
+            item["group"] = tables.get(var_name, grouping["kind"]).pivot_table(index='np_authority', columns=grouping["column"], values='mean_val', aggfunc='mean', observed=True)
+        if tables.has(var_name, "by_auth_year"):
+            item["time"] = tables.get(var_name, "by_auth_year").pivot_table(index='np_authority', columns='year', values='mean_val', aggfunc='mean', observed=True)
+        if cfg["full_sample"] and tables.has(var_name, "by_authority"):
+            item["full"] = tables.get(var_name, "by_authority")
+        items.append(item)
+    times["pivot"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    docs, heat_jobs = [], []
+    for item in items:
+        var_name = item["var"]
+        clean_title, is_delta, desc = engine.get_clean_title(var_name, cfg["desc_dict"])
+        if "group" in item:
+            docs.append((f"{var_name}_{cfg['grouping']}", engine.standalone(engine.generate_group_latex(item["group"], grouping, clean_title, var_name, item["uni_val"], desc))))
+            heat_jobs.append(engine.heatmap_job(item["group"], os.path.join(heat_dir, f"{var_name}_{cfg['grouping']}_heatmap.png"), clean_title, desc, grouping["title"], "Blues", is_delta, "square"))
+        if "time" in item:
+            tex_time = engine.generate_timeline_latex(item["time"], item["uni_year"], clean_title, var_name, desc, cfg["timeline_caption"], cfg["timeline_notes"])
+            docs.append((f"{var_name}_timeline", engine.standalone(tex_time, landscape=True)))
+            heat_jobs.append(engine.heatmap_job(item["time"], os.path.join(heat_dir, cfg["timeline_heatmap"].format(var=var_name)), clean_title, desc, "Year", cfg["timeline_cmap"], is_delta, "timeline"))
+        if "full" in item:
+            docs.append((f"{var_name}_full_sample", engine.standalone(engine.generate_fullsample_latex(item["full"], item["uni_val"], clean_title, var_name, desc))))
+    times["latex"] = time.perf_counter() - start
+
+    if "heatmap" not in skip:
+        start = time.perf_counter()
+        engine.render_heatmaps(heat_jobs, workers=heat_workers)
+        times["heatmap"] = time.perf_counter() - start
+
+    times["pdflatex"] = bench_pdflatex(engine, pdf_dir, docs, skip, tex_workers)
+    return {"seconds": times, "csv_files": len(tables.files), "tables": len(docs), "heatmaps": len(heat_jobs)}
+
+
+def bench_demographic_setting(engine, cfg, skip, tex_workers):
+    times = dict.fromkeys(PHASES)
+    pdf_dir = os.path.join(cfg["base_dir"], "tables_pdf")
+    os.makedirs(pdf_dir, exist_ok=True)
+
+    start = time.perf_counter()
+    frames = {os.path.basename(f)[:-4]: pd.read_csv(f) for f in glob.glob(os.path.join(cfg["base_dir"], "tables_csv", "*.csv"))}
+    times["ingest"] = time.perf_counter() - start
+
+    # Decoding, pivoting and emitting share one call per file here, so they are timed together as "latex"
+    start = time.perf_counter()
+    docs = []
+    for filename, df in frames.items():
+        table = engine.generate_demographic_latex(df, filename, engine.DEMOGRAPHIC_STYLES[cfg["demographics"]])
+        if table: docs.append((filename, engine.standalone(*table)))
+    times["latex"] = time.perf_counter() - start
+
+    times["pdflatex"] = bench_pdflatex(engine, pdf_dir, docs, skip, tex_workers)
+    return {"seconds": times, "csv_files": len(frames), "tables": len(docs), "heatmaps": 0}
+
+
+def bench_pdflatex(engine, pdf_dir, docs, skip, tex_workers):
+    if "pdflatex" in skip or shutil.which("pdflatex") is None or not docs:
+        return None
+    tex_pool = engine.TexCompilePool(pdf_dir, workers=tex_workers, fmt_dir=engine.FMT_CACHE)
+    for job_name, doc in docs:
+        tex_pool.submit(job_name, doc)
+    start = time.perf_counter()
+    tex_pool.run()
+    return time.perf_counter() - start
+
+
+def bench_engine(root, skip, heat_workers, tex_workers):
+    # report_engine reads NP_OUTPUT_ROOT when it is imported
+    os.environ["NP_OUTPUT_ROOT"] = root
+    start = time.perf_counter()
+    import report_engine as engine
+    results = {"import_seconds": time.perf_counter() - start, "settings": {}}
+
+    for name, cfg in engine.SETTINGS.items():
+        print(f"--- bench: {name} ---")
+        if "demographics" in cfg:
+            results["settings"][name] = bench_demographic_setting(engine, cfg, skip, tex_workers)
+        else:
+            results["settings"][name] = bench_outcome_setting(engine, cfg, skip, heat_workers, tex_workers)
+    return results
+
+
+# --- 3. END-TO-END SCRIPTS ---
+def bench_scripts(root, log_dir):
+    env = dict(os.environ, NP_OUTPUT_ROOT=root, NP_FORCE_REBUILD="1", MPLBACKEND="Agg")
+    results = {}
+    for script in SCRIPTS:
+        print(f"--- bench: {script} ---")
+        with open(os.path.join(log_dir, f"{script[:-3]}.log"), 'w') as log:
+            start = time.perf_counter()
+            proc = subprocess.run([sys.executable, os.path.join(HERE, script)], cwd=HERE, env=env, stdout=log, stderr=subprocess.STDOUT)
+            results[script] = {"seconds": time.perf_counter() - start, "returncode": proc.returncode}
+        if proc.returncode != 0:
+            print(f"[WARNING] {script} exited with status {proc.returncode} (see {log.name}).")
+    return results
+
+
+# --- 4. RESULTS ---
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=HERE, capture_output=True, text=True, check=True).stdout.strip()
+    except (subprocess.CalledProcessError, OSError):
+        return None
+
+
+def best_of(runs):
+    # Per phase minimum over repeats (None stays None when a phase was skipped)
+    best = json.loads(json.dumps(runs[0]))
+    for name, setting in best["settings"].items():
+        for phase in PHASES:
+            values = [run["settings"][name]["seconds"][phase] for run in runs if run["settings"][name]["seconds"][phase] is not None]
+            setting["seconds"][phase] = min(values) if values else None
+    return best
+
+
+def parse_years(text):
+    first, _, last = text.partition("-")
+    return list(range(int(first), int(last or first) + 1))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the summary-stat reporting scripts on a synthetic tables_csv tree.")
+    parser.add_argument("--vars", type=int, default=10, help="variables per outcome setting (each also gets a d_ twin)")
+    parser.add_argument("--years", default="2007-2024", help="year span, e.g. 2007-2024")
+    parser.add_argument("--categories", type=int, default=6, help="fine CMS ownership categories")
+    parser.add_argument("--repeat", type=int, default=1, help="in-process repeats; the fastest run per phase is reported")
+    parser.add_argument("--skip", default="", help="comma-separated phases to skip (heatmap, pdflatex)")
+    parser.add_argument("--no-scripts", action="store_true", help="skip the end-to-end script runs")
+    parser.add_argument("--heat-workers", type=int, default=None)
+    parser.add_argument("--tex-workers", type=int, default=None)
+    parser.add_argument("--root", default=None, help="where to build the tree (default: a temporary folder, removed afterwards)")
+    parser.add_argument("--out", default="bench_results.json")
+    args = parser.parse_args()
+
+    skip = {s.strip() for s in args.skip.split(",") if s.strip()}
+    years = parse_years(args.years)
+    if args.root and os.path.isdir(args.root) and os.listdir(args.root):
+        parser.error(f"--root {args.root} is not empty; the benchmark only writes into a fresh folder")
+    root = os.path.abspath(args.root) if args.root else tempfile.mkdtemp(prefix="np_bench_")
+
+    start = time.perf_counter()
+    n_files = generate_tree(root, args.vars, years, args.categories)
+    generate_seconds = time.perf_counter() - start
+    print(f"Generated {n_files} CSV files in {root} ({generate_seconds:.2f}s).")
+
+    try:
+        runs = []
+        for _ in range(args.repeat):
+            runs.append(bench_engine(root, skip, args.heat_workers, args.tex_workers))
+        scripts = {} if args.no_scripts else bench_scripts(root, root)
+    finally:
+        if not args.root: shutil.rmtree(root, ignore_errors=True)
+
+    results = {
+        "meta": {"commit": git_commit(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+                 "pandas": pd.__version__, "numpy": np.__version__, "platform": platform.platform(), "cpu_count": os.cpu_count(),
+                 "pdflatex": shutil.which("pdflatex")},
+        "params": {"vars": args.vars, "years": [years[0], years[-1]], "categories": args.categories, "repeat": args.repeat,
+                   "skip": sorted(skip), "csv_files": n_files, "generate_seconds": generate_seconds},
+        "engine": best_of(runs),
+        "scripts": scripts,
+    }
+    with open(args.out, 'w') as f: json.dump(results, f, indent=2)
+
+    print("\n=== BENCHMARK (seconds, best of {}) ===".format(args.repeat))
+    print(f"{'setting':<20}" + "".join(f"{p:>10}" for p in PHASES))
+    for name, setting in results["engine"]["settings"].items():
+        print(f"{name:<20}" + "".join(f"{'-' if setting['seconds'][p] is None else format(setting['seconds'][p], '.2f'):>10}" for p in PHASES))
+    for script, res in scripts.items():
+        print(f"{script:<32}{res['seconds']:>8.2f}" + ("" if res["returncode"] == 0 else f"  (exit {res['returncode']})"))
+    print(f"Results written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
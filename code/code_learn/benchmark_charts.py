@@ -0,0 +1,308 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+import run_profile
+from build_manifest import write_if_changed
+from dta_stream import group_moments
+from geo_benchmarks import BENCHMARKS, METRIC_SETS, geo_benchmarks
+from grouped_stats import DATA_ROOT, OUTPUT_ROOT, STATES_FULL, STATES_REDUCED, STATES_RESTRICTED, OWN_GOV_EXACT, dta_columns, _by_value
+from grouping_sets import GroupingSets
+from panel_lags import PanelIndex, key_codes
+from quality_curves import GEN_MED_SPECS
+
+# Chart tables for the provider benchmark scripts (08c / 08e / 08h / 08j / 09c / 09e).
+# After the geographic SD bins (geo_benchmarks) and the L2 / L3 lags, every
+# chart in the mega-loop does use master_clean, keep if nest_var == nv and
+#   collapse (mean) var, by(lag_<m>_decline dim_var)       (decline chart)
+#   collapse (mean) var, by(lag_bin_<m>_<geo> dim_var)     (SD-bin charts)
+# for every dim x nest x nest level x behavior var x metric x geo, reloading
+# the panel from disk each time. Here the panel is built once in memory; the
+# dims / nests are factorized once into taxonomy profiles and each x variable
+# (one decline flag or one lagged bin per metric / geo) is one group_moments
+# pass of all behavior vars over (x, profile) cells. Every dim x nest chart is
+# then a roll-up of those cells (grouping_sets), never a pass over the rows.
+# Like keep if !missing(var, x, dim_var), a point only counts rows where the
+# outcome, the x value and the dimension are all present.
+#
+# One long table per script, charts_<script>.csv in the script's baseOut:
+#   chart, nest, nest_level, nest_label, dim, dim_level, dim_label, metric, geo, outcome, x, mean, n
+# (chart = decline | bin; geo is empty for decline charts). The renderer
+# slices it by (nest, dim, metric, geo, outcome).
+#
+#   python benchmark_charts.py               -> every script
+#   python benchmark_charts.py 08c 09e       -> just the named script(s)
+#   python benchmark_charts.py --test        -> testing_mode: 5% sample of providers (09e: of NYS providers)
+#   python benchmark_charts.py --profile     -> also write a per-stage run report (run_profile)
+
+# --- 1. DEFINITIONS (mirror the .do files) ---
+LAG_YEARS = 2  # $lag_years: decline = L2.v < L3.v, bins = L2.bin
+TEST_PERCENT = 5  # testing_mode: contract npi, sample 5
+
+BEHAVIOR_VARS = ["partd_generic_rate", "partd_opioid_rate", "partb_em_upcode_rate", "partb_low_value_rate", "partb_imaging_adv_rate",
+                 "bene_avg_risk_scre", "tot_benes", "tot_sbmtd_chrg", "tot_srvcs", "tot_pymt_amt"]
+PRIM_CARE_SPECS = ["FAMILY PRACTICE", "FAMILY MEDICINE", "GENERAL PRACTICE"]  # $cond_prim_care
+
+# dim -> (variable, title, folder); nest -> (variable, folder)
+DIMS = {
+    "overall": ("overall_grp", "Overall", "overall"),
+    "gender": ("gender_num", "By Gender", "by_gender"),
+    "spec": ("spec_num", "By Dept", "by_dept"),
+    "auth": ("auth_num", "By NP Law", "by_np_auth"),
+    "prov": ("prov_num", "By Prov Type", "by_prov_type"),
+    "grad": ("grad_decade", "By Grad Decade", "by_grad_decade"),
+    "own": ("own_num", "By Ownership", "by_ownership"),
+}
+NESTS = {"none": ("none_grp", "overall"), "prov": ("prov_num", "by_prov_type"), "grad": ("grad_decade", "by_grad_decade")}
+
+LEVEL_LABELS = {
+    "overall_grp": {1: "National Average"},
+    "none_grp": {1: "All"},
+    "prov_num": {1: "NP", 2: "PA", 3: "MD/DO"},
+    "spec_num": {1: "Primary Care", 2: "General Medicine", 3: "Other Specialties"},
+    "own_num": {1: "Government", 2: "Non-Profit", 3: "For-Profit", 4: "Other"},
+    "auth_num": {1: "Full Practice", 2: "Reduced Practice", 3: "Restricted Practice", 4: "Unknown"},
+    "gender_num": {1: "Female", 2: "Male"},
+    "grad_decade": {1: "Pre-1990s", 2: "1990s", 3: "2000s", 4: "2010s+", 5: "Unknown"},
+}
+
+# spec_num schemes: three groups (08*), gen med vs the rest (09c), primary care / gen med only, others dropped (09e)
+SPEC_LABELS = {
+    "three": {1: "Primary Care", 2: "General Medicine", 3: "Other Specialties"},
+    "gen_med": {1: "General Medicine", 2: "Other Specialties"},
+    "primary": {1: "Primary Care", 2: "General Medicine"},
+}
+
+ALL_DIMS = ["overall", "gender", "spec", "auth", "prov", "grad", "own"]
+NEST_LIST = ["none", "prov", "grad"]
+
+# Data, metrics, geos, baseOut and the NYS filter come from geo_benchmarks.BENCHMARKS
+CHARTS = {
+    "08c": {"primary": "hcahps_100_score", "dims": ALL_DIMS, "spec": "three"},
+    "08e": {"primary": "oas_100_score", "dims": ALL_DIMS[:-1], "spec": "three"},
+    "08h": {"primary": "mips_final_score", "dims": ALL_DIMS, "spec": "three"},
+    "08j": {"primary": "mips_final_score", "dims": ALL_DIMS[:-1], "spec": "three"},
+    "09c": {"primary": "hcahps_100_score", "dims": ALL_DIMS, "spec": "gen_med", "overall_label": "NYS Average", "flat_none": True},
+    "09e": {"primary": "oas_100_score", "dims": ALL_DIMS[:-1], "spec": "primary", "overall_label": "NYS Average", "gender_unknown": True,
+            "dim_folders": {"spec": "by_spec_cohort"}, "sample_after_ny": True},
+}
+
+
+def chart_pairs(dims):
+    # (nest, dim) in loop order: overall only un-nested, never nested by itself
+    return [(nest, dim) for dim in dims for nest in NEST_LIST if (dim != "overall" or nest == "none") and dim != nest]
+
+
+def chart_labels(cfg):
+    labels = {var: dict(lbls) for var, lbls in LEVEL_LABELS.items()}
+    labels["spec_num"] = SPEC_LABELS[cfg["spec"]]
+    if cfg.get("overall_label"): labels["overall_grp"] = {1: cfg["overall_label"]}
+    if cfg.get("gender_unknown"): labels["gender_num"][3] = "Unknown"
+    return labels
+
+
+# --- 2. TAXONOMY (the $cond_* globals in 00_initialize.do) ---
+def _clean(text):
+    return text.str.strip().str.upper()
+
+
+def _prov_num(text):
+    # later replace wins: PA over NP
+    spec = _clean(text)
+    return np.select([spec.str.contains("PHYSICIAN ASSISTANT", regex=False), spec.str.contains("NURSE PRACTITIONER", regex=False)], [2.0, 1.0], 3.0)
+
+
+def _spec_num(scheme):
+    def classify(text):
+        spec = _clean(text)
+        prim, gen = spec.isin(PRIM_CARE_SPECS).to_numpy(), spec.isin(GEN_MED_SPECS).to_numpy()
+        if scheme == "gen_med":
+            return np.where(gen, 1.0, 2.0)
+        return np.select([prim, gen], [1.0, 2.0], 3.0 if scheme == "three" else np.nan)
+    return classify
+
+
+def _auth_num(text):
+    state = _clean(text)
+    return np.select([state.isin(STATES_RESTRICTED), state.isin(STATES_REDUCED), state.isin(STATES_FULL)], [3.0, 2.0, 1.0], 4.0)
+
+
+def _own_num(text):
+    own = _clean(text)
+    gov = own.str.contains("GOVERNMENT", regex=False) | own.isin(OWN_GOV_EXACT)
+    nonprof = own.str.contains("VOLUNTARY", regex=False) | own.str.contains("NON-PROFIT", regex=False)
+    forprof = own.str.contains("PROPRIETARY", regex=False) | own.str.contains("FOR-PROFIT", regex=False)
+    return np.select([forprof, nonprof, gov], [3.0, 2.0, 1.0], 4.0)
+
+
+def _gender_num(unknown):
+    def classify(text):
+        gender = text.to_numpy()
+        return np.select([gender == "F", gender == "M"], [1.0, 2.0], 3.0 if unknown else np.nan)
+    return classify
+
+
+def add_taxonomy(df, cfg):
+    out = {"overall_grp": 1.0, "none_grp": 1.0}
+    spec = df["cms_specialty"] if "cms_specialty" in df.columns else pd.Series("", index=df.index)
+    out["prov_num"] = _by_value(spec, _prov_num)
+    out["spec_num"] = _by_value(spec, _spec_num(cfg["spec"]))
+    if "own" in cfg["dims"]:
+        out["own_num"] = _by_value(df["ownership"], _own_num) if "ownership" in df.columns else 4.0
+    out["auth_num"] = _by_value(df["state_str"], _auth_num)
+    gender = df["gender"] if "gender" in df.columns else pd.Series("", index=df.index)
+    out["gender_num"] = _by_value(gender, _gender_num(cfg.get("gender_unknown", False)))
+    year = df["grad_year"].to_numpy("float64") if "grad_year" in df.columns and pd.api.types.is_numeric_dtype(df["grad_year"].dtype) else np.full(len(df), np.nan)
+    out["grad_decade"] = np.select([year < 1990, year < 2000, year < 2010, year >= 2010], [1.0, 2.0, 3.0, 4.0], 5.0)
+    return df.assign(**out)
+
+
+# --- 3. PANEL (master_clean) ---
+def _test_sample(df, percent=TEST_PERCENT, seed=12345):
+    # contract npi, sample 5: a fixed-seed draw of whole providers (Stata's draw is not reproducible here)
+    codes, uniques = pd.factorize(df["npi"], use_na_sentinel=False)
+    keep = np.zeros(len(uniques), dtype=bool)
+    keep[np.random.default_rng(seed).choice(len(uniques), int(round(len(uniques) * percent / 100)), replace=False)] = True
+    return df[keep[codes]].reset_index(drop=True)
+
+
+def load_master(name, test=False):
+    cfg, bench = CHARTS[name], BENCHMARKS[name]
+    metrics = METRIC_SETS[bench["metrics"]]
+    path = os.path.join(DATA_ROOT, bench["data"])
+    wanted = ["npi", "year", "tot_benes", "cms_specialty", "gender", "ownership", "cms_state", "state", "county", "cms_zip", "grad_year"]
+    wanted += list(metrics.values()) + BEHAVIOR_VARS
+    cols = [c for c in dta_columns(path) if c in wanted]
+    with run_profile.stage("read_stata", bench["data"]):
+        df = pd.read_stata(path, columns=cols, convert_missing=False, preserve_dtypes=True)
+    print(f"Read {len(df)} rows x {len(cols)} columns from {path}.")
+
+    primary = df[cfg["primary"]].to_numpy("float64")
+    df = df[~np.isnan(primary) & (primary >= 0)].reset_index(drop=True)  # drop if missing(m) | m < 0
+    if test and not cfg.get("sample_after_ny"):
+        df = _test_sample(df)  # sample 5 before anything else (09c too: its keep if state_str == "NY" comes later)
+    state = next((c for c in ["cms_state", "state"] if c in df.columns), None)
+    df["state_str"] = _by_value(df[state], lambda t: _clean(t).to_numpy()) if state else ""
+    if bench.get("ny_only"):
+        df = df[df["state_str"] == "NY"].reset_index(drop=True)
+    if test and cfg.get("sample_after_ny"):
+        df = _test_sample(df)
+    if test:
+        print(f"TESTING MODE: {len(df)} rows from a {TEST_PERCENT}% sample of providers.")
+    df = add_taxonomy(df, cfg)
+    if cfg["spec"] == "primary":
+        df = df[df["spec_num"].notna()].reset_index(drop=True)  # keep if !missing(spec_num)
+
+    # SD bins use every row; the panel is de-duplicated only afterwards
+    with run_profile.stage("geo_benchmark", name):
+        cols, _ = geo_benchmarks(df, metrics, bench["geos"], bench.get("weight", "tot_benes"))
+        df = df.join(cols[[f"bin_{m}_{geo}" for geo in bench["geos"] for m in metrics]])
+
+    # gsort npi year -tot_benes, duplicates drop npi year (missing tot_benes sorts last)
+    benes = df["tot_benes"].to_numpy("float64") if "tot_benes" in df.columns else np.zeros(len(df))
+    order = np.lexsort((np.where(np.isnan(benes), np.inf, -benes), df["year"].to_numpy("float64"), pd.factorize(df["npi"], use_na_sentinel=False)[0]))
+    df = df.iloc[order].drop_duplicates(["npi", "year"]).reset_index(drop=True)
+
+    with run_profile.stage("panel_lags", name):
+        idx = PanelIndex(df, "npi")
+        values = list(metrics.values())
+        near, far = idx.lag(df, values, LAG_YEARS).to_numpy(), idx.lag(df, values, LAG_YEARS + 1).to_numpy()
+        with np.errstate(invalid="ignore"):
+            decline = np.where(np.isnan(near) | np.isnan(far), np.nan, (near < far).astype("float64"))
+        lags = [pd.DataFrame(decline, index=df.index, columns=[f"lag_{m}_decline" for m in metrics]),
+                idx.lag(df, [f"bin_{m}_{geo}" for geo in bench["geos"] for m in metrics], LAG_YEARS, prefix="lag_")]
+    return pd.concat([df] + lags, axis=1)
+
+
+# --- 4. ENGINE ---
+def chart_table(df, outcomes, xcols, pairs, labels):
+    # xcols: x variable -> (chart, metric, geo); pairs: (nest, dim). One long frame of chart points.
+    prof_keys = list(dict.fromkeys(v for nest, dim in pairs for v in (NESTS[nest][0], DIMS[dim][0])))
+    prof, n_prof, first = key_codes(df, prof_keys, keep_missing=True)
+    profiles = df[prof_keys].iloc[first].reset_index(drop=True)
+    values = df[outcomes].to_numpy("float64")
+    groupings = {f"{nest}:{dim}": [NESTS[nest][0], "xvar", "x", DIMS[dim][0]] for nest, dim in pairs}
+
+    # Finest cells: x variable x x value x taxonomy profile, stacked over every x variable
+    cells, stats = [], []
+    for x in xcols:
+        xv = df[x].to_numpy("float64")
+        levels = np.unique(xv[~np.isnan(xv)])
+        if not len(levels): continue
+        codes = np.where(np.isnan(xv), -1, np.searchsorted(levels, xv) * n_prof + prof)
+        moments = group_moments(codes, len(levels) * n_prof, values)
+        seen = np.flatnonzero(moments["obs"].any(axis=1))  # only (x, profile) cells that occur
+        cells.append(profiles.iloc[seen % n_prof].reset_index(drop=True).assign(xvar=x, x=levels[seen // n_prof]))
+        stats.append({k: v[seen] for k, v in moments.items()})
+    parts = []
+    if cells:
+        sets = GroupingSets(groupings, outcomes).add_cells(pd.concat(cells, ignore_index=True), {k: np.vstack([s[k] for s in stats]) for k in stats[0]})
+        for grouping, sub in sets.table().groupby("grouping", sort=False):
+            nest, dim = grouping.split(":")
+            chart, metric, geo = zip(*sub["xvar"].map(xcols))
+            parts.append(pd.DataFrame({
+                "chart": chart, "nest": nest, "nest_level": sub[NESTS[nest][0]].to_numpy(), "dim": dim, "dim_level": sub[DIMS[dim][0]].to_numpy(),
+                "metric": metric, "geo": geo, "outcome": sub["var"].to_numpy(), "x": sub["x"].to_numpy(),
+                "mean": sub["mean_val"].to_numpy(), "n": sub["n_val"].to_numpy()}))
+    if not parts:
+        return pd.DataFrame(columns=["chart", "nest", "nest_level", "nest_label", "dim", "dim_level", "dim_label", "metric", "geo", "outcome", "x", "mean", "n"])
+
+    out = pd.concat(parts, ignore_index=True)
+    for side, var_of in (("nest", lambda n: NESTS[n][0]), ("dim", lambda d: DIMS[d][0])):
+        lbl = np.empty(len(out), dtype=object)
+        for name, rows in out.groupby(side).indices.items():
+            lbl[rows] = out[f"{side}_level"].iloc[rows].map(labels[var_of(name)]).fillna("").to_numpy()
+        out.insert(out.columns.get_loc(f"{side}_level") + 1, f"{side}_label", lbl)
+    out["nest_level"], out["dim_level"], out["x"] = out["nest_level"].astype("int64"), out["dim_level"].astype("int64"), out["x"].astype("int64")
+
+    # Same order as the nested loops: dim, nest, nest level, outcome, metric, decline then geos; legend / x order inside
+    def rank(col, order):
+        return out[col].map({v: i for i, v in enumerate(order)})
+
+    keys = pd.DataFrame({"dim": rank("dim", list(DIMS)), "nest": rank("nest", NEST_LIST), "nest_level": out["nest_level"],
+                         "outcome": rank("outcome", outcomes), "metric": rank("metric", list(dict.fromkeys(m for _, m, _ in xcols.values()))),
+                         "geo": rank("geo", ["", "nat", "state", "county", "zip"]), "dim_level": out["dim_level"], "x": out["x"]})
+    return out.iloc[keys.sort_values(list(keys.columns), kind="stable").index].reset_index(drop=True)
+
+
+def chart_xcols(metrics, geos):
+    xcols = {}
+    for m in metrics:
+        xcols[f"lag_{m}_decline"] = ("decline", m, "")
+        for geo in geos:
+            xcols[f"lag_bin_{m}_{geo}"] = ("bin", m, geo)
+    return xcols
+
+
+# --- 5. ONE SCRIPT ---
+def build_charts(name, test=False):
+    cfg, bench = CHARTS[name], BENCHMARKS[name]
+    df = load_master(name, test)
+    outcomes = [v for v in BEHAVIOR_VARS if v in df.columns]  # capture confirm variable
+    xcols = chart_xcols(METRIC_SETS[bench["metrics"]], bench["geos"])
+    with run_profile.stage("chart_tables", name):
+        return chart_table(df, outcomes, xcols, chart_pairs(cfg["dims"]), chart_labels(cfg))
+
+
+def run_charts(names, profile=None, test=False):
+    run_profile.start(enabled=profile)
+    for name in names:
+        table = build_charts(name, test)
+        out_dir = os.path.join(OUTPUT_ROOT, *BENCHMARKS[name]["out_dir"])
+        os.makedirs(out_dir, exist_ok=True)
+        path = os.path.join(out_dir, f"charts_{name}.csv")
+        with run_profile.stage("write_csv", f"charts_{name}", outputs=[path]):
+            changed = write_if_changed(path, table.to_csv(index=False, na_rep="", lineterminator="\n"))
+        n_charts = len(table.groupby(["chart", "nest", "nest_level", "dim", "metric", "geo", "outcome"])) if len(table) else 0
+        print(f"[{name}] {n_charts} charts, {len(table)} points -> {path}{'' if changed else ' (unchanged)'}.")
+    run_profile.finish(OUTPUT_ROOT)
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    names = [a for a in args if not a.startswith("--")]
+    unknown = [n for n in names if n not in CHARTS]
+    if unknown:
+        sys.exit(f"Unknown script(s) {unknown}; choose from {list(CHARTS)}.")
+    run_charts(names or list(CHARTS), profile=True if "--profile" in args else None, test="--test" in args)
@@ -0,0 +1,84 @@
+import os
+import json
+import hashlib
+
+# Content-hash build manifest for the table/heatmap scripts.
+# Each output group (e.g. "{var}_ownership" = heatmap PNG + .tex + PDF) is
+# recorded with the SHA-256 of its input CSVs, the hash of the generator
+# code and its desc_dict entry. On the next run the group is skipped when
+# none of those changed and all of its outputs still exist.
+
+MANIFEST_NAME = "build_manifest.json"
+
+
+def hash_file(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def write_if_changed(path, text):
+    # Leaves untouched files alone so Dropbox does not re-sync identical output
+    if os.path.exists(path):
+        with open(path, 'r', encoding="utf-8") as f:
+            if f.read() == text: return False
+    with open(path, 'w', encoding="utf-8") as f: f.write(text)
+    return True
+
+
+class BuildManifest:
+
+    def __init__(self, path, code_files, force=False):
+        self.path = path
+        self.force = force or os.environ.get("NP_FORCE_REBUILD", "") == "1"
+        self.code_version = hashlib.sha256("".join(hash_file(f) for f in code_files).encode()).hexdigest()
+        self.entries = {}
+        self.n_skipped = 0
+        self.n_built = 0
+        self._hash_cache = {}
+
+        if os.path.exists(path):
+            try:
+                with open(path, 'r') as f: data = json.load(f)
+                self.entries = data.get("outputs", {})
+            except (OSError, ValueError):
+                print(f"[WARNING] Unreadable build manifest, rebuilding everything: {path}")
+
+    def add_known_hashes(self, file_hashes):
+        # Hashes already computed by whoever read the files (e.g. CsvTables)
+        self._hash_cache.update(file_hashes)
+
+    def _input_hashes(self, inputs):
+        hashes = {}
+        for path in inputs:
+            if path not in self._hash_cache:
+                self._hash_cache[path] = hash_file(path) if os.path.exists(path) else None
+            hashes[os.path.basename(path)] = self._hash_cache[path]
+        return hashes
+
+    def _signature(self, inputs, extra):
+        # Round-trip through JSON so tuples compare equal to what was loaded from disk
+        return json.loads(json.dumps({"code": self.code_version, "inputs": self._input_hashes(inputs), "extra": extra}))
+
+    def is_fresh(self, key, inputs, outputs, extra=None):
+        fresh = (not self.force
+                 and self.entries.get(key) == self._signature(inputs, extra)
+                 and all(os.path.exists(p) for p in outputs))
+        if fresh: self.n_skipped += 1
+        return fresh
+
+    def record(self, key, inputs, extra=None):
+        self.entries[key] = self._signature(inputs, extra)
+        self.n_built += 1
+
+    def forget(self, key):
+        self.entries.pop(key, None)
+
+    def save(self):
+        data = {"code": self.code_version, "outputs": dict(sorted(self.entries.items()))}
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w') as f: json.dump(data, f, indent=1)
+        os.replace(tmp_path, self.path)
+        print(f"Build manifest: {self.n_built} output group(s) regenerated, {self.n_skipped} unchanged and skipped.")
@@ -0,0 +1,442 @@
+import os
+import sys
+import time
+import textwrap
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import run_profile
+from benchmark_charts import CHARTS, DIMS, NESTS, LAG_YEARS
+from geo_benchmarks import BENCHMARKS
+from grouped_stats import OUTPUT_ROOT
+from quality_curves import CURVES, PANELS, SETTINGS, TIMINGS
+
+# Batch renderer for the connected-line charts of 08c / 08e / 08h / 08j /
+# 09c / 09e (decline flags and SD bins, from benchmark_charts) and the
+# binscatter quality curves of 08a / 08a_2yr_lag / 08b / 09a / 09b (from
+# quality_curves). The .do files draw every PNG through twoway / binscatter
+# and graph export one at a time; here the long chart tables are cut into
+# chart jobs (one small dict of arrays and strings per PNG) and drawn across
+# a process pool. Each process keeps one figure and recycles its axes, so a
+# chart costs one redraw and one savefig. Titles, axis labels, legend order,
+# the line_colors / line_symbols cycles, notes and the folder layout follow
+# the .do files; each run reports its throughput in charts per second.
+#
+# Output (per run, NP_CHART_FORMAT): "final" 2000 px wide as graph export
+# width(2000), "preview" 600 px for quick checks. NP_CHART_WORKERS sets the
+# pool size (default: one process per CPU).
+#
+#   python chart_render.py               -> every script whose table exists
+#   python chart_render.py 08c 08a       -> just the named script(s)
+#   python chart_render.py --profile     -> also write a per-stage run report (run_profile)
+
+# --- 1. STYLE (mirror the .do graph options) ---
+# line_colors "navy cranberry emerald orange purple maroon gs8" / line_symbols "O S D T X + *" (close RGB matches of the Stata names)
+LINE_COLORS = ["#1a476f", "#90353b", "#2e8b57", "#e8731e", "#6a3d9a", "#800000", "#808080"]
+LINE_SYMBOLS = ["o", "s", "D", "^", "x", "+", "*"]
+# binscatter's own cycle: navy maroon forest_green dkorange teal cranberry lavender khaki
+CURVE_COLORS = ["#1a476f", "#800000", "#228b22", "#ff8c00", "#008080", "#90353b", "#9a8fc9", "#bdb76b"]
+CURVE_SYMBOLS = ["o", "D", "s", "^", "x", "+", "o", "D"]
+
+CHART_OUTPUTS = {
+    "final": {"width": 2000},
+    "preview": {"width": 600},
+}
+FIGSIZE = (5.5, 4.5)  # Stata's default 5.5 in wide graph, a little taller for the notes
+NOTE_WIDTH = 120      # characters per note line at size(vsmall); the longest notes end near 0.82 of the figure width in preview
+
+SD_BIN_LABELS = {-4: "<-2 SD", -3: "-2 to -1", -2: "-1 to -.5", -1: "-.5 to 0", 1: "0 to .5", 2: ".5 to 1", 3: "1 to 2", 4: ">2 SD"}
+LAG_TXT = "1-Yr Lag" if LAG_YEARS == 1 else f"{LAG_YEARS}-Yr Lag"
+
+# c_title / v_note per behavior variable (else: the variable name, "Variable: var")
+OUTCOME_TITLES = {
+    "partd_opioid_rate": ("Opioid Rate", "Opioid Rate: Opioid claims as a proportion of total Part D claims."),
+    "partb_em_upcode_rate": ("Upcoding Rate", "Upcoding Rate: Level 4/5 Evaluation & Management visits as a proportion of total E&M visits."),
+    "partb_low_value_rate": ("Low-Value Care", "Low-Value Care: Choosing Wisely discouraged services as a proportion of total Part B services."),
+    "partb_imaging_adv_rate": ("Adv. Imaging", "Advanced Imaging: MRI and CT scans as a proportion of total Part B services."),
+    "partd_generic_rate": ("Generic Rx Rate", "Generic Rx Rate: Proportion of total Part D claims filled as generic."),
+    "bene_avg_risk_scre": ("Avg Risk Score", "Score: HCC Risk Score reflecting patient complexity."),
+    "tot_benes": ("Total Benes", "Count: Unique Medicare beneficiaries treated."),
+    "tot_sbmtd_chrg": ("Total Charges", "Financial: Total submitted Medicare charges ($)."),
+    "tot_srvcs": ("Total Services", "Count: Total Part B services billed."),
+    "tot_pymt_amt": ("Total Payment", "Financial: Total Medicare payments ($)."),
+}
+
+# m_title / ft_meas per metric code, by geo_benchmarks metric set
+METRIC_TITLES = {
+    "hcahps": {
+        "h100": ("Overall HCAHPS", "Metric: Overall 100-Point Composite."),
+        "g1": ("Staff Comm.", "Metric: Grp 1 (Staff Communication w/ Patient)."),
+        "g2": ("Patient Help", "Metric: Grp 2 (Providing the Patient Help)."),
+        "g3": ("Environment", "Metric: Grp 3 (Facility Cleanliness/Quietness)."),
+        "g4": ("Global Rating", "Metric: Grp 4 (Global Rating & Recommendation)."),
+        "h910": ("Rating 9-10", "Metric: % Patients Rating Hospital 9 or 10."),
+        "h06": ("Rating 0-6", "Metric: % Patients Rating Hospital 0 to 6."),
+    },
+    "oas": {
+        "o100": ("Overall OAS CAHPS", "Metric: Overall 100-Point OAS Composite."),
+        "g1": ("Prof. Care/Clean", "Metric: Grp 1 (Professional Care and Cleanliness)."),
+        "g2": ("Communication", "Metric: Grp 2 (Communication and Expectations)."),
+        "g3": ("Global Rating", "Metric: Grp 3 (Global Rating & Recommendation)."),
+        "o910": ("Rating 9-10", "Metric: % Patients Rating ASC 9 or 10."),
+        "o06": ("Rating 0-6", "Metric: % Patients Rating ASC 0 to 6."),
+    },
+    "mips": {
+        "m_final": ("Final MIPS Score", "Metric: MIPS Final Payment Adjustment Score."),
+        "m_qual": ("Quality Score", "Metric: MIPS Quality Performance Category."),
+        "m_pi": ("Interoperability", "Metric: MIPS Promoting Interoperability Category."),
+        "m_ia": ("Improvement Activities", "Metric: MIPS Improvement Activities Category."),
+        "m_cost": ("Cost Score", "Metric: MIPS Cost Performance Category."),
+    },
+}
+
+GEO_NAMES = {"nat": "National", "state": "State", "county": "County", "zip": "ZIP Code"}
+# Per-script overrides of the geo names and the by_dept footnote (09e has none)
+RENDER = {
+    "09c": {"geo_names": {"nat": "NYS"}},
+    "09e": {"geo_names": {"nat": "NYS Avg"}},
+}
+DEPT_NOTES = {
+    "three": "(1) Primary Care: Family Practice, General Practice. (2) General Medicine: Emerg. Medicine, Hospitalist, Internal Medicine, "
+             "NP, PA, Pain Management. (3) Other Specialties: e.g., Cardiology, Orthopedic Surgery, Radiology, Oncology.",
+    "gen_med": "(1) General Medicine: Emerg. Medicine, Family Medicine/Practice, General Medicine/Practice, Hospitalist, Internal Medicine, "
+               "NP, PA, Pain Management. (2) Other Specialties: e.g., Cardiology, Orthopedic Surgery, Radiology, Oncology.",
+    "primary": "",
+}
+
+# Quality curves: (title, description) per variable, as the 08a / 08b loops set q_title / q_desc and b_title / b_desc
+CURVE_TITLES = {
+    "mips_final_score": ("MIPS Final Score", "Quality: 0-100 composite payment adjustment score."),
+    "mips_quality_score": ("MIPS Quality Domain", "Quality: 0-100 score on evidence-based quality measures."),
+    "mips_pi_score": ("MIPS Promoting Interoperability", "Quality: 0-100 score on EHR integration."),
+    "mips_ia_score": ("MIPS Improvement Activities", "Quality: 0-100 score on practice improvements."),
+    "mips_cost_score": ("MIPS Cost Domain", "Efficiency: 0-100 score on resource use."),
+    "partd_generic_rate": ("Generic Prescribing Rate", "Behavior: % of Part D claims filled as generic."),
+    "partd_opioid_rate": ("Opioid Prescribing Rate", "Behavior: % of Part D claims for Schedule II/III opioids."),
+    "partb_em_upcode_rate": ("E&M Upcode Rate", "Behavior: % of E&M visits billed at highest intensity (Lvl 4/5)."),
+    "bene_avg_risk_scre": ("Average Patient Risk Score", "Behavior: HCC risk score of treated panel."),
+    "tot_benes": ("Total Beneficiaries", "Volume: Total unique Medicare patients treated."),
+    "tot_sbmtd_chrg": ("Total Submitted Charges", "Financial: Total dollars billed to Medicare."),
+    "total_rvu": ("Total RVUs", "Volume: Sum of all Relative Value Units."),
+    "total_services": ("Total Services", "Volume: Total distinct Medicare Part B services billed."),
+    "total_medicare_payment": ("Total Medicare Payment", "Financial: Total dollars paid out by Medicare."),
+    "hcahps_100_score": ("HCAHPS Overall Score", "HCAHPS: 0-100 linear score for overall patient satisfaction."),
+    "hcahps_grp1": ("HCAHPS Staff Comm", "HCAHPS: 0-100 composite for Staff Communication."),
+    "hcahps_grp2": ("HCAHPS Patient Help", "HCAHPS: 0-100 composite for Patient Responsiveness & Help."),
+    "hcahps_grp3": ("HCAHPS Environment", "HCAHPS: 0-100 composite for Cleanliness & Quietness."),
+    "hcahps_grp4": ("HCAHPS Global Rating", "HCAHPS: 0-100 composite for Hospital Recommendation."),
+    "oas_100_score": ("OAS CAHPS Overall", "OAS CAHPS: 0-100 score for overall ASC satisfaction."),
+    "oas_grp1": ("OAS CAHPS Comm", "OAS CAHPS: 0-100 composite for Patient Communication."),
+    "oas_grp2": ("OAS CAHPS Care/Clean", "OAS CAHPS: 0-100 composite for Care & Cleanliness."),
+    "oas_grp3": ("OAS CAHPS Prep/Discharge", "OAS CAHPS: 0-100 composite for ASC Prep & Discharge."),
+    "hac_total_score": ("HAC Penalty Score", "Safety: 1-10 Hospital-Acquired Condition index. Higher is worse."),
+    "mspb_score": ("Medicare Spending Per Bene", "Efficiency: Hospital spending vs national median (1.0 = Avg)."),
+    "hvbp_tps_score": ("Value-Based Purchasing", "Quality: 0-100 Total Performance Score."),
+    "fac_mips_final_score": ("MIPS Final Score", "MIPS: Facility-weighted avg of providers' composite score."),
+    "fac_mips_quality_score": ("MIPS Quality", "MIPS: Facility-weighted avg of Quality domain."),
+    "fac_mips_pi_score": ("MIPS PI", "MIPS: Facility-weighted avg of Promoting Interoperability."),
+    "fac_mips_ia_score": ("MIPS IA", "MIPS: Facility-weighted avg of Improvement Activities."),
+    "fac_mips_cost_score": ("MIPS Cost", "MIPS: Facility-weighted avg of Cost domain."),
+    "asc_rate_1": ("ASC Burns Rate", "Safety: % of patients experiencing a burn before discharge."),
+    "asc_rate_2": ("ASC Falls Rate", "Safety: % of patients experiencing a fall within the ASC."),
+    "asc_rate_8": ("ASC Flu Vax Rate", "Safety: % of personnel vaccinated for influenza."),
+}
+# 08b builds these from the variable name: rrp_excess_ratio_ami -> "Readmission Ratio AMI"
+CURVE_PREFIX_TITLES = {
+    "rrp_excess_ratio_": ("Readmission Ratio", "Quality: Observed/Expected readmissions. Ratio > 1.0 triggers penalties."),
+    "mortality_rate_": ("Mortality Rate", "Quality: 30-Day risk-standardized mortality rate."),
+    "hopd_": ("HOPD", "Efficiency: Outpatient department imaging/care volume metric."),
+}
+# x-axis prefix per timing folder
+TIMING_LABELS = {"current_year": "", "lag_prior_year": "Prior Year ", "lead_next_year": "Next Year ", "lag_two_year": "2-Year Prior "}
+# t_note per level, timing and lagged side (Quality / Behavior); the facility scripts word them differently
+TIMING_NOTES = {
+    "provider": {"current_year": "Timing: Both variables represent concurrent year performance.",
+                 "lag_prior_year": "Timing: X-Axis ({}) is lagged. Reflects PRIOR year performance.",
+                 "lead_next_year": "Timing: X-Axis ({}) is leading. Reflects NEXT year performance.",
+                 "lag_two_year": "Timing: X-Axis ({}) is lagged by 2 years."},
+    "facility": {"current_year": "Timing: Both variables represent performance in the concurrent year.",
+                 "lag_prior_year": "Timing: X-Axis ({}) is lagged. It reflects performance in the PRIOR year.",
+                 "lead_next_year": "Timing: X-Axis ({}) is leading. It reflects performance in the NEXT year.",
+                 "lag_two_year": "Timing: X-Axis ({}) is lagged 2 years. It reflects performance TWO years prior."},
+}
+METHOD_NOTES = {
+    "provider": ["Method: Dots represent quantile means. Line represents quadratic fit."],
+    "facility": ["Method: Each dot is the mean y-value within an equal-sized bin (quantile) of the x-variable.",
+                 "Line is a quadratic fit across all underlying facility-year observations."],
+}
+CURVE_DEPT_NOTE = "Dept: Primary Care = Family/Gen Prac. Gen Med = Internal Med w/o subspec."
+# subgroup folder -> (title prefix, file tag)
+SUBGROUP_TITLES = {
+    "overall": ("Overall", "overall"), "by_prov_type": ("By Prov", "prov"), "by_gender": ("By Gender", "gen"),
+    "by_dept": ("By Dept", "dept"), "by_grad_decade": ("By Grad Decade", "grad"), "by_authority": ("By Law", "auth"),
+    "by_ownership": ("By Own", "own"),
+}
+
+_canvas = None
+_made_dirs = set()
+plt = None
+
+
+def default_workers():
+    env_workers = os.environ.get("NP_CHART_WORKERS", "")
+    if env_workers.strip().isdigit() and int(env_workers) > 0:
+        return int(env_workers)
+    return max(1, os.cpu_count() or 1)
+
+
+def default_output():
+    env_output = os.environ.get("NP_CHART_FORMAT", "").strip().lower()
+    return env_output if env_output in CHART_OUTPUTS else "final"
+
+
+def load_plotting():
+    # Returns the seconds spent importing (0 once loaded)
+    global plt
+    if plt is not None:
+        return 0.0
+    start = time.perf_counter()
+    import matplotlib
+    matplotlib.use("Agg")  # file output only; never start a GUI backend on batch nodes
+    import matplotlib.pyplot as pyplot
+    plt = pyplot
+    return time.perf_counter() - start
+
+
+def n_clean(label):
+    # subinstr(subinstr(n_lbl, "/", "_", .), " ", "_", .)
+    return str(label).replace("/", "_").replace(" ", "_")
+
+
+def curve_title(var):
+    # (title, description) of a quality-curve variable; unknown variables keep their name and no note
+    if var in CURVE_TITLES:
+        return CURVE_TITLES[var]
+    for prefix, (title, desc) in CURVE_PREFIX_TITLES.items():
+        if var.startswith(prefix): return f"{title} {var[len(prefix):].upper()}", desc
+    return var, ""
+
+
+# --- 2. CHART JOBS: BENCHMARK TABLES ---
+def chart_folder(name, base_out, dim, nest, nest_label):
+    cfg = CHARTS[name]
+    dim_folder = cfg.get("dim_folders", {}).get(dim, DIMS[dim][2])
+    if nest == "none" and cfg.get("flat_none"):
+        return os.path.join(base_out, dim_folder)  # 09c shortens the un-nested path (MAX_PATH)
+    return os.path.join(base_out, dim_folder, NESTS[nest][1], n_clean(nest_label))
+
+
+def benchmark_jobs(name, table, base_out, output="final"):
+    # One job per (nest, nest level, dim, outcome, metric, chart, geo) in the .do loop order
+    cfg, rcfg = CHARTS[name], RENDER.get(name, {})
+    metric_titles = METRIC_TITLES[BENCHMARKS[name]["metrics"]]
+    geo_names = {**GEO_NAMES, **rcfg.get("geo_names", {})}
+    dept_note = DEPT_NOTES[cfg["spec"]]
+    table = table.assign(geo=table["geo"].fillna(""))
+    x, y, lvl = (table[c].to_numpy() for c in ("x", "mean", "dim_level"))
+    labels = table["dim_label"].to_numpy()
+    keys = ["nest", "nest_level", "nest_label", "dim", "outcome", "metric", "chart", "geo"]
+    jobs = []
+    for (nest, _, nest_label, dim, var, m, chart, geo), rows in table.groupby(keys, sort=False).indices.items():
+        c_title, v_note = OUTCOME_TITLES.get(var, (var, f"Variable: {var}"))
+        m_title, ft_meas = metric_titles.get(m, (m, ""))
+        dim_name = DIMS[dim][1]
+        n_title = "" if nest == "none" else f" ({nest_label})"
+        folder = chart_folder(name, base_out, dim, nest, nest_label)
+        if chart == "decline":
+            title = f"{c_title} Drop: {dim_name}{n_title}"
+            xtitle = f"{m_title} Declined ({LAG_TXT})"
+            xticks = ([0, 1], ["No Decline", "Declined"], 0, 6)
+            ft = f"Benchmark: Current year behavior vs prior {LAG_TXT} decline in {m_title}."
+            path = os.path.join(folder, f"decline_{m}_by_{var}.png")
+        else:
+            gname = geo_names[geo]
+            title = f"{gname} {m_title}: {dim_name}{n_title}"
+            xtitle = f"SDs from {gname} {m_title} ({LAG_TXT})"
+            xticks = (list(SD_BIN_LABELS), list(SD_BIN_LABELS.values()), 45, 5)
+            ft = f"Benchmark: SD bins represent distance from {gname} {m_title} mean ({LAG_TXT})."
+            path = os.path.join(folder, f"bin_{m}_{geo}_by_{var}.png")
+        notes = [v_note, ft_meas, ft] + ([dept_note] if dim == "spec" and dept_note else [])
+
+        # levelsof dim_var: one connected series per level, colors / symbols by position
+        series = []
+        for c, level in enumerate(np.unique(lvl[rows])):
+            sel = rows[lvl[rows] == level]
+            sel = sel[np.argsort(x[sel], kind="stable")]
+            series.append((labels[sel[0]], x[sel], y[sel], LINE_COLORS[c % len(LINE_COLORS)], LINE_SYMBOLS[c % len(LINE_SYMBOLS)]))
+        jobs.append({"kind": "connected", "out_path": path, "title": title, "xtitle": xtitle, "ytitle": c_title, "xticks": xticks,
+                     "series": series, "fits": [], "legend": True, "notes": notes, "output": output})
+    return jobs
+
+
+# --- 3. CHART JOBS: QUALITY CURVES ---
+def curve_jobs(name, table, base_dir, output="final"):
+    # One job per binscatter call: (direction, timing, subgroup, y, x), groups in ascending by() order
+    cfg = CURVES[name]
+    level, prefix = cfg["level"], "NYS " if cfg.get("ny_only") else ""
+    x, y, grp = (table[c].to_numpy() for c in ("x_mean", "y_mean", "group"))
+    labels = table["group_label"].to_numpy()
+    fit = table[["fit_b0", "fit_b1", "fit_b2"]].to_numpy()
+    keys = ["direction", "timing", "subgroup", "y_var", "x_var"]
+    jobs = []
+    for (d, t, sub, y_var, x_var), rows in table.groupby(keys, sort=False).indices.items():
+        base_y, base_x = y_var, x_var[len(TIMINGS[t][0]):]
+        y_label = curve_title(base_y)[0]
+        x_label = TIMING_LABELS[t] + curve_title(base_x)[0]
+        q_var, b_var = (base_x, base_y) if d == "quality_predicts_behavior" else (base_y, base_x)
+        side = "Quality" if d == "quality_predicts_behavior" else "Behavior"
+        t_note = TIMING_NOTES[level][t].format(side)
+        notes = [curve_title(b_var)[1], curve_title(q_var)[1], t_note]
+        notes += ([CURVE_DEPT_NOTE] if sub == "by_dept" else []) + METHOD_NOTES[level]
+        sub_title, tag = SUBGROUP_TITLES[sub]
+
+        series, fits = [], []
+        groups = pd.unique(grp[rows]) if sub == "overall" else np.unique(grp[rows])
+        for c, g in enumerate(groups):
+            sel = rows[grp[rows] == g] if sub != "overall" else rows
+            color = CURVE_COLORS[c % len(CURVE_COLORS)]
+            series.append((labels[sel[0]], x[sel], y[sel], color, CURVE_SYMBOLS[c % len(CURVE_SYMBOLS)]))
+            fits.append((*fit[sel[0]], x[sel].min(), x[sel].max(), color))
+        jobs.append({"kind": "scatter", "out_path": os.path.join(base_dir, d, t, sub, f"curve_{tag}_{y_var}_vs_{x_var}.png"),
+                     "title": f"{prefix}{sub_title}: {y_label} vs {x_label}", "xtitle": x_label, "ytitle": y_label, "xticks": None,
+                     "series": series, "fits": fits, "legend": sub != "overall", "notes": [n for n in notes if n], "output": output})
+    return jobs
+
+
+# --- 4. FIGURE RECYCLING / RENDER ONE CHART ---
+def _get_canvas():
+    global _canvas
+    if _canvas is None:
+        fig = plt.figure(figsize=FIGSIZE, facecolor="white")
+        ax = fig.add_axes([0.13, 0.43, 0.83, 0.48])
+        ax.tick_params(labelsize=6)
+        ax.grid(axis="y", color="#eaf2f3", linewidth=0.6)
+        note = fig.text(0.02, 0.17, "", ha="left", va="top", fontsize=5, color="#333333", linespacing=1.3)
+        _canvas = {"fig": fig, "ax": ax, "note": note, "legend": None}
+    return _canvas
+
+
+def _reset(canvas):
+    # Drop the previous chart's lines but keep the axes: ax.clear() would rebuild every tick and text object
+    for line in canvas["ax"].lines[:]:
+        line.remove()
+    if canvas["legend"] is not None:
+        canvas["legend"].remove()
+        canvas["legend"] = None
+
+
+def render_chart(job):
+    load_plotting()
+    start, cpu_start = time.perf_counter(), time.process_time()
+    canvas = _get_canvas()
+    fig, ax = canvas["fig"], canvas["ax"]
+    _reset(canvas)
+
+    for label, xs, ys, color, marker in job["series"]:
+        if job["kind"] == "connected":
+            ax.plot(xs, ys, color=color, marker=marker, markersize=4, linewidth=1.2, label=label)
+        else:
+            ax.plot(xs, ys, color=color, marker=marker, markersize=4, linestyle="none", label=label)
+    for b0, b1, b2, lo, hi, color in job["fits"]:
+        xs = np.linspace(lo, hi, 50)
+        ax.plot(xs, b0 + b1 * xs + b2 * xs * xs, color=color, linewidth=1.0)
+    ax.relim()
+    ax.autoscale_view()
+
+    ax.set_title(job["title"], fontsize=9, color="black", y=1.02)  # a fixed y skips matplotlib's title placement pass
+    ax.set_xlabel(job["xtitle"], fontsize=7)
+    ax.set_ylabel(job["ytitle"], fontsize=7)
+    if job["xticks"] is not None:
+        ticks, tick_labels, angle, size = job["xticks"]
+        ax.set_xticks(ticks, tick_labels)
+        ax.tick_params(axis="x", labelrotation=angle, labelsize=size)
+    else:
+        ax.xaxis.set_major_locator(plt.AutoLocator())
+        ax.xaxis.set_major_formatter(plt.ScalarFormatter())
+        ax.tick_params(axis="x", labelrotation=0, labelsize=6)
+    if job["legend"]:
+        # legend(order(...) position(6) rows(1)): one row below the x title, above the notes
+        canvas["legend"] = fig.legend(loc="upper center", bbox_to_anchor=(0.5, 0.255), ncol=max(1, len(job["series"])), fontsize=6,
+                                      handlelength=2.5, columnspacing=1.2)
+    canvas["note"].set_text("\n".join(textwrap.fill(n, NOTE_WIDTH) for n in job["notes"]))
+    drawn, cpu_drawn = time.perf_counter(), time.process_time()
+
+    folder = os.path.dirname(job["out_path"])
+    if folder not in _made_dirs:
+        os.makedirs(folder, exist_ok=True)
+        _made_dirs.add(folder)
+    fig.savefig(job["out_path"], dpi=CHART_OUTPUTS[job["output"]]["width"] / FIGSIZE[0])
+    end, cpu_end = time.perf_counter(), time.process_time()
+    return job["out_path"], end - start, {"draw": (drawn - start, cpu_drawn - cpu_start), "savefig": (end - drawn, cpu_end - cpu_drawn)}
+
+
+# --- 5. RENDER MANY (IN-PROCESS OR PROCESS POOL) ---
+def render_charts(jobs, workers=None, item=None):
+    if not jobs:
+        return []
+    workers = min(workers or default_workers(), len(jobs))
+    start = time.perf_counter()
+
+    if workers <= 1:
+        print(f"Loaded matplotlib in {load_plotting():.2f}s.")
+        timings = [render_chart(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            timings = list(executor.map(render_chart, jobs, chunksize=max(1, min(64, len(jobs) // (4 * workers)))))
+
+    # Thousands of PNGs per script: the run report gets per-step totals, not one row per chart
+    for step in ("draw", "savefig"):
+        run_profile.add(step, item, sum(t[2][step][0] for t in timings), sum(t[2][step][1] for t in timings),
+                        outputs=[t[0] for t in timings] if step == "savefig" else ())
+    total = time.perf_counter() - start
+    print(f"Rendered {len(timings)} charts in {total:.1f}s with {workers} process(es) ({len(timings) / total:.1f} charts/s).")
+    return timings
+
+
+# --- 6. SCRIPTS ---
+def _read_table(path):
+    return pd.read_csv(path, keep_default_na=False, na_values=[""]) if os.path.exists(path) else None
+
+
+def script_jobs(name, output="final"):
+    # [(table path, jobs)] for one script; tables that were never built are skipped
+    if name in CHARTS:
+        base_out = os.path.join(OUTPUT_ROOT, *BENCHMARKS[name]["out_dir"])
+        path = os.path.join(base_out, f"charts_{name}.csv")
+        table = _read_table(path)
+        return [] if table is None or table.empty else [(path, benchmark_jobs(name, table, base_out, output))]
+    cfg, out = CURVES[name], []
+    for setting in SETTINGS:
+        if (cfg["level"], setting) not in PANELS: continue
+        base_dir = os.path.join(OUTPUT_ROOT, setting, "quality_curves", cfg["analysis"])
+        path = os.path.join(base_dir, f"bins_{name}.csv")
+        table = _read_table(path)
+        if table is not None and not table.empty:
+            out.append((path, curve_jobs(name, table, base_dir, output)))
+    return out
+
+
+def run_render(names, profile=None, workers=None, output=None):
+    run_profile.start(enabled=profile)
+    output = output or default_output()
+    start, n_charts = time.perf_counter(), 0
+    for name in names:
+        for path, jobs in script_jobs(name, output):
+            print(f"[{name}] {len(jobs)} charts from {path}")
+            n_charts += len(render_charts(jobs, workers, item=os.path.basename(path)))
+    total = time.perf_counter() - start
+    if n_charts:
+        print(f"=== {n_charts} charts in {total:.1f}s ({n_charts / total:.1f} charts/s, {output}) ===")
+    run_profile.finish(OUTPUT_ROOT)
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    names = [a for a in args if not a.startswith("--")]
+    known = list(CHARTS) + list(CURVES)
+    unknown = [n for n in names if n not in known]
+    if unknown:
+        sys.exit(f"Unknown script(s) {unknown}; choose from {known}.")
+    run_render(names or known, profile=True if "--profile" in args else None)
@@ -0,0 +1,235 @@
+import os
+import io
+import sys
+import json
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+from label_codes import decode_codes
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    import pyarrow.feather as feather
+except ImportError:
+    pa = pq = feather = None
+
+# One-scan ingestion of a tables_csv folder.
+# The Stata collapse step writes one small CSV per variable and table kind
+# ({var}_by_auth_year.csv, {var}_universal.csv, ...). CsvTables lists the
+# folder once, reads every file concurrently and stacks them into a single
+# long frame keyed by (var_name, table_kind, np_authority, own_category,
+# prov_type, year). Group codes are decoded once for the whole folder into
+# ordered categoricals (label_codes). The master loops then slice that frame
+# instead of opening each CSV on the synced drive themselves.
+#
+# Bundles: the same long frame can be stored as ONE columnar file per setting
+# next to the folder (tables_csv.parquet or tables_csv.feather), with typed
+# mean_val / sd_val / n_val columns and the per-table column lists and CSV
+# hashes in the file metadata. CsvTables reads a bundle memory-mapped when it
+# exists and is not older than the CSVs, and falls back to the CSVs otherwise
+# (or always with NP_TABLE_SOURCE=csv). Manifest inputs keep pointing at the
+# CSV paths with the bundled hashes, so switching source rebuilds nothing.
+#
+#   python csv_ingest.py                   -> bundle every report_engine setting (Parquet)
+#   python csv_ingest.py <tables_csv> ...  -> bundle the given folders (--feather for Feather)
+
+# --- 1. FILE NAMING ---
+# Longest suffix first, so "_universal_by_year" is never read as "_universal"
+TABLE_KINDS = ["universal_by_year", "by_auth_ownership", "by_auth_provtype", "by_auth_year", "by_authority", "universal"]
+KIND_KEYS = {
+    "universal_by_year": ["year"],
+    "by_auth_ownership": ["np_authority", "own_category"],
+    "by_auth_provtype": ["np_authority", "prov_type"],
+    "by_auth_year": ["np_authority", "year"],
+    "by_authority": ["np_authority"],
+    "universal": [],
+}
+KEY_COLS = ["var_name", "table_kind", "np_authority", "own_category", "prov_type", "year"]
+CODE_COLS = ["np_authority", "own_category", "prov_type"]
+VALUE_TYPES = {"mean_val": "float64", "sd_val": "float64", "n_val": "Int64"}  # n_val falls back to float64 if not whole
+BUNDLE_FORMATS = {"parquet": ".parquet", "feather": ".feather"}
+BUNDLE_META = b"np_tables"
+
+
+def split_csv_name(filename):
+    if not filename.endswith(".csv"):
+        return None
+    stem = filename[:-4]
+    for kind in TABLE_KINDS:
+        if stem.endswith(f"_{kind}"):
+            return stem[:-len(kind) - 1], kind
+    return None
+
+
+def default_workers():
+    env_workers = os.environ.get("NP_CSV_WORKERS", "")
+    if env_workers.strip().isdigit() and int(env_workers) > 0:
+        return int(env_workers)
+    return min(32, (os.cpu_count() or 1) + 4)
+
+
+def default_source():
+    return "csv" if os.environ.get("NP_TABLE_SOURCE", "").strip().lower() == "csv" else "auto"
+
+
+def bundle_path(csv_dir, fmt="parquet"):
+    return os.path.normpath(csv_dir) + BUNDLE_FORMATS[fmt]
+
+
+def find_bundle(csv_dir):
+    # Newest existing bundle for this folder, or None
+    found = [p for p in (bundle_path(csv_dir, fmt) for fmt in BUNDLE_FORMATS) if os.path.exists(p)]
+    return max(found, key=os.path.getmtime) if found else None
+
+
+# --- 2. READ ONE FILE ---
+def _read_one(key, path):
+    var_name, kind = key
+    # Read the bytes once: they feed both the parser and the build manifest hash
+    with open(path, 'rb') as f: data = f.read()
+    digest = hashlib.sha256(data).hexdigest()
+
+    # Codes are read as text ("1" / "1.0" / "Restricted") and decoded after stacking
+    try:
+        df = pd.read_csv(io.BytesIO(data), dtype={c: str for c in CODE_COLS})
+    except pd.errors.EmptyDataError:
+        df = pd.DataFrame()
+    df = df.drop(columns=["overall"], errors="ignore")
+    df.insert(0, "table_kind", kind)
+    df.insert(0, "var_name", var_name)
+    return key, path, digest, df
+
+
+def _type_values(frame):
+    for col, dtype in VALUE_TYPES.items():
+        if col not in frame.columns: continue
+        values = pd.to_numeric(frame[col], errors="coerce")
+        if dtype == "Int64" and not (values.dropna() % 1 == 0).all(): dtype = "float64"
+        frame[col] = values.astype(dtype)
+    return frame
+
+
+# --- 3. LONG-FORMAT TABLE STORE ---
+class CsvTables:
+
+    def __init__(self, csv_dir, kinds=None, workers=None, source=None):
+        self.csv_dir = csv_dir
+        self.kinds = list(kinds) if kinds else list(TABLE_KINDS)
+        self.files = {}
+        self.file_hashes = {}
+        self.columns = {}
+
+        # Single directory scan
+        newest_csv = 0.0
+        if os.path.isdir(csv_dir):
+            with os.scandir(csv_dir) as entries:
+                for entry in entries:
+                    parsed = split_csv_name(entry.name) if entry.is_file() else None
+                    if parsed and parsed[1] in self.kinds:
+                        self.files[parsed] = entry.path
+                        newest_csv = max(newest_csv, entry.stat().st_mtime)
+
+        bundle = find_bundle(csv_dir) if (source or default_source()) != "csv" else None
+        if bundle and os.path.getmtime(bundle) < newest_csv:
+            print(f"[WARNING] {bundle} is older than the CSVs in {csv_dir}; reading the CSVs (re-run csv_ingest.py to refresh it).")
+            bundle = None
+        if bundle and pa is None:
+            print(f"[WARNING] pyarrow is not installed, so {bundle} cannot be read; reading the CSVs.")
+            bundle = None
+
+        frame = self._read_bundle(bundle) if bundle else self._read_csvs(workers)
+        for col in KEY_COLS:
+            if col not in frame.columns: frame[col] = pd.Series(dtype=object)
+        for col in ["var_name", "table_kind"]:
+            frame[col] = frame[col].astype("category")
+        for col in CODE_COLS:
+            frame[col] = decode_codes(frame[col], col)
+        frame["year"] = frame["year"].astype("Int64")
+        frame = _type_values(frame)
+        self.frame = frame[KEY_COLS + [c for c in frame.columns if c not in KEY_COLS]]
+        self._rows = self.frame.groupby(["var_name", "table_kind"], observed=True).indices if len(self.frame) else {}
+        self.source = bundle or csv_dir
+
+        if bundle: print(f"Loaded {len(self.files)} tables ({len(self.frame)} rows) from {bundle}.")
+        else: print(f"Loaded {len(self.files)} CSV files ({len(self.frame)} rows) from {csv_dir}.")
+
+    def _read_csvs(self, workers=None):
+        frames = []
+        if self.files:
+            workers = min(workers or default_workers(), len(self.files))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                for key, path, digest, df in executor.map(lambda item: _read_one(*item), self.files.items()):
+                    self.file_hashes[path] = digest
+                    self.columns[key] = [c for c in df.columns if c not in KEY_COLS]
+                    frames.append(df)
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+    def _read_bundle(self, path):
+        # Memory-mapped: only the pages pandas actually touches are read from disk
+        reader = pq.read_table if path.endswith(".parquet") else feather.read_table
+        table = reader(path, memory_map=True)
+        meta = json.loads(table.schema.metadata[BUNDLE_META])
+        self.files = {}
+        for var_name, kind, columns, digest in meta["tables"]:
+            if kind not in self.kinds: continue
+            self.files[(var_name, kind)] = self.path(var_name, kind)
+            self.file_hashes[self.path(var_name, kind)] = digest
+            self.columns[(var_name, kind)] = columns
+        frame = table.to_pandas()
+        return frame[frame["table_kind"].isin(self.kinds)].reset_index(drop=True)
+
+    def path(self, var_name, kind):
+        return os.path.join(self.csv_dir, f"{var_name}_{kind}.csv")
+
+    def has(self, var_name, kind):
+        return (var_name, kind) in self.files
+
+    def var_names(self, kinds):
+        return sorted({var_name for var_name, kind in self.files if kind in kinds})
+
+    def get(self, var_name, kind):
+        # Same columns pd.read_csv gave for that file (minus the "overall" label); None if the file is absent
+        if not self.has(var_name, kind):
+            return None
+        rows = self._rows.get((var_name, kind), [])
+        df = self.frame.iloc[rows][KIND_KEYS[kind] + self.columns[(var_name, kind)]].reset_index(drop=True)
+        if "year" in df.columns:
+            df["year"] = df["year"].astype("int64")
+        return df
+
+
+# --- 4. BUNDLE WRITER (tables_csv folder -> one Parquet / Feather file) ---
+def write_bundle(csv_dir, fmt="parquet", out_path=None):
+    if pa is None:
+        raise ImportError("Writing a table bundle needs pyarrow (pip install pyarrow).")
+    out_path = out_path or bundle_path(csv_dir, fmt)
+    tables = CsvTables(csv_dir, source="csv")
+
+    frame = tables.frame.copy()
+    for col in CODE_COLS:
+        frame[col] = frame[col].astype(object)  # labels as plain strings; decoded again on load
+    meta = {"tables": [[var_name, kind, tables.columns[(var_name, kind)], tables.file_hashes[path]]
+                       for (var_name, kind), path in sorted(tables.files.items())]}
+    table = pa.Table.from_pandas(frame.reset_index(drop=True), preserve_index=False)
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), BUNDLE_META: json.dumps(meta).encode()})
+
+    tmp_path = out_path + ".tmp"
+    if fmt == "parquet": pq.write_table(table, tmp_path)
+    else: feather.write_feather(table, tmp_path)
+    os.replace(tmp_path, out_path)
+    print(f"Bundled {len(tables.files)} tables into {out_path} ({os.path.getsize(out_path) / 1024:.0f} KB).")
+    return out_path
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    fmt = "feather" if "--feather" in args else "parquet"
+    folders = [a for a in args if not a.startswith("--")]
+    if not folders:
+        from report_engine import SETTINGS
+        folders = [os.path.join(cfg["base_dir"], "tables_csv") for cfg in SETTINGS.values() if "demographics" not in cfg]
+    for folder in folders:
+        if os.path.isdir(folder): write_bundle(folder, fmt)
+        else: print(f"[WARNING] No such folder, skipped: {folder}")
@@ -0,0 +1,235 @@
+import os
+import pickle
+import sys
+import tempfile
+import numpy as np
+import pandas as pd
+
+# Bounded-memory access to the master .dta panels.
+# iter_dta reads a panel in fixed-size row blocks holding only the requested
+# columns. Moments keeps running count / mean / M2 per group for many
+# columns (plus tot_benes-style analytic-weight sums when weighted), so a
+# summary table is built block by block and never needs the whole panel.
+# Block results are merged with the pairwise (Chan et al.) update; inside a
+# block every column is one pass of sums shifted per group (group_moments),
+# so nothing is computed as a difference of large raw sums.
+#
+# Steps that need every row of one panel id together (duplicates drop npi
+# year, L. deltas) go through partitioned(): blocks are spilled to temporary
+# files by hash of the panel id and handed back one partition at a time.
+#
+# Block size: NP_STREAM_ROWS (default 200000). Partitions: NP_STREAM_PARTS
+# (default one per 256 MB of .dta).
+#
+#   python dta_stream.py --check   -> group_moments vs a two-pass mean / SD on groups up to 1e8 SD apart
+
+PART_BYTES = 256 * 1024 * 1024
+
+
+# --- 1. SETTINGS ---
+def default_chunk_rows():
+    env_rows = os.environ.get("NP_STREAM_ROWS", "")
+    return int(env_rows) if env_rows.strip().isdigit() and int(env_rows) > 0 else 200000
+
+
+def default_partitions(path):
+    env_parts = os.environ.get("NP_STREAM_PARTS", "")
+    if env_parts.strip().isdigit() and int(env_parts) > 0:
+        return int(env_parts)
+    return max(1, -(-os.path.getsize(path) // PART_BYTES))
+
+
+# --- 2. CHUNKED READER ---
+def iter_dta(path, columns=None, chunk_rows=None):
+    # StataReader's own iterator ignores columns=, so each block is read explicitly
+    chunk_rows = chunk_rows or default_chunk_rows()
+    with pd.read_stata(path, iterator=True) as reader:
+        while True:
+            try:
+                chunk = reader.read(nrows=chunk_rows, columns=columns)
+            except StopIteration:
+                return
+            if chunk.empty:
+                return
+            yield chunk
+
+
+def partitioned(path, columns, key, chunk_rows=None, partitions=None):
+    # Rows of one panel id always land in the same partition, in file order
+    partitions = partitions or default_partitions(path)
+    with tempfile.TemporaryDirectory(prefix="np_stream_") as tmp:
+        paths = [os.path.join(tmp, f"part_{i}.pkl") for i in range(partitions)]
+        files = [open(p, 'wb') for p in paths]
+        try:
+            for chunk in iter_dta(path, columns, chunk_rows):
+                part = pd.util.hash_pandas_object(chunk[key].astype(object), index=False).to_numpy() % partitions
+                for i, rows in pd.Series(part).groupby(part).indices.items():
+                    pickle.dump(chunk.iloc[rows], files[i], protocol=pickle.HIGHEST_PROTOCOL)
+        finally:
+            for f in files: f.close()
+
+        for p in paths:
+            blocks = []
+            with open(p, 'rb') as f:
+                while True:
+                    try: blocks.append(pickle.load(f))
+                    except EOFError: break
+            if blocks:
+                yield pd.concat(blocks, ignore_index=True)
+
+
+# --- 3. ONLINE ACCUMULATORS ---
+def group_moments(codes, size, values, weights=None):
+    # Per group code (0..size-1; -1 = skip) and column: weight total n, observation count, (weighted) sum, mean, M2.
+    # One pass of bincounts per column over values shifted per group, d = x - K[g] (K[g] = the group's first usable
+    # value in that column), so M2 = S(w d^2) - S(w d)^2 / S(w) is taken around a point inside each group. A single
+    # column-wide shift does cancel: groups ~1e7 SD away from it lose most digits (python dta_stream.py --check).
+    # Rows with a missing value (or, weighted, a missing / non-positive weight) go to a spill bin past the groups.
+    rows, k = values.shape
+    stats = {key: np.zeros((size, k)) for key in ("n", "obs", "sum", "mean", "m2")}
+    if not rows: return stats
+    skip_row = codes < 0 if weights is None else (codes < 0) | ~(weights > 0)
+    bins = np.where(skip_row, size, codes)
+    wts = None if weights is None else np.where(skip_row, 0.0, weights)
+    cols = np.asfortranarray(values).T  # one contiguous row per column; no copy for DataFrame.to_numpy() blocks
+    skip, col_bins, d, wd = np.empty(rows, bool), np.empty(rows, np.intp), np.empty(rows), np.empty(rows)
+
+    def count(v=None):
+        return np.bincount(col_bins, v, minlength=size + 1)[:size]
+
+    for j in range(k):
+        x = cols[j]
+        np.maximum(bins, np.multiply(np.isnan(x, out=skip), size, out=col_bins), out=col_bins)
+        shift = np.zeros(size + 1)
+        shift[col_bins[::-1]] = x[::-1]  # reversed, so each group keeps its first usable value
+        shift[size] = 0.0  # spill bin
+        np.subtract(x, shift[col_bins], out=d)  # missing x stays NaN, but only in the spill bin
+        shift = shift[:size]
+        obs = count()
+        if weights is None:
+            n, s1 = obs.astype("float64"), count(d)
+            s2 = count(np.multiply(d, d, out=wd))
+        else:
+            n, s1 = count(wts), count(np.multiply(wts, d, out=wd))
+            s2 = count(np.multiply(wd, d, out=wd))
+        dmean = np.divide(s1, n, out=np.zeros(size), where=n > 0)
+        stats["obs"][:, j], stats["n"][:, j] = obs, n
+        stats["sum"][:, j] = shift * n + s1
+        stats["mean"][:, j] = np.where(n > 0, shift + dmean, 0.0)
+        stats["m2"][:, j] = np.maximum(s2 - s1 * dmean, 0.0)
+    return stats
+
+
+def moments_sd(stats):
+    # SD from group_moments output: M2 / (n - 1), or Stata's aweight SD (weights rescaled to sum to obs)
+    obs = stats["obs"]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        var = stats["m2"] / stats["n"] * obs / (obs - 1)
+    return np.where(obs > 1, np.sqrt(var), np.nan)
+
+
+def _merge(a, b):
+    # Pairwise update of (weight, obs, mean, M2) for aligned frames; empty groups carry mean 0
+    n = a["n"] + b["n"]
+    frac = (b["n"] / n).fillna(0.0)
+    delta = b["mean"] - a["mean"]
+    return {"n": n, "obs": a["obs"] + b["obs"], "mean": a["mean"] + delta * frac, "m2": a["m2"] + b["m2"] + delta * delta * a["n"] * frac}
+
+
+class Moments:
+    # Per-group count / mean / variance of many columns, fed one block at a time.
+    # weighted=True also keeps aweight sums: weighted mean and Stata's aweight SD
+    # (weights rescaled to sum to the number of observations).
+
+    def __init__(self, keys, columns, weighted=False):
+        self.keys = list(keys)
+        self.columns = list(columns)
+        self.weighted = weighted
+        self.plain = None
+        self.wtd = None
+
+    def _block(self, codes, groups, values, weights=None):
+        stats = group_moments(codes, len(groups), values, weights)
+        return {k: pd.DataFrame(stats[k], index=groups, columns=self.columns) for k in ("n", "obs", "mean", "m2")}
+
+    @staticmethod
+    def _add(state, block):
+        if state is None:
+            return block
+        index = state["n"].index.union(block["n"].index)
+        return _merge({k: v.reindex(index, fill_value=0.0) for k, v in state.items()},
+                      {k: v.reindex(index, fill_value=0.0) for k, v in block.items()})
+
+    def update(self, df, weights=None):
+        # Rows with a missing key never reach a table (drop if missing(group vars))
+        if self.keys:
+            df = df[df[self.keys].notna().all(axis=1)]
+            if df.empty: return self
+            codes, groups = pd.MultiIndex.from_frame(df[self.keys]).factorize()
+        else:
+            codes, groups = np.zeros(len(df), dtype=np.intp), pd.Index([0])
+        values = df[self.columns].to_numpy("float64")
+
+        self.plain = self._add(self.plain, self._block(codes, groups, values))
+        if self.weighted:
+            w = df[weights] if isinstance(weights, str) else pd.Series(weights, index=df.index)
+            self.wtd = self._add(self.wtd, self._block(codes, groups, values, w.to_numpy("float64")))
+        return self
+
+    def _index_frame(self, index):
+        if not self.keys:
+            return pd.DataFrame(index=range(len(index)))
+        return index.to_frame(index=False, name=self.keys)
+
+    def table(self, column, weighted=False):
+        # Same columns as collapse (mean) (sd) (count): group keys, mean_val, sd_val, n_val (groups with data only)
+        state = self.wtd if weighted else self.plain
+        if state is None:
+            return pd.DataFrame(columns=self.keys + ["mean_val", "sd_val", "n_val"])
+        keep = (state["obs"][column] > 0).to_numpy()
+        cell = {k: state[k][column].to_numpy()[keep] for k in ("n", "obs", "mean", "m2")}
+        out = self._index_frame(state["n"].index[keep])
+        out["mean_val"] = cell["mean"]
+        out["sd_val"] = moments_sd(cell)
+        out["n_val"] = cell["obs"].astype("int64")
+        return out.sort_values(self.keys).reset_index(drop=True) if self.keys else out
+
+    def means(self, weighted=False):
+        # Wide frame of group means (missing where a group has no data), keys as columns
+        state = self.wtd if weighted else self.plain
+        out = self._index_frame(state["n"].index)
+        out[self.columns] = state["mean"].where(state["obs"] > 0).to_numpy()
+        return out
+
+
+# --- 4. SELF-CHECK ---
+def check_moments(rows=1000, offsets=(1e6, 1e7, 1e8), seed=12345):
+    # Two groups of SD ~1, the second `offset` away, unweighted and weighted, a few missing values;
+    # group_moments must match a two-pass mean / SD computed group by group (relative error < 1e-6)
+    rng = np.random.default_rng(seed)
+    worst = 0.0
+    for offset in offsets:
+        for base in (0.0, offset):  # also with both groups far from zero
+            codes = np.repeat([0, 1], rows)
+            x = rng.standard_normal(2 * rows) + base + offset * codes
+            x[rng.choice(2 * rows, 10, replace=False)] = np.nan
+            w = rng.uniform(0.5, 50.0, 2 * rows)
+            for weights in (None, w):
+                stats = group_moments(codes, 2, x[:, None], weights)
+                sd = moments_sd(stats)[:, 0]
+                for g in (0, 1):
+                    v = x[(codes == g) & ~np.isnan(x)]
+                    wg = np.ones(len(v)) if weights is None else w[(codes == g) & ~np.isnan(x)]
+                    mean = np.sum(wg * v) / np.sum(wg)
+                    ref = np.sqrt(np.sum(wg * (v - mean) ** 2) / np.sum(wg) * len(v) / (len(v) - 1))
+                    err = max(abs(sd[g] - ref) / ref, abs(stats["mean"][g, 0] - mean) / max(abs(mean), 1.0))
+                    worst = max(worst, err)
+                    print(f"  offset {offset:.0e} base {base:.0e} {'weighted' if weights is not None else 'plain':8s} group {g}: "
+                          f"sd {sd[g]:.6f} vs {ref:.6f}")
+    print(f"=== worst relative error {worst:.1e} ===")
+    return worst < 1e-6
+
+
+if __name__ == "__main__":
+    if "--check" in sys.argv[1:]:
+        sys.exit(0 if check_moments() else 1)
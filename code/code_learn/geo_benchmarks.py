@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+
+import run_profile
+from dta_stream import group_moments, moments_sd
+from panel_lags import key_codes
+
+# Geographic benchmarks for the 08c-08j / 09c / 09e scripts.
+# Each script loops over nat / state / county / zip: preserve, collapse
+# (mean) (sd) of every metric [aw=tot_benes] by(geo year) (unweighted in the
+# facility scripts 08d / 08g), save a tempfile,
+# restore and merge m:1 it back, then builds z_<m>_<geo> and the symmetric
+# SD bins. geo_benchmarks does the same with one factorization of the keys
+# per level and one weighted pass over all metrics; the level means / SDs go
+# back to the rows by indexing with the group codes (no merges, no copies of
+# the panel). Column names are the ones the .do files create:
+#   <geo>_mean_<m>, <geo>_sd_<m>, z_<m>_<geo>, bin_<m>_<geo>
+#
+#   cols, levels = geo_benchmarks(df, METRIC_SETS["hcahps"], ["nat", "state", "county", "zip"])
+#   df = df.join(cols)
+
+# --- 1. DEFINITIONS (mirror the .do files) ---
+METRIC_SETS = {
+    "hcahps": {"h100": "hcahps_100_score", "g1": "hcahps_grp1", "g2": "hcahps_grp2", "g3": "hcahps_grp3", "g4": "hcahps_grp4",
+               "h910": "h_hosp_rating_9_10", "h06": "h_hosp_rating_0_6"},
+    "oas": {"o100": "oas_100_score", "g1": "oas_grp1", "g2": "oas_grp2", "g3": "oas_grp3", "o910": "oas_rating_9_10", "o06": "oas_rating_0_6"},
+    "hcahps_groups": {"h100": "hcahps_100_score", "g1": "hcahps_grp1", "g2": "hcahps_grp2", "g3": "hcahps_grp3", "g4": "hcahps_grp4"},
+    "mips": {"m_final": "mips_final_score", "m_qual": "mips_quality_score", "m_pi": "mips_pi_score", "m_ia": "mips_ia_score", "m_cost": "mips_cost_score"},
+}
+
+# nat keeps a missing year as its own cell (collapse by(year) does); the other levels drop rows with a missing key
+GEO_KEYS = {"nat": ["year"], "state": ["state_str", "year"], "county": ["county", "year"], "zip": ["cms_zip", "year"]}
+
+BENCHMARKS = {
+    "08c": {"data": "master_provider_inpatient_2013_2023.dta", "metrics": "hcahps", "geos": ["nat", "state", "county", "zip"],
+            "out_dir": ["in_patient", "benchmarks_hcahps_provider"]},
+    "08d": {"data": "master_facility_inpatient_2013_2023.dta", "metrics": "hcahps_groups", "geos": ["nat", "state", "county"],
+            "out_dir": ["in_patient", "benchmarks_hcahps_facility"], "weight": None},
+    "08g": {"data": "master_facility_inpatient_2013_2023.dta", "metrics": "hcahps_groups", "geos": ["nat", "state", "county"],
+            "out_dir": ["out_patient", "benchmarks_hopd_facility"], "weight": None},
+    "08e": {"data": "master_provider_outpatient_asc_2015_2023.dta", "metrics": "oas", "geos": ["nat", "state", "zip"],
+            "out_dir": ["out_patient", "benchmarks_oas_provider"]},
+    "08h": {"data": "master_provider_inpatient_2013_2023.dta", "metrics": "mips", "geos": ["nat", "state", "county", "zip"],
+            "out_dir": ["in_patient", "benchmarks_mips_provider"]},
+    "08j": {"data": "master_provider_outpatient_asc_2015_2023.dta", "metrics": "mips", "geos": ["nat", "state", "zip"],
+            "out_dir": ["out_patient", "benchmarks_mips_provider"]},
+    "09c": {"data": "master_provider_inpatient_2013_2023.dta", "metrics": "hcahps", "geos": ["nat", "state", "county", "zip"],
+            "out_dir": ["in_patient", "benchmarks_hcahps_provider_nys"], "ny_only": True},
+    "09e": {"data": "master_provider_outpatient_asc_2015_2023.dta", "metrics": "oas", "geos": ["nat", "zip"],
+            "out_dir": ["out_patient", "benchmarks_nys", "oas_provider"], "ny_only": True},
+}
+
+# label define sym_lbl
+SD_BIN_LABELS = {-4: "<-2 SD", -3: "-2 to -1", -2: "-1 to -.5", -1: "-.5 to 0", 1: "0 to .5", 2: ".5 to 1", 3: "1 to 2", 4: ">2 SD"}
+
+
+# --- 2. Z-SCORES & SYMMETRIC BINS ---
+def sd_bins(z):
+    # >2, (1,2], (.5,1], [0,.5], [-.5,0), [-1,-.5), [-2,-1), <-2; missing z stays missing
+    upper = np.searchsorted(np.array([0.5, 1.0, 2.0], dtype=z.dtype), z, side="left") + 1.0  # right-closed above 0
+    lower = np.searchsorted(np.array([-2.0, -1.0, -0.5], dtype=z.dtype), z, side="right") - 4.0  # left-closed below 0
+    return np.where(np.isnan(z), np.nan, np.where(z >= 0, upper, lower))
+
+
+def _to_rows(cells, codes):
+    out = cells[np.maximum(codes, 0)]
+    out[codes < 0] = np.nan
+    return out
+
+
+# --- 3. ENGINE ---
+def geo_benchmarks(df, metrics, geos, weight="tot_benes"):
+    # Returns (row-aligned benchmark / z / bin columns, tidy table of the level cells).
+    # z and bin are float32 like the float variables gen creates; each level adds two blocks, never a panel copy.
+    # weight=None is a plain collapse (mean) (sd).
+    values = df[list(metrics.values())].to_numpy("float64")
+    weights = None if weight is None else df[weight].to_numpy("float64")
+    blocks, levels = [], []
+    for geo in geos:
+        keys = GEO_KEYS[geo]
+        with run_profile.stage("geo_benchmark", geo):
+            codes, size, first = key_codes(df, keys, keep_missing=(geo == "nat"))
+            stats = group_moments(codes, size, values, weights)
+            mean = np.where(stats["obs"] > 0, stats["mean"], np.nan)
+            sd = moments_sd(stats)
+            bench = np.hstack([_to_rows(mean, codes), _to_rows(sd, codes)])
+            row_mean, row_sd = bench[:, :len(metrics)], bench[:, len(metrics):]
+            with np.errstate(invalid="ignore", divide="ignore"):
+                z = np.where(row_sd > 0, (values - row_mean) / row_sd, np.nan).astype("float32")  # / 0 is missing in Stata
+            zbin = np.empty((len(df), 2 * len(metrics)), dtype="float32")
+            zbin[:, 0::2], zbin[:, 1::2] = z, sd_bins(z)
+
+        blocks.append(pd.DataFrame(bench, index=df.index, columns=[f"{geo}_mean_{m}" for m in metrics] + [f"{geo}_sd_{m}" for m in metrics]))
+        blocks.append(pd.DataFrame(zbin, index=df.index, columns=[f"{p}_{m}_{geo}" for m in metrics for p in ("z", "bin")]))
+
+        cells = df[keys].iloc[first].reset_index(drop=True)
+        for j, m in enumerate(metrics):
+            level = cells.assign(geo=geo, metric=m, mean=mean[:, j], sd=sd[:, j], n=stats["obs"][:, j].astype("int64"))
+            levels.append(level[level["n"] > 0])
+    cols = pd.concat(blocks, axis=1) if blocks else pd.DataFrame(index=df.index)
+    return cols, pd.concat(levels, ignore_index=True) if levels else pd.DataFrame()
+
+
+def add_geo_benchmarks(df, name, weight="tot_benes"):
+    cfg = BENCHMARKS[name]
+    metrics = {m: v for m, v in METRIC_SETS[cfg["metrics"]].items() if v in df.columns}
+    cols, levels = geo_benchmarks(df, metrics, cfg["geos"], cfg.get("weight", weight))
+    return df.join(cols), levels
@@ -0,0 +1,306 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+import run_profile
+from build_manifest import write_if_changed
+from dta_stream import Moments, iter_dta, partitioned
+from grouping_sets import GroupingSets, split_table
+from panel_lags import PanelIndex, panel_ids
+from csv_ingest import KIND_KEYS
+from label_codes import CODEBOOK
+
+# Python version of the table step in 01-04_*_stats.do.
+# Each .do file loads its master panel, builds np_authority / prov_type /
+# own_category, adds year-over-year deltas and then runs five preserve /
+# collapse / export delimited rounds PER VARIABLE. Here every master .dta is
+# read once (only the columns the requested settings need, shared by settings
+# that use the same file) and all five table kinds come from ONE grouping-sets
+# pass over all variables (grouping_sets: finest authority x group x year
+# cells, rolled up to each kind). The tidy result is split into the same
+# {var}_{kind}.csv files: same columns, value labels and row order as Stata's
+# export delimited, so csv_ingest / report_engine read them unchanged.
+#
+#   python grouped_stats.py                    -> every setting
+#   python grouped_stats.py in_patient_micro   -> just the named setting(s)
+#   python grouped_stats.py --profile          -> also write a per-stage run report (run_profile)
+#   python grouped_stats.py --stream           -> bounded memory: row blocks + online accumulators (dta_stream)
+#
+# --stream (or NP_STREAM=1) never holds a whole panel: the .dta is read in
+# NP_STREAM_ROWS blocks, spilled to temporary partitions by panel id for the
+# duplicates drop and deltas, and each block's cells are pooled into one
+# GroupingSets accumulator.
+# Means / SDs agree with the in-memory run to rounding in the last digits.
+
+# --- 1. SETTINGS (mirror the .do files) ---
+DATA_ROOT = os.environ.get("NP_DATA_ROOT") or r"C:\Users\omarf\Dropbox\personal_files_omar_farrag\Research\general_cms_data\publishable_data"
+OUTPUT_ROOT = os.environ.get("NP_OUTPUT_ROOT") or r"C:\Users\omarf\Dropbox\personal_files_omar_farrag\Research\projects\NYS_npPolicy\output\summary_stats"
+
+PROVIDER_INPATIENT = "master_provider_inpatient_2013_2023.dta"
+MIPS_VARS = ["mips_final_score", "mips_quality_score", "mips_pi_score", "mips_ia_score", "mips_cost_score"]
+
+# 01: tot_benes-weighted provider means per (ccn, year), merged onto the facility panel
+FACILITY_AGGREGATES = {
+    "data": PROVIDER_INPATIENT,
+    "means": ["partd_opioid_rate", "partb_em_upcode_rate", "partb_low_value_rate", "partb_imaging_adv_rate"] + MIPS_VARS,
+    "weight": "tot_benes",
+}
+
+SETTINGS = {
+    "in_patient_macro": {
+        "data": "master_facility_inpatient_2013_2023.dta", "out_dir": ["in_patient", "macro_stats"],
+        "panel": ["ccn"], "dedupe": False, "state": "state", "group": ("own_category", "ownership"), "aggregates": FACILITY_AGGREGATES,
+        "base_vars": ["hcahps_100_score", "hcahps_grp1", "hcahps_grp2", "hcahps_grp3", "hcahps_grp4", "h_hosp_rating_9_10", "h_hosp_rating_0_6",
+                      "hac_total_score", "rrp_excess_ratio_ami", "rrp_excess_ratio_hf", "rrp_excess_ratio_pn", "mortality_rate_ami", "mortality_rate_hf",
+                      "mortality_rate_pn", "mspb_score", "hvbp_tps_score", "partd_opioid_rate", "partb_em_upcode_rate", "partb_low_value_rate",
+                      "partb_imaging_adv_rate"] + MIPS_VARS + ["pct_np", "pct_md", "pct_pa", "hopd_op_8", "hopd_op_10", "hopd_op_13", "hopd_op_18b",
+                      "hopd_op_22", "hopd_op_32", "hopd_op_36"]},
+    "in_patient_micro": {
+        "data": PROVIDER_INPATIENT, "out_dir": ["in_patient", "micro_stats"],
+        "panel": ["npi"], "dedupe": True, "state": "cms_state", "group": ("prov_type", "cms_specialty"),
+        "base_vars": ["partd_generic_rate", "partd_opioid_rate", "partb_em_upcode_rate"] + MIPS_VARS + ["bene_avg_risk_scre", "tot_benes", "tot_sbmtd_chrg"]},
+    "out_patient_macro": {
+        "data": "master_facility_outpatient_asc_2015_2024.dta", "out_dir": ["out_patient", "macro_stats"],
+        "panel": ["ccn", "asc_id"], "dedupe": True, "state": "state", "group": None,  # first panel id present wins, as in 03
+        "base_vars": ["asc_rate_1", "asc_rate_2", "asc_rate_8", "oas_100_score", "oas_grp1", "oas_grp2", "oas_grp3", "oas_rating_9_10", "oas_rating_0_6",
+                      "fac_mips_final_score", "fac_mips_quality_score", "fac_mips_ia_score", "fac_mips_pi_score", "fac_mips_cost_score"]},
+    "out_patient_micro": {
+        "data": "master_provider_outpatient_asc_2015_2023.dta", "out_dir": ["out_patient", "micro_stats"],
+        "panel": ["npi"], "dedupe": True, "state": "cms_state", "group": ("prov_type", "cms_specialty"),
+        "base_vars": MIPS_VARS + ["tot_benes", "tot_sbmtd_chrg"]},
+}
+
+# Same file order as the .do loops; the middle table only exists for settings with a group column
+GROUP_KINDS = {"prov_type": "by_auth_provtype", "own_category": "by_auth_ownership"}
+
+
+def setting_kinds(cfg):
+    group = [GROUP_KINDS[cfg["group"][0]]] if cfg["group"] else []
+    return ["by_authority"] + group + ["by_auth_year", "universal", "universal_by_year"]
+
+
+# --- 2. TAXONOMY (the $cond_* globals in 00_initialize.do) ---
+STATES_RESTRICTED = ["CA", "FL", "GA", "MI", "MO", "NC", "OK", "SC", "TN", "TX", "VA"]
+STATES_REDUCED = ["AL", "AS", "DE", "IL", "IN", "KS", "KY", "LA", "MS", "NJ", "OH", "PA", "UT", "WI"]
+STATES_FULL = ["AZ", "CO", "CT", "DC", "HI", "ID", "IA", "MD", "MA", "MN", "MT", "NE", "NV", "NH", "NM", "NY", "ND", "OR", "RI", "SD", "VT", "WA", "WY"]
+OWN_GOV_EXACT = ["DEPARTMENT OF DEFENSE", "TRIBAL", "VETERANS HEALTH ADMINISTRATION"]
+
+
+def _by_value(series, classify):
+    # Decide each distinct value once (as decode would spell it, "" for missing), then broadcast by factor code
+    codes, uniques = pd.factorize(series)
+    text = pd.Series([str(u) for u in uniques] + [""], dtype=object)
+    return classify(text)[codes]
+
+
+def _authority(text):
+    state = text.str.strip().str.upper()
+    # Later replace wins in the .do file: restricted over reduced over full
+    return np.select([state.isin(STATES_RESTRICTED), state.isin(STATES_REDUCED), state.isin(STATES_FULL)], [1.0, 2.0, 3.0], np.nan)
+
+
+def _prov_type(text):
+    spec = text.str.upper()
+    return np.select([spec.str.contains("PHYSICIAN ASSISTANT", regex=False), spec.str.contains("NURSE PRACTITIONER", regex=False)], [3.0, 2.0], 1.0)
+
+
+def _own_category(text):
+    own = text.str.upper()
+    nonprof = own.str.contains("VOLUNTARY", regex=False) | own.str.contains("NON-PROFIT", regex=False)
+    forprof = own.str.contains("PROPRIETARY", regex=False) | own.str.contains("FOR-PROFIT", regex=False)
+    gov = own.str.contains("GOVERNMENT", regex=False) | own.isin(OWN_GOV_EXACT)
+    return np.select([nonprof, forprof, gov], [3.0, 2.0, 1.0], np.nan)
+
+
+CLASSIFIERS = {"np_authority": _authority, "prov_type": _prov_type, "own_category": _own_category}
+
+
+# --- 3. LOADING (each .dta once) ---
+def dta_columns(path):
+    with pd.read_stata(path, iterator=True) as reader:
+        return list(reader.variable_labels())
+
+
+def needed_columns(cfg):
+    wanted = {cfg["data"]: cfg["panel"] + ["year", cfg["state"]] + ([cfg["group"][1]] if cfg["group"] else []) + cfg["base_vars"]}
+    if cfg.get("aggregates"):
+        agg = cfg["aggregates"]
+        wanted.setdefault(agg["data"], [])
+        wanted[agg["data"]] += ["ccn", "year", "cms_specialty", agg["weight"]] + agg["means"]
+    return wanted
+
+
+def read_panels(cfgs):
+    wanted = {}
+    for cfg in cfgs:
+        for data, cols in needed_columns(cfg).items():
+            wanted.setdefault(data, [])
+            wanted[data] += [c for c in cols if c not in wanted[data]]
+
+    panels = {}
+    for data, cols in wanted.items():
+        path = os.path.join(DATA_ROOT, data)
+        available = set(dta_columns(path))
+        cols = [c for c in cols if c in available]
+        with run_profile.stage("read_stata", data):
+            panels[data] = pd.read_stata(path, columns=cols, convert_missing=False, preserve_dtypes=True)
+        print(f"Read {len(panels[data])} rows x {len(cols)} columns from {path}.")
+    return panels
+
+
+# --- 4. PANEL CONSTRUCTION ---
+def facility_aggregates(blocks, agg):
+    # collapse (sum) count_* (mean) ... [aw=tot_benes], by(ccn year); pct_* = count_* / count_tot is the weighted share
+    acc = None
+    for prov in blocks:
+        prov = prov[panel_ids(prov["ccn"]) >= 0]
+        spec = _by_value(prov["cms_specialty"], lambda t: t.to_numpy())
+        values = prov[["ccn", "year", agg["weight"]] + [c for c in agg["means"] if c in prov.columns]].copy()
+        values["pct_np"] = (spec == "NURSE PRACTITIONER").astype("float64")
+        values["pct_pa"] = (spec == "PHYSICIAN ASSISTANT").astype("float64")
+        values["pct_md"] = 1.0 - values["pct_np"] - values["pct_pa"]
+        acc = acc or Moments(["ccn", "year"], values.columns[3:], weighted=True)
+        acc.update(values, weights=agg["weight"])
+    return acc.means(weighted=True)
+
+
+def prepare(df, cfg, agg=None):
+    # Taxonomy, duplicates drop and deltas for one panel (or one partition holding whole panel ids)
+    panel = next((c for c in cfg["panel"] if c in df.columns), None)
+    df = df[[c for c in df.columns if c in needed_columns(cfg)[cfg["data"]]]]
+
+    if agg is not None:
+        # merge 1:1 ccn year, keep(master match): variables already in the master are left alone
+        agg = agg[["ccn", "year"] + [c for c in agg.columns if c not in df.columns]]
+        df = df.merge(agg, on=["ccn", "year"], how="left")
+
+    df = df.assign(np_authority=_by_value(df[cfg["state"]], _authority))
+    if cfg["group"]:
+        group, source = cfg["group"]
+        df[group] = _by_value(df[source], CLASSIFIERS[group])
+    if cfg["dedupe"] and panel:
+        df = df.drop_duplicates([panel, "year"])
+
+    base_vars = [v for v in cfg["base_vars"] if v in df.columns]
+    if panel:
+        df = df.join(PanelIndex(df, panel).delta(df, base_vars))  # d_var = var - L.var
+    variables = [v for var in base_vars for v in (var, f"d_{var}") if v in df.columns]
+    return df, variables
+
+
+def build_panel(cfg, panels):
+    agg = facility_aggregates([panels[cfg["aggregates"]["data"]]], cfg["aggregates"]) if cfg.get("aggregates") else None
+    return prepare(panels[cfg["data"]], cfg, agg)
+
+
+# --- 5. GROUPED STATISTICS ---
+def split_tables(table, variables, kinds):
+    # {(var, kind): table} in the .do loop order; an empty frame where collapse would find no observations
+    tables = {}
+    for kind in kinds:
+        keys = KIND_KEYS[kind]
+        parts = split_table(table, kind, keys)
+        for var in variables:
+            tables[(var, kind)] = parts.get(var, pd.DataFrame(columns=keys + ["mean_val", "sd_val", "n_val"]))
+    return tables
+
+
+def grouped_stats(df, variables, kinds):
+    # One scan into the finest cells, every table kind rolled up from them; a kind drops the cells
+    # with a missing key of its own, like the .do's drop if missing()
+    with run_profile.stage("grouping_sets", f"{len(kinds)} kinds"):
+        table = GroupingSets({kind: KIND_KEYS[kind] for kind in kinds}, variables).update(df).table()
+    return split_tables(table, variables, kinds)
+
+
+def table_csv(table, kind):
+    # export delimited writes value labels, missing as empty; universal tables carry overall = "National"
+    out = table.copy()
+    for col in out.columns:
+        if col in CODEBOOK: out[col] = out[col].map(CODEBOOK[col]["codes"])
+    if "year" in out.columns: out["year"] = out["year"].astype("Int64")
+    if kind.startswith("universal"): out.insert(0, "overall", "National")
+    return out.to_csv(index=False, na_rep="", lineterminator="\n")
+
+
+# --- 6. ONE SETTING ---
+def write_tables(name, tables, n_vars):
+    cfg = SETTINGS[name]
+    csv_dir = os.path.join(OUTPUT_ROOT, *cfg["out_dir"], "tables_csv")
+    os.makedirs(csv_dir, exist_ok=True)
+    written = 0
+    for (var, kind), table in tables.items():
+        if table.empty: continue  # collapse stops with "no observations"; no file rather than an empty one
+        path = os.path.join(csv_dir, f"{var}_{kind}.csv")
+        with run_profile.stage("write_csv", f"{var}_{kind}", outputs=[path]):
+            written += write_if_changed(path, table_csv(table, kind))
+    print(f"[{name}] {n_vars} variables, {len(tables)} tables -> {csv_dir} ({written} changed).")
+
+
+def run_setting(name, panels):
+    cfg = SETTINGS[name]
+    df, variables = build_panel(cfg, panels)
+    tables = grouped_stats(df, variables, setting_kinds(cfg))
+    write_tables(name, tables, len(variables))
+    return tables
+
+
+# --- 7. STREAMING (bounded memory) ---
+def default_stream():
+    return os.environ.get("NP_STREAM", "") == "1"
+
+
+def _dta_path_columns(data, wanted):
+    path = os.path.join(DATA_ROOT, data)
+    available = set(dta_columns(path))
+    return path, [c for c in wanted if c in available]
+
+
+def stream_setting(name, chunk_rows=None, partitions=None):
+    cfg = SETTINGS[name]
+    wanted = needed_columns(cfg)
+    agg = None
+    if cfg.get("aggregates"):
+        agg_path, agg_cols = _dta_path_columns(cfg["aggregates"]["data"], wanted[cfg["aggregates"]["data"]])
+        with run_profile.stage("aggregates", cfg["aggregates"]["data"]):
+            agg = facility_aggregates(iter_dta(agg_path, agg_cols, chunk_rows), cfg["aggregates"])
+
+    path, cols = _dta_path_columns(cfg["data"], wanted[cfg["data"]])
+    panel = next((c for c in cfg["panel"] if c in cols), None)
+    blocks = partitioned(path, cols, panel, chunk_rows, partitions) if panel else iter_dta(path, cols, chunk_rows)
+
+    kinds = setting_kinds(cfg)
+    acc, variables, rows = None, [], 0
+    for block in blocks:
+        with run_profile.stage("stream_block", f"{cfg['data']} ({len(block)} rows)"):
+            df, variables = prepare(block, cfg, agg)
+            acc = acc or GroupingSets({kind: KIND_KEYS[kind] for kind in kinds}, variables)
+            acc.update(df)
+        rows += len(df)
+    print(f"Streamed {rows} rows x {len(cols)} columns from {path}.")
+
+    tables = split_tables(acc.table(), variables, kinds) if acc else {}
+    write_tables(name, tables, len(variables))
+    return tables
+
+
+def run_settings(names, profile=None, stream=None):
+    run_profile.start(enabled=profile)
+    if default_stream() if stream is None else stream:
+        for name in names:
+            stream_setting(name)
+    else:
+        panels = read_panels([SETTINGS[name] for name in names])
+        for name in names:
+            run_setting(name, panels)
+    run_profile.finish(OUTPUT_ROOT)
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    names = [a for a in args if not a.startswith("--")]
+    unknown = [n for n in names if n not in SETTINGS]
+    if unknown:
+        sys.exit(f"Unknown setting(s) {unknown}; choose from {list(SETTINGS)}.")
+    run_settings(names or list(SETTINGS), profile=True if "--profile" in args else None, stream=True if "--stream" in args else None)
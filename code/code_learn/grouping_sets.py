@@ -0,0 +1,140 @@
+import numpy as np
+import pandas as pd
+
+from dta_stream import group_moments, moments_sd
+from panel_lags import key_codes
+
+# GROUPING SETS / ROLLUP over factorized keys.
+# A summary stage asks for the same variables at several groupings (the
+# by_authority / by_auth_provtype / by_auth_year / universal / universal_by_year
+# family of 01-04, or the year x dimension series of 06a-06f). GroupingSets
+# scans the rows ONCE into the finest cells over the union of all grouping
+# keys (a missing key is a level of its own) and keeps per cell and variable
+# the sufficient statistics: weight total n, observation count, (weighted)
+# sum and M2, the sum of squared deviations from the cell mean. Every coarser
+# grouping is pooled from the cells, never from the rows. M2 stands in for a
+# raw sum of squares: pooling adds each cell's M2 plus n times the squared
+# distance of its mean from the pooled mean, so SDs never come from a
+# difference of two large sums. Blocks fed through update() are pooled the
+# same way, so a panel can be streamed (dta_stream.iter_dta / partitioned).
+#
+#   sets = GroupingSets({"by_authority": ["np_authority"], "universal": []}, variables).update(df)
+#   table = sets.table()                                  -> one tidy frame for every grouping
+#   split_table(table, "by_authority", ["np_authority"])  -> {var: frame} as the CSV files hold it
+#
+# Like drop if missing(keys) before collapse, table() leaves out cells with
+# a missing key ("" included) for the groupings that use that key; a grouping
+# that must keep missing levels (collapse by(year) does) asks aggregate() with
+# dropna=False. weighted=True pools aweights: weighted mean and Stata's
+# aweight SD, n_val still the number of observations.
+
+STATS = ("n", "obs", "sum", "m2")
+VALUE_COLS = ["mean_val", "sd_val", "n_val", "sum_val"]
+
+
+def rollup(keys):
+    # ROLLUP(a, b, c) -> (a, b, c), (a, b), (a), ()
+    keys = list(keys)
+    return [keys[:i] for i in range(len(keys), -1, -1)]
+
+
+def _sum_by(codes, size, values):
+    # Row sums per code for a (rows x columns) array: one bincount over (code, column) pairs
+    k = values.shape[1]
+    flat = (codes[:, None] * k + np.arange(k)).ravel()
+    return np.bincount(flat, values.ravel(), minlength=size * k).reshape(size, k)
+
+
+def pool(codes, size, stats):
+    # Pool cell statistics into size groups (code -1 = left out)
+    keep = codes >= 0
+    c = codes[keep]
+    part = {k: stats[k][keep] for k in STATS}
+    out = {k: _sum_by(c, size, part[k]) for k in ("n", "obs", "sum")}
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.where(out["n"] > 0, out["sum"] / out["n"], 0.0)
+        cell_mean = np.where(part["n"] > 0, part["sum"] / part["n"], 0.0)
+    dev = cell_mean - mean[c]
+    out["m2"] = _sum_by(c, size, part["m2"] + part["n"] * dev * dev)
+    return out
+
+
+class GroupingSets:
+
+    def __init__(self, sets, columns, weighted=False):
+        # sets: {name: [keys]} or a list of key lists (named by their keys, "overall" for ())
+        if not isinstance(sets, dict):
+            sets = {"_".join(keys) or "overall": keys for keys in sets}
+        self.sets = {name: list(keys) for name, keys in sets.items()}
+        self.keys = list(dict.fromkeys(k for keys in self.sets.values() for k in keys))
+        self.columns = list(columns)
+        self.weighted = weighted
+        self.cells = None
+        self.stats = None
+
+    def _cells(self, frame):
+        codes, size, first = key_codes(frame, self.keys, keep_missing=True)
+        return codes, size, frame[self.keys].iloc[first].reset_index(drop=True)
+
+    def update(self, df, weights=None):
+        if df.empty: return self
+        w = None
+        if self.weighted:
+            w = (df[weights] if isinstance(weights, str) else pd.Series(weights, index=df.index)).to_numpy("float64")
+        codes, size, cells = self._cells(df)
+        return self.add_cells(cells, group_moments(codes, size, df[self.columns].to_numpy("float64"), w))
+
+    def add_cells(self, cells, stats):
+        # Pool cell statistics built elsewhere (group_moments over the caller's own codes); cells holds
+        # every grouping key for each row of the stats
+        cells, stats = cells[self.keys].reset_index(drop=True), {k: stats[k] for k in STATS}
+        if self.cells is not None:
+            # Same pooling as a roll-up: the cells of this block join the cells seen so far
+            cells = pd.concat([self.cells, cells], ignore_index=True)
+            stats = {k: np.vstack([self.stats[k], stats[k]]) for k in STATS}
+            codes, size, merged = self._cells(cells)
+            stats, cells = pool(codes, size, stats), merged
+        self.cells, self.stats = cells, stats
+        return self
+
+    def aggregate(self, keys, mask=None, dropna=True):
+        # One grouping pooled from the cells, sorted by its keys: (key frame, {stat: groups x columns}).
+        # mask restricts the cells first (keep if ...); dropna=False keeps missing key values as groups.
+        keys = list(keys)
+        if self.cells is None:
+            return pd.DataFrame(columns=keys), {k: np.zeros((0, len(self.columns))) for k in STATS}
+        codes, size, first = key_codes(self.cells, keys, keep_missing=not dropna)
+        if mask is not None:
+            codes = np.where(mask, codes, -1)
+        stats = pool(codes, size, self.stats)
+        frame = self.cells[keys].iloc[first].reset_index(drop=True)
+        if keys and size:
+            order = frame.sort_values(keys, na_position="last").index.to_numpy()
+            frame, stats = frame.iloc[order].reset_index(drop=True), {k: v[order] for k, v in stats.items()}
+        return frame, stats
+
+    def table(self, names=None):
+        # Tidy frame: grouping, every key (missing where the grouping does not use it), var, mean_val, sd_val, n_val, sum_val
+        parts = []
+        for name in names or self.sets:
+            frame, stats = self.aggregate(self.sets[name])
+            row, col = np.nonzero(stats["obs"] > 0)
+            cell = {k: stats[k][row, col] for k in STATS}
+            part = frame.iloc[row].reset_index(drop=True)
+            part.insert(0, "grouping", name)
+            part["var"] = np.array(self.columns, dtype=object)[col]
+            part["mean_val"] = cell["sum"] / cell["n"]
+            part["sd_val"] = moments_sd(cell)
+            part["n_val"] = cell["obs"].astype("int64")
+            part["sum_val"] = cell["sum"]
+            if self.weighted: part["wt_val"] = cell["n"]
+            parts.append(part)
+        out = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=["grouping"])
+        value_cols = VALUE_COLS + (["wt_val"] if self.weighted else [])
+        return out.reindex(columns=["grouping"] + self.keys + ["var"] + value_cols)
+
+
+def split_table(table, grouping, keys):
+    # {var: frame} for one grouping with the columns collapse (mean) (sd) (count) by(keys) leaves
+    sub = table[table["grouping"] == grouping]
+    return {var: g[list(keys) + ["mean_val", "sd_val", "n_val"]].reset_index(drop=True) for var, g in sub.groupby("var", sort=False)}
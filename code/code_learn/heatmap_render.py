@@ -0,0 +1,141 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+import run_profile
+
+# Shared heatmap renderer for the 01b-04b master loops.
+# The loops only describe each heatmap (heatmap_job); render_heatmaps then
+# draws them either in-process or across a process pool. Each process keeps
+# one preallocated figure per layout and shape and recycles its axes and
+# colorbar instead of building and tearing down a new figure per PNG.
+# matplotlib/seaborn are only imported once a heatmap is actually drawn, so
+# tables-only runs never pay for them.
+#
+# Output modes (per run, NP_HEAT_FORMAT): "final" 300-dpi PNG as before,
+# "preview" 72-dpi PNG for quick iteration, "pdf" / "svg" vector files that
+# skip rasterizing altogether and can be embedded in the table PDFs.
+
+# --- 1. LAYOUTS ---
+LAYOUTS = {
+    "square": {"figsize": (8, 7.5), "annot_size": 12, "square": True},      # ownership / provtype 3x3
+    "timeline": {"figsize": (10, 6.5), "annot_size": 10, "square": False},  # authority x years
+}
+
+HEAT_OUTPUTS = {
+    "final": {"ext": ".png", "savefig": {"dpi": 300}},
+    "preview": {"ext": ".png", "savefig": {"dpi": 72}},
+    "pdf": {"ext": ".pdf", "savefig": {"metadata": {"CreationDate": None}}},  # no timestamp: unchanged figures stay byte-identical
+    "svg": {"ext": ".svg", "savefig": {"metadata": {"Date": None}}},
+}
+VECTOR_OUTPUTS = ["pdf", "svg"]
+
+_canvases = {}
+plt = sns = None
+
+
+def default_workers():
+    env_workers = os.environ.get("NP_HEAT_WORKERS", "")
+    if env_workers.strip().isdigit() and int(env_workers) > 0:
+        return int(env_workers)
+    return max(1, os.cpu_count() or 1)
+
+
+def default_output():
+    env_output = os.environ.get("NP_HEAT_FORMAT", "").strip().lower()
+    return env_output if env_output in HEAT_OUTPUTS else "final"
+
+
+def heatmap_path(heat_dir, filename, output="final"):
+    # filename as configured (.png); the extension follows the output mode
+    return os.path.join(heat_dir, os.path.splitext(filename)[0] + HEAT_OUTPUTS[output]["ext"])
+
+
+def load_plotting():
+    # Returns the seconds spent importing (0 once loaded)
+    global plt, sns
+    if plt is not None:
+        return 0.0
+    start = time.perf_counter()
+    import matplotlib
+    matplotlib.use("Agg")  # file output only; never start a GUI backend on batch nodes
+    import matplotlib.pyplot as pyplot
+    import seaborn
+    plt, sns = pyplot, seaborn
+    return time.perf_counter() - start
+
+
+def heatmap_job(pivot, out_path, title, desc, xlabel, cmap, is_delta, layout, output="final"):
+    return {"pivot": pivot, "out_path": out_path, "title": title, "desc": desc, "xlabel": xlabel,
+            "cmap": cmap, "is_delta": is_delta, "layout": layout, "output": output}
+
+
+# --- 2. FIGURE RECYCLING ---
+def _get_canvas(layout, shape):
+    key = (layout, shape)
+    if key not in _canvases:
+        fig = plt.figure(figsize=LAYOUTS[layout]["figsize"])
+        ax = fig.add_subplot()
+        note = fig.text(0.05, 0.02, "", wrap=True, fontsize=9, color='gray')
+        _canvases[key] = {"fig": fig, "ax": ax, "cax": None, "note": note}
+    return _canvases[key]
+
+
+# --- 3. RENDER ONE HEATMAP ---
+def render_heatmap(job):
+    load_plotting()
+    start, cpu_start = time.perf_counter(), time.process_time()
+    pivot = job["pivot"]
+    spec = LAYOUTS[job["layout"]]
+    canvas = _get_canvas(job["layout"], pivot.shape)
+    fig, ax, cax = canvas["fig"], canvas["ax"], canvas["cax"]
+
+    if job["is_delta"]:
+        cmap, vmin, vmax = "RdBu", -pivot.abs().max().max(), pivot.abs().max().max()
+    else:
+        cmap, vmin, vmax = job["cmap"], pivot.min().min(), pivot.max().max()
+    if pd.isna(vmax): vmax = 1; vmin = -1
+
+    # First use lets seaborn carve the colorbar out of the axes; later uses redraw into both
+    if cax is not None:
+        ax.clear()
+        cax.clear()
+    sns.heatmap(pivot, ax=ax, cbar_ax=cax, annot=True, fmt=".3f", cmap=cmap, vmin=vmin, vmax=vmax, cbar_kws={'label': 'Mean Value'}, annot_kws={"size": spec["annot_size"]}, linewidths=.5, square=spec["square"])
+    if cax is None:
+        canvas["cax"] = fig.axes[-1]
+    drawn, cpu_drawn = time.perf_counter(), time.process_time()
+
+    ax.set_title(job["title"], fontsize=14, fontweight='bold', pad=15)
+    ax.set_ylabel("State NP Authority", fontsize=12, fontweight='bold')
+    ax.set_xlabel(job["xlabel"], fontsize=12, fontweight='bold')
+    canvas["note"].set_text(f"Notes: {job['desc']}\nNP Law: Restricted, Reduced, Full.")
+    fig.subplots_adjust(bottom=0.2)
+    fig.savefig(job["out_path"], bbox_inches='tight', **HEAT_OUTPUTS[job.get("output", "final")]["savefig"])
+    end, cpu_end = time.perf_counter(), time.process_time()
+    # (wall, cpu) per step, measured in whichever process drew the figure
+    steps = {"sns.heatmap": (drawn - start, cpu_drawn - cpu_start), "savefig": (end - drawn, cpu_end - cpu_drawn)}
+    return job["out_path"], end - start, steps
+
+
+# --- 4. RENDER MANY (IN-PROCESS OR PROCESS POOL) ---
+def render_heatmaps(jobs, workers=None):
+    if not jobs:
+        return []
+    workers = min(workers or default_workers(), len(jobs))
+    start = time.perf_counter()
+
+    if workers <= 1:
+        print(f"Loaded matplotlib/seaborn in {load_plotting():.2f}s.")
+        timings = [render_heatmap(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            timings = list(executor.map(render_heatmap, jobs, chunksize=max(1, len(jobs) // (4 * workers))))
+
+    for out_path, seconds, steps in timings:
+        print(f"   -> {os.path.basename(out_path)}: {seconds:.2f}s")
+        run_profile.add("sns.heatmap", os.path.basename(out_path), *steps["sns.heatmap"])
+        run_profile.add("savefig", os.path.basename(out_path), *steps["savefig"], outputs=[out_path])
+    total = time.perf_counter() - start
+    print(f"Rendered {len(timings)} heatmaps in {total:.1f}s with {workers} process(es) ({sum(t[1] for t in timings) / len(timings):.2f}s per figure).")
+    return timings
@@ -0,0 +1,68 @@
+import pandas as pd
+
+# Shared decoding of the Stata-exported group codes.
+# Depending on how a CSV was exported a group column holds the numeric code
+# (1, "1", "1.0") or the value label ("Restricted"). decode_codes turns
+# either into an ordered pd.Categorical whose category order is the row /
+# column order every table and heatmap uses. Only the distinct raw values
+# are inspected in Python; the rows themselves are mapped in one vectorized
+# step. Values outside the codebook are reported and left missing.
+
+# --- 1. CODEBOOK (mirrors the label define statements in the .do files) ---
+AUTH_LEVELS = ["Restricted", "Reduced", "Full Practice"]
+OWN_LEVELS = ["Government", "Non-Profit", "For-Profit"]
+PROV_LEVELS = ["MD/DO", "Nurse Practitioner", "Physician Assistant"]
+GENDER_LEVELS = ["Female", "Male"]
+
+CODEBOOK = {
+    "np_authority": {"levels": AUTH_LEVELS, "codes": {1: "Restricted", 2: "Reduced", 3: "Full Practice"}, "ignore": []},
+    "own_category": {"levels": OWN_LEVELS, "codes": {1: "Government", 2: "For-Profit", 3: "Non-Profit"}, "ignore": []},
+    "prov_type": {"levels": PROV_LEVELS, "codes": {1: "MD/DO", 2: "Nurse Practitioner", 3: "Physician Assistant"}, "ignore": []},
+    "is_female": {"levels": GENDER_LEVELS, "codes": {1: "Female", 0: "Male"}, "ignore": ["Unknown"]},  # Unknown never gets a table row
+}
+
+MISSING_TEXT = ["", "nan", "."]
+
+
+# --- 2. DECODING ---
+def _decode_value(raw, spec):
+    if pd.isna(raw):
+        return None, True
+    text = str(raw).strip()
+    if text in spec["levels"]:
+        return text, True
+    if text in MISSING_TEXT or text in spec["ignore"]:
+        return None, True
+    try:
+        num = float(text)
+    except ValueError:
+        return None, False
+    if num.is_integer() and int(num) in spec["codes"]:
+        return spec["codes"][int(num)], True
+    return None, False
+
+
+def decode_codes(series, column, strict=False):
+    spec = CODEBOOK[column]
+    dtype = pd.CategoricalDtype(spec["levels"], ordered=True)
+
+    # Decide each distinct raw value once, then map every row through that lookup
+    lookup, unexpected = {}, []
+    for raw in pd.unique(series.dropna()):
+        label, known = _decode_value(raw, spec)
+        lookup[raw] = label
+        if not known: unexpected.append(raw)
+
+    if unexpected:
+        message = f"Unexpected {column} code(s) {sorted(map(str, unexpected))}; expected {spec['levels']} or codes {sorted(spec['codes'])}."
+        if strict: raise ValueError(message)
+        print(f"[WARNING] {message} Those rows are left out of the tables.")
+
+    return series.map(lookup).astype(dtype)
+
+
+def decode_frame(df, columns=None, strict=False):
+    for column in columns or CODEBOOK:
+        if column in df.columns:
+            df[column] = decode_codes(df[column], column, strict=strict)
+    return df
@@ -0,0 +1,105 @@
+import numpy as np
+import pandas as pd
+
+# Array-based LaTeX table emitter shared by the table scripts.
+# A pivot is turned into one float array and one NaN mask, every cell is
+# formatted in a single pass and each row is joined once, so wide
+# year x group tables cost linear time instead of a df.loc lookup and a
+# string copy per cell. The table frame itself (panel header, national
+# average row, \resizebox, notes) is described by keyword options.
+#
+# Two frames match the existing tables byte for byte:
+#   "minipage"       indented booktabs table with a notes minipage (00b, 01b-04b)
+#   "threeparttable" flush-left table with tablenotes (00e)
+
+INDENT = "        "  # body rows sit at 8 spaces in both frames
+
+
+# --- 1. CELL FORMATTING ---
+def tex_escape(text):
+    return text.replace('&', r'\&').replace('%', r'\%')
+
+
+def format_values(values, fmt=".3f", missing="-"):
+    # fmt: ".3f" style float spec, or "," for whole numbers with thousands separators
+    values = np.asarray(values, dtype=float)
+    mask = np.isnan(values)
+    if fmt == ",":
+        filled = np.where(mask, 0, values).astype(np.int64)
+        cells = np.array([f"{v:,}" for v in filled.ravel()], dtype=object).reshape(values.shape)
+    else:
+        cells = np.char.mod(f"%{fmt}", values).astype(object)
+    cells[mask] = missing
+    return cells
+
+
+def format_block(df, fmt=".3f", missing="-", rows=None, cols=None):
+    # rows/cols pin a fixed grid; labels missing from the pivot come out as `missing`
+    if rows is not None or cols is not None:
+        df = df.reindex(index=df.index if rows is None else rows, columns=df.columns if cols is None else cols)
+    return list(df.index), format_values(df.to_numpy(dtype=float), fmt, missing)
+
+
+def emit_rows(labels, cells, label_prefix="", indent=INDENT):
+    return "".join(f"{indent}{label_prefix}{label} & " + " & ".join(row) + " \\\\\n" for label, row in zip(labels, cells))
+
+
+def emit_panels(df, panel_order, row_order, fmt=",", missing="-", indent=INDENT):
+    # Two-level index (panel, row): a \multicolumn header per panel, indented rows below it
+    n_span = len(df.columns) + 1
+    _, cells = format_block(df, fmt, missing)
+    panel_vals = df.index.get_level_values(0)
+    row_codes = pd.Categorical(df.index.get_level_values(1), categories=row_order).codes
+
+    parts = []
+    for panel in panel_order:
+        in_panel = np.asarray(panel_vals == panel)
+        if not in_panel.any(): continue
+        parts.append(f"{indent}\\multicolumn{{{n_span}}}{{l}}{{\\textbf{{{panel}}}}} \\\\\n{indent}\\midrule\n")
+        positions = np.flatnonzero(in_panel & (row_codes >= 0))
+        positions = positions[np.argsort(row_codes[positions], kind="stable")]
+        parts.append(emit_rows([row_order[row_codes[p]] for p in positions], cells[positions], label_prefix="\\hspace{0.5cm} ", indent=indent))
+        parts.append(f"{indent}\\midrule\n")
+    return "".join(parts)
+
+
+def national_row(values, n_cols, fmt=".3f", missing="-"):
+    # One value spans every column; a list gives one value per column
+    if np.ndim(values) == 0:
+        text = values if isinstance(values, str) else format_values([values], fmt, missing)[0]
+        cells = text if n_cols == 1 else f"\\multicolumn{{{n_cols}}}{{c}}{{{text}}}"
+    else:
+        cells = " & ".join(format_values(values, fmt, missing))
+    return f"\\textbf{{National Average}} & {cells} \\\\"
+
+
+# --- 2. TABLE FRAME ---
+def latex_table(caption, col_labels, body, stub="State NP Authority", label=None, notes="", panel_title=None,
+                footer=None, resize=False, notes_width="0.85\\textwidth", col_format=None, frame="minipage", landscape=False):
+    i1, i2 = ("    ", INDENT) if frame == "minipage" else ("", "")
+    headers = " & ".join(f"\\textbf{{{c}}}" for c in col_labels)
+    col_format = col_format or "l" + "c" * len(col_labels)
+
+    head = []
+    if landscape: head.append("\\begin{landscape}")
+    head += ["\\begin{table}[htbp]", f"{i1}\\centering", f"{i1}\\caption{{{caption}}}"]
+    if label: head.append(f"{i1}\\label{{{label}}}")
+    if frame == "minipage": head.append(f"{i1}\\vspace{{0.2cm}}")
+    else: head.append("\\begin{threeparttable}")
+    if resize: head.append(f"{i1}\\resizebox{{\\textwidth}}{{!}}{{")
+    head += [f"{i1}\\begin{{tabular}}{{{col_format}}}", f"{i2}\\toprule"]
+    if panel_title:
+        head += [f"{i2}& \\multicolumn{{{len(col_labels)}}}{{c}}{{\\textbf{{{panel_title}}}}} \\\\", f"{i2}\\cmidrule(lr){{2-{len(col_labels) + 1}}}"]
+    head += [f"{i2}\\textbf{{{stub}}} & {headers} \\\\", f"{i2}\\midrule"]
+
+    tail = [f"{i2}\\midrule", f"{i2}{footer}"] if footer else []
+    tail += [f"{i2}\\bottomrule", f"{i1}\\end{{tabular}}"]
+    if resize: tail.append(f"{i1}}}")
+    if frame == "minipage":
+        tail += [f"{i1}\\vspace{{0.1cm}}", f"{i1}\\begin{{minipage}}{{{notes_width}}}", f"{i2}\\footnotesize \\textit{{Notes:}} {notes}", f"{i1}\\end{{minipage}}"]
+    else:
+        tail += ["\\begin{tablenotes}[flushleft]", "\\footnotesize", f"\\item Notes: {notes}", "\\end{tablenotes}", "\\end{threeparttable}"]
+    tail.append("\\end{table}")
+    if landscape: tail.append("\\end{landscape}")
+
+    return "\n".join(head) + "\n" + body + "\n".join(tail)
@@ -0,0 +1,116 @@
+import numpy as np
+import pandas as pd
+
+# Panel lags / leads / deltas with Stata's xtset semantics.
+# The .do files run duplicates drop npi year, egen panel_id = group(npi),
+# xtset panel_id year and then gen lag_v = L.v / lead_v = F.v / lag2_v = L2.v
+# / d_v = v - L.v one variable at a time. PanelIndex places every row once in
+# a dense (id x year) grid (a counting sort on the panel key) and resolves,
+# for every shift k, which row holds (id, year - k) with one array lookup;
+# each lag is then one take() over all requested columns at once.
+#
+# Like L., a lag is missing when that exact year is absent for the id (a gap
+# is not bridged by the previous row), when the id is missing ("" counts as
+# missing, as in egen group()) or when year is missing. Repeated (id, year)
+# pairs raise the error xtset would give; drop duplicates first. Works the
+# same for provider panels (npi) and facility panels (ccn / asc_id).
+#
+#   idx = PanelIndex(df, "npi")
+#   df = df.join(idx.lag(df, ["partd_opioid_rate", "tot_benes"], k=2, prefix="lag2_"))
+#   df = add_panel_lags(df, "npi", lag=[...], lead=[...], delta=[...])
+#   codes, size, first = key_codes(df, ["state", "year"])   # one cell id per key combination
+
+
+# --- 1. PANEL ID CODES ---
+def panel_ids(series):
+    # Integer id per distinct value; missing and "" (Stata's missing string) get -1
+    codes, uniques = pd.factorize(series)
+    if pd.api.types.is_numeric_dtype(uniques.dtype):
+        return codes
+    blank = [i for i, u in enumerate(uniques) if str(u).strip() == ""]
+    if blank: codes[np.isin(codes, blank)] = -1
+    return codes
+
+
+def key_codes(df, keys, keep_missing=False):
+    # One code per distinct key combination (-1 = a key is missing), the number of cells and each cell's first row
+    combined = np.zeros(len(df), dtype=np.int64)
+    valid = np.ones(len(df), dtype=bool)
+    for key in keys:
+        codes = pd.factorize(df[key], use_na_sentinel=False)[0] if keep_missing else panel_ids(df[key])
+        valid &= codes >= 0
+        combined = combined * (int(codes.max()) + 1 if len(codes) else 1) + np.maximum(codes, 0)
+    codes = np.full(len(df), -1, dtype=np.int64)
+    codes[valid] = pd.factorize(combined[valid])[0]
+    size = int(codes.max()) + 1 if len(codes) and codes.max() >= 0 else 0
+    first = np.full(size, -1, dtype=np.int64)
+    rows = np.flatnonzero(codes >= 0)
+    first[codes[rows[::-1]]] = rows[::-1]
+    return codes, size, first
+
+
+# --- 2. ONE INDEX, MANY SHIFTS ---
+class PanelIndex:
+
+    def __init__(self, df, panel, time="year"):
+        self.panel = panel
+        self.n = len(df)
+        ids = panel_ids(df[panel]).astype(np.int64)
+        year = pd.to_numeric(df[time], errors="coerce").to_numpy("float64")
+
+        # Only rows with an id and a whole-number year take part in the time structure
+        self.rows = np.flatnonzero((ids >= 0) & ~np.isnan(year) & (year == np.round(year)))
+        self.ids, self.year = ids[self.rows], year[self.rows].astype(np.int64)
+        self.y0 = int(self.year.min()) if len(self.rows) else 0
+        self.span = int(self.year.max()) - self.y0 + 1 if len(self.rows) else 1
+
+        # grid[id * span + year - y0] = row holding that (id, year), -1 if none
+        dtype = np.int32 if self.n < 2 ** 31 else np.int64
+        key = self.ids * self.span + (self.year - self.y0)
+        self.grid = np.full((int(self.ids.max()) + 1 if len(self.rows) else 0) * self.span, -1, dtype=dtype)
+        self.grid[key] = self.rows
+        if (self.grid[key] != self.rows).any():
+            raise ValueError(f"repeated time values within panel ({panel}, {time}); run duplicates drop {panel} {time} first")
+        self._source = {}
+
+    def source(self, k):
+        # Row position holding (id, year - k) for every row, -1 where Stata's Lk. would be missing (k < 0: leads)
+        if k not in self._source:
+            out = np.full(self.n, -1, dtype=self.grid.dtype)
+            target = self.year - k - self.y0
+            ok = (target >= 0) & (target < self.span)
+            out[self.rows[ok]] = self.grid[self.ids[ok] * self.span + target[ok]]
+            self._source[k] = out
+        return self._source[k]
+
+    def _shift(self, df, columns, k):
+        src = self.source(k)
+        values = df[columns].to_numpy("float64")
+        out = values[np.maximum(src, 0)]
+        out[src < 0] = np.nan
+        return out
+
+    def lag(self, df, columns, k=1, prefix="lag_"):
+        # Lk.v for every column; prefix="" keeps the original names
+        return pd.DataFrame(self._shift(df, columns, k), index=df.index, columns=[f"{prefix}{c}" for c in columns])
+
+    def lead(self, df, columns, k=1, prefix="lead_"):
+        # Fk.v
+        return pd.DataFrame(self._shift(df, columns, -k), index=df.index, columns=[f"{prefix}{c}" for c in columns])
+
+    def delta(self, df, columns, k=1, prefix="d_"):
+        # v - Lk.v
+        values = df[columns].to_numpy("float64") - self._shift(df, columns, k)
+        return pd.DataFrame(values, index=df.index, columns=[f"{prefix}{c}" for c in columns])
+
+
+# --- 3. ONE-CALL HELPER ---
+def add_panel_lags(df, panel, lag=(), lead=(), delta=(), k=1, time="year"):
+    # gen lag_v = Lk.v / lead_v = Fk.v / d_v = v - Lk.v; k=2 names them lag2_ / lead2_ / d2_
+    idx = PanelIndex(df, panel, time)
+    tag = "" if k == 1 else str(k)
+    parts = [df]
+    if lag: parts.append(idx.lag(df, list(lag), k, prefix=f"lag{tag}_"))
+    if lead: parts.append(idx.lead(df, list(lead), k, prefix=f"lead{tag}_"))
+    if delta: parts.append(idx.delta(df, list(delta), k, prefix=f"d{tag}_"))
+    return pd.concat(parts, axis=1) if len(parts) > 1 else df
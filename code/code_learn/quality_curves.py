@@ -0,0 +1,372 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+import run_profile
+from build_manifest import write_if_changed
+from panel_lags import PanelIndex
+from grouped_stats import DATA_ROOT, OUTPUT_ROOT, dta_columns, _by_value, _authority, _own_category
+
+# Binned means for the 08a / 08a_2yr_lag / 08b / 09a / 09b quality curves.
+# The .do files run one binscatter per (q_var x b_var x direction x timing x
+# subgroup), and every call re-sorts x and recomputes its 20 quantiles from
+# scratch. Here x is sorted within each subgroup ONCE (BinIndex) and every y
+# paired with that x reuses the sorted order: a y only drops its own missing
+# rows (binscatter's sample is y, x and the by() variable all non-missing) and
+# takes the xtile cut points by position, so no y re-sorts anything. Bins
+# match binscatter's defaults: nquantiles(20), separate bins per by() group,
+# ties at a cut point go to the lower bin, empty bins are dropped. Each curve
+# also carries its line(qfit) coefficients (reg y c.x##c.x on the underlying
+# rows of that group).
+#
+# All curves of one script / setting land in one long table (direction,
+# timing, subgroup, y_var, x_var, group, bin, x_mean, y_mean, n, fit_b0..2),
+# written as bins_<script>.csv next to the PNG folders it would feed.
+#
+#   python quality_curves.py               -> every script
+#   python quality_curves.py 08a 09a       -> just the named script(s)
+#   python quality_curves.py --profile     -> also write a per-stage run report (run_profile)
+
+# --- 1. DEFINITIONS (mirror the .do files) ---
+NQUANTILES = 20
+
+PROVIDER_QUAL = ["mips_final_score", "mips_quality_score", "mips_pi_score", "mips_ia_score", "mips_cost_score"]
+PROVIDER_BEHAV = ["partd_generic_rate", "partd_opioid_rate", "partb_em_upcode_rate", "bene_avg_risk_scre", "tot_benes", "tot_sbmtd_chrg",
+                  "total_rvu", "total_services", "total_medicare_payment"]
+
+PANELS = {
+    ("provider", "in_patient"): {"data": "master_provider_inpatient_2013_2023.dta", "panel": ["npi"], "state": ["cms_state"],
+                                 "ownership": "master_facility_inpatient_2013_2023.dta", "qual": PROVIDER_QUAL, "behav": PROVIDER_BEHAV},
+    ("provider", "out_patient"): {"data": "master_provider_outpatient_asc_2015_2023.dta", "panel": ["npi"], "state": ["cms_state"],
+                                  "qual": PROVIDER_QUAL, "behav": PROVIDER_BEHAV},
+    ("facility", "in_patient"): {"data": "master_facility_inpatient_2013_2023.dta", "panel": ["ccn"], "state": ["cms_state", "state"],
+                                 "qual": ["hcahps_100_score", "hcahps_grp1", "hcahps_grp2", "hcahps_grp3", "hcahps_grp4"],
+                                 "behav": ["hac_total_score", "rrp_excess_ratio_ami", "rrp_excess_ratio_hf", "rrp_excess_ratio_pn", "mortality_rate_ami",
+                                           "mortality_rate_hf", "mortality_rate_pn", "mspb_score", "hvbp_tps_score", "fac_mips_final_score",
+                                           "fac_mips_quality_score", "fac_mips_pi_score", "fac_mips_ia_score", "fac_mips_cost_score", "hopd_op_8",
+                                           "hopd_op_10", "hopd_op_13", "hopd_op_18b", "hopd_op_22", "hopd_op_32", "hopd_op_36"]},
+    ("facility", "out_patient"): {"data": "master_facility_outpatient_asc_2015_2024.dta", "panel": ["asc_id", "ccn"], "state": ["cms_state", "state"],
+                                  "qual": ["oas_100_score", "oas_grp1", "oas_grp2", "oas_grp3"],
+                                  "behav": ["asc_rate_1", "asc_rate_2", "asc_rate_8", "fac_mips_final_score", "fac_mips_quality_score",
+                                            "fac_mips_pi_score", "fac_mips_ia_score", "fac_mips_cost_score"]},
+}
+
+# x-variable prefix per timing folder and the shift that builds it (L. / F. / L2.)
+TIMINGS = {"current_year": ("", 0), "lag_prior_year": ("lag_", 1), "lead_next_year": ("lead_", -1), "lag_two_year": ("lag2_", 2)}
+DIRECTIONS = ["quality_predicts_behavior", "behavior_predicts_quality"]
+
+# Subgroup folder -> by() variable, with the legend order(...) labels
+SUBGROUPS = {
+    "overall": None,
+    "by_prov_type": "prov_type",
+    "by_gender": "female_num",
+    "by_dept": "dept_cat",
+    "by_grad_decade": "grad_decade",
+    "by_authority": "np_authority",
+    "by_ownership": "own_category",
+}
+GROUP_LABELS = {
+    "prov_type": {1: "MD/DO", 2: "NP", 3: "PA"},
+    "female_num": {0: "Male", 1: "Female"},
+    "dept_cat": {1: "Specialty", 2: "Gen Med", 3: "Primary Care"},
+    "grad_decade": {1: "Pre-1990", 2: "1990s", 3: "2000s", 4: "2010s+"},
+    "np_authority": {1: "Restricted", 2: "Reduced", 3: "Full"},
+    "own_category": {1: "Gov", 2: "For-Profit", 3: "Non-Profit"},
+}
+LEVEL_SUBGROUPS = {
+    "provider": ["overall", "by_prov_type", "by_gender", "by_dept", "by_grad_decade", "by_authority", "by_ownership"],
+    "facility": ["overall", "by_authority", "by_ownership"],
+}
+
+CURVES = {
+    "08a": {"level": "provider", "analysis": "provider_analysis", "timings": ["current_year", "lag_prior_year", "lead_next_year"]},
+    "08a_2yr_lag": {"level": "provider", "analysis": "provider_analysis", "timings": ["lag_two_year"]},
+    "08b": {"level": "facility", "analysis": "facility_analysis", "timings": ["current_year", "lag_prior_year", "lead_next_year"]},
+    "09a": {"level": "provider", "analysis": "provider_analysis_nys", "ny_only": True,
+            "timings": ["current_year", "lag_prior_year", "lead_next_year", "lag_two_year"]},
+    "09b": {"level": "facility", "analysis": "facility_analysis_nys", "ny_only": True,
+            "timings": ["current_year", "lag_prior_year", "lead_next_year", "lag_two_year"]},
+}
+SETTINGS = ["in_patient", "out_patient"]
+
+# $cond_gen_med
+GEN_MED_SPECS = ["FAMILY PRACTICE", "FAMILY MEDICINE", "EMERGENCY MEDICINE", "GENERAL PRACTICE", "HOSPITALIST", "INTERNAL MEDICINE",
+                 "NURSE PRACTITIONER", "PAIN MANAGEMENT", "PHYSICIAN ASSISTANT"]
+GENDER_COLS = ["nppes_provider_gender", "rndrng_prvdr_gndr", "is_female"]
+
+
+# --- 2. BINNING ENGINE ---
+def xtile_cuts(xs, nquantiles=NQUANTILES):
+    # _pctile cut points of a sorted vector: P = n*k/nq; x[P]+x[P+1] halved when P is whole, else x[floor(P)+1]
+    n = len(xs)
+    pos = n * np.arange(1, nquantiles)
+    lo = pos // nquantiles
+    whole = pos % nquantiles == 0
+    return np.where(whole, (xs[np.maximum(lo - 1, 0)] + xs[lo]) / 2, xs[lo])
+
+
+def qfit(xs, ys):
+    # reg y c.x##c.x -> (b0, b1, b2); solved on standardized x, so large-valued x (charges, payments) stays well conditioned
+    if len(xs) == 0:
+        return np.nan, np.nan, np.nan
+    m, s = xs.mean(), xs.std()
+    s = s if s > 0 else 1.0
+    u = (xs - m) / s
+    u2 = u * u
+    su, su2, su3, su4 = u.sum(), u2.sum(), (u2 * u).sum(), (u2 * u2).sum()
+    a = np.array([[len(xs), su, su2], [su, su2, su3], [su2, su3, su4]])
+    c0, c1, c2 = np.linalg.lstsq(a, np.array([ys.sum(), u @ ys, u2 @ ys]), rcond=None)[0]  # collinear terms drop out like regress omits them
+    return c0 - c1 * m / s + c2 * m * m / (s * s), c1 / s - 2 * c2 * m / (s * s), c2 / (s * s)
+
+
+class BinIndex:
+    # One x variable (optionally within by() groups), sorted once; curve(y) bins any y against it
+
+    def __init__(self, x, group=None, nquantiles=NQUANTILES):
+        self.nq = nquantiles
+        ok = ~np.isnan(x) if group is None else ~np.isnan(x) & ~np.isnan(group)
+        rows = np.flatnonzero(ok)
+        self.groups, gcode = np.unique(group[rows], return_inverse=True) if group is not None else (np.array([np.nan]), np.zeros(len(rows), dtype=np.intp))
+        order = np.lexsort((x[rows], gcode))
+        self.rows = rows[order]
+        self.x = x[self.rows]
+        self.bounds = np.searchsorted(gcode[order], np.arange(len(self.groups) + 1))
+        self._full = {}
+
+    def _bins(self, g, xs, complete):
+        # 0-based bin per sorted row; cached for groups where y is never missing (same sample as x alone)
+        if complete and g in self._full:
+            return self._full[g]
+        bins = np.searchsorted(xtile_cuts(xs, self.nq), xs, side="left")
+        if complete: self._full[g] = bins
+        return bins
+
+    def curve(self, y):
+        # Per group and non-empty bin: group position, bin (1..nq), x mean, y mean, n; plus the group's qfit coefficients
+        y = y[self.rows]
+        keep = ~np.isnan(y)
+        out = []
+        for g in range(len(self.groups)):
+            s = slice(self.bounds[g], self.bounds[g + 1])
+            k = keep[s]
+            complete = bool(k.all())
+            xs, ys = (self.x[s], y[s]) if complete else (self.x[s][k], y[s][k])
+            if len(xs) == 0: continue
+            bins = self._bins(g, xs, complete)
+            n = np.bincount(bins, minlength=self.nq)
+            used = np.flatnonzero(n)
+            sx = np.bincount(bins, xs, minlength=self.nq)[used]
+            sy = np.bincount(bins, ys, minlength=self.nq)[used]
+            out.append((np.full(len(used), g), used + 1, sx / n[used], sy / n[used], n[used], qfit(xs, ys)))
+        return out
+
+
+def binscatter_table(df, pairs, by=None, nquantiles=NQUANTILES):
+    # Long table of binned means for [(y_var, x_var), ...]: one BinIndex per x, shared by every y it is paired with
+    group = None if by is None else df[by].to_numpy("float64")
+    by_x = {}
+    for y_var, x_var in pairs:
+        if y_var in df.columns and x_var in df.columns: by_x.setdefault(x_var, []).append(y_var)
+
+    cols = {k: [] for k in ("pair", "group", "bin", "x_mean", "y_mean", "n", "fit_b0", "fit_b1", "fit_b2")}
+    names = []
+    for x_var, y_vars in by_x.items():
+        with run_profile.stage("binscatter", f"{x_var} by {by or 'overall'}"):
+            idx = BinIndex(df[x_var].to_numpy("float64"), group, nquantiles)
+            for y_var in y_vars:
+                for g, b, xm, ym, n, fit in idx.curve(df[y_var].to_numpy("float64")):
+                    cols["pair"].append(np.full(len(b), len(names)))
+                    cols["group"].append(idx.groups[g])
+                    for key, val in zip(("bin", "x_mean", "y_mean", "n"), (b, xm, ym, n)): cols[key].append(val)
+                    for key, val in zip(("fit_b0", "fit_b1", "fit_b2"), fit): cols[key].append(np.full(len(b), val))
+                names.append((y_var, x_var))
+
+    if not names or not cols["pair"]:
+        return pd.DataFrame(columns=["y_var", "x_var", "by_var"] + list(cols)[1:])
+    out = pd.DataFrame({k: np.concatenate(v) for k, v in cols.items()})
+    pair = out.pop("pair").to_numpy()
+    out.insert(0, "y_var", np.array([y for y, _ in names], dtype=object)[pair])
+    out.insert(1, "x_var", np.array([x for _, x in names], dtype=object)[pair])
+    out.insert(2, "by_var", by or "")
+    return out
+
+
+# --- 3. TAXONOMY (as 08a / 08b build it) ---
+def _credential_type(text):
+    # inlist(cred_str, "MD", "DO") -> 1, "NP" -> 2, "PA" -> 3 (exact match, no trimming)
+    cred = text.to_numpy()
+    return np.select([np.isin(cred, ["MD", "DO"]), cred == "NP", cred == "PA"], [1.0, 2.0, 3.0], np.nan)
+
+
+def _dept(text):
+    spec = text.str.upper()
+    primary = spec.str.contains("FAMILY PRACTICE", regex=False) | spec.str.contains("GENERAL PRACTICE", regex=False)
+    return np.select([primary, spec.str.strip().isin(GEN_MED_SPECS)], [3.0, 2.0], 1.0)
+
+
+def _state(text):
+    return text.str.strip().str.upper().to_numpy()
+
+
+def female_num(df, fill_unknown=True):
+    # "Bulletproof gender": string gender columns in order (later wins), then is_female only where still unknown.
+    # fill_unknown=False is 06a's chain of capture replace: a numeric is_female overwrites, a string one errors out
+    out = np.full(len(df), np.nan)
+    for col in GENDER_COLS[:2]:
+        if col in df.columns and pd.api.types.is_string_dtype(df[col].dtype):
+            raw = df[col].to_numpy()
+            out[raw == "F"], out[raw == "M"] = 1.0, 0.0
+    if "is_female" in df.columns:
+        raw = df["is_female"]
+        if pd.api.types.is_numeric_dtype(raw.dtype):
+            fem, male = (raw == 1).to_numpy(), (raw == 0).to_numpy()
+        elif pd.api.types.is_string_dtype(raw.dtype) and fill_unknown:
+            fem, male = raw.isin(["F", "Female", "1"]).to_numpy(), raw.isin(["M", "Male", "0"]).to_numpy()
+        else:
+            fem = male = np.zeros(len(df), dtype=bool)
+        unknown = np.isnan(out) if fill_unknown else np.ones(len(df), dtype=bool)
+        out[unknown & fem], out[unknown & male] = 1.0, 0.0
+    return out
+
+
+def grad_decade(df):
+    if "grad_year" not in df.columns or not pd.api.types.is_numeric_dtype(df["grad_year"].dtype):
+        return np.full(len(df), np.nan)
+    year = df["grad_year"].to_numpy("float64")
+    return np.select([year < 1990, year < 2000, year < 2010, year >= 2010], [1.0, 2.0, 3.0, 4.0], np.nan)
+
+
+# --- 4. PANELS ---
+def merge_ownership(df, data):
+    # merge m:1 ccn year using the facility ownership (duplicates drop ccn year), keep(master match)
+    if "ccn" not in df.columns or "ownership" in df.columns:
+        return df
+    fac_path = os.path.join(DATA_ROOT, data)
+    fac = pd.read_stata(fac_path, columns=[c for c in ["ccn", "year", "ownership"] if c in dta_columns(fac_path)])
+    return df.merge(fac.drop_duplicates(["ccn", "year"]), on=["ccn", "year"], how="left") if "ownership" in fac.columns else df
+
+
+def panel_columns(cfg, path):
+    available = dta_columns(path)
+    wanted = cfg["panel"] + ["year"] + cfg["state"] + cfg["qual"] + cfg["behav"]
+    wanted += ["ccn", "ownership", "credential", "cms_specialty", "grad_year"] + GENDER_COLS
+    return [c for c in available if c in wanted]
+
+
+def load_panel(level, setting, ny_only=False):
+    # Master panel with the script's taxonomy, NYS filter and duplicates drop, before any lag
+    cfg = PANELS[(level, setting)]
+    path = os.path.join(DATA_ROOT, cfg["data"])
+    cols = panel_columns(cfg, path)
+    with run_profile.stage("read_stata", cfg["data"]):
+        df = pd.read_stata(path, columns=cols, convert_missing=False, preserve_dtypes=True)
+    print(f"Read {len(df)} rows x {len(cols)} columns from {path}.")
+
+    if cfg.get("ownership"):
+        df = merge_ownership(df, cfg["ownership"])
+
+    state = next((c for c in cfg["state"] if c in df.columns), None)
+    if state is not None:
+        if ny_only:
+            df = df[_by_value(df[state], _state) == "NY"].reset_index(drop=True)
+            print(f"NYS observations kept: {len(df)}")
+        df["np_authority"] = _by_value(df[state], _authority)
+    else:
+        df["np_authority"] = np.nan
+    df["own_category"] = _by_value(df["ownership"], _own_category) if setting == "in_patient" and "ownership" in df.columns else np.nan
+
+    if level == "provider":
+        df["prov_type"] = _by_value(df["credential"], _credential_type) if "credential" in df.columns else np.nan
+        df["dept_cat"] = _by_value(df["cms_specialty"], _dept) if "cms_specialty" in df.columns else 1.0
+        df["female_num"] = female_num(df)
+        df["grad_decade"] = grad_decade(df)
+        for v in cfg["qual"] + cfg["behav"]:
+            # replace v = . if v < 0 | v > 100 for the MIPS scores
+            if "mips" in v and v in df.columns: df[v] = df[v].where(df[v].between(0, 100))
+
+    panel = next((c for c in cfg["panel"] if c in df.columns), None)
+    if panel:
+        df = df.drop_duplicates([panel, "year"]).reset_index(drop=True)
+    return df, panel
+
+
+def add_timing_columns(df, panel, variables, timings):
+    # lag_v = L.v, lead_v = F.v, lag2_v = L2.v for the timings a script plots
+    idx = PanelIndex(df, panel) if panel else None
+    parts = [df]
+    for timing in timings:
+        prefix, k = TIMINGS[timing]
+        if not k: continue
+        if idx is None:
+            parts.append(pd.DataFrame(np.nan, index=df.index, columns=[f"{prefix}{v}" for v in variables]))
+        else:
+            parts.append(idx.lag(df, variables, k, prefix) if k > 0 else idx.lead(df, variables, -k, prefix))
+    return pd.concat(parts, axis=1) if len(parts) > 1 else df
+
+
+# --- 5. ONE SCRIPT ---
+def curve_specs(qual, behav, timings):
+    # (direction, timing, y_var, x_var) exactly as the nested loops build them
+    rows = []
+    for q in qual:
+        for b in behav:
+            for d in DIRECTIONS:
+                for t in timings:
+                    prefix = TIMINGS[t][0]
+                    rows.append((d, t, b, prefix + q) if d == DIRECTIONS[0] else (d, t, q, prefix + b))
+    return pd.DataFrame(rows, columns=["direction", "timing", "y_var", "x_var"])
+
+
+def curve_table(df, specs, subgroups, nquantiles=NQUANTILES):
+    pairs = list(specs[["y_var", "x_var"]].itertuples(index=False, name=None))
+    parts = []
+    for sub in subgroups:
+        by = SUBGROUPS[sub]
+        if by is not None and (by not in df.columns or df[by].isna().all()): continue  # count if !missing(...) is 0
+        table = binscatter_table(df, pairs, by, nquantiles)
+        table.insert(0, "subgroup", sub)
+        table.insert(table.columns.get_loc("group") + 1, "group_label",
+                     table["group"].map(GROUP_LABELS.get(by, {})) if by else "Overall")
+        parts.append(table)
+    if not parts:
+        return pd.DataFrame()
+    out = specs.merge(pd.concat(parts, ignore_index=True), on=["y_var", "x_var"], how="inner")
+    return out[["direction", "timing", "subgroup", "y_var", "x_var", "by_var", "group", "group_label", "bin",
+                "x_mean", "y_mean", "n", "fit_b0", "fit_b1", "fit_b2"]]
+
+
+def run_curves(names, profile=None, nquantiles=NQUANTILES):
+    run_profile.start(enabled=profile)
+    panels = {}
+    for name in names:
+        cfg = CURVES[name]
+        for setting in SETTINGS:
+            key = (cfg["level"], setting, cfg.get("ny_only", False))
+            if key not in panels: panels[key] = load_panel(*key)
+            df, panel = panels[key]
+            pcfg = PANELS[(cfg["level"], setting)]
+            qual = [v for v in pcfg["qual"] if v in df.columns]
+            behav = [v for v in pcfg["behav"] if v in df.columns]
+            df = add_timing_columns(df, panel, qual + behav, cfg["timings"])
+
+            subgroups = [s for s in LEVEL_SUBGROUPS[cfg["level"]] if s != "by_ownership" or setting == "in_patient"]
+            table = curve_table(df, curve_specs(qual, behav, cfg["timings"]), subgroups, nquantiles)
+
+            out_dir = os.path.join(OUTPUT_ROOT, setting, "quality_curves", cfg["analysis"])
+            os.makedirs(out_dir, exist_ok=True)
+            path = os.path.join(out_dir, f"bins_{name}.csv")
+            with run_profile.stage("write_csv", f"bins_{name}", outputs=[path]):
+                changed = write_if_changed(path, table.to_csv(index=False, na_rep="", lineterminator="\n"))
+            n_curves = len(table.groupby(["direction", "timing", "subgroup", "y_var", "x_var"], observed=True)) if len(table) else 0
+            print(f"[{name} {setting}] {n_curves} curves, {len(table)} bins -> {path}{'' if changed else ' (unchanged)'}.")
+    run_profile.finish(OUTPUT_ROOT)
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    names = [a for a in args if not a.startswith("--")]
+    unknown = [n for n in names if n not in CURVES]
+    if unknown:
+        sys.exit(f"Unknown script(s) {unknown}; choose from {list(CURVES)}.")
+    run_curves(names or list(CURVES), profile=True if "--profile" in args else None)
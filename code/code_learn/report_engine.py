@@ -0,0 +1,425 @@
+import time
+_START = time.perf_counter()
+
+import os
+import sys
+import glob
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+import csv_ingest, label_codes, latex_tables, heatmap_render
+import run_profile
+from csv_ingest import CsvTables
+from latex_tables import tex_escape, format_block, emit_rows, emit_panels, national_row, latex_table
+from label_codes import decode_frame, AUTH_LEVELS, OWN_LEVELS, PROV_LEVELS, GENDER_LEVELS
+from tex_compile import TexCompilePool, default_workers as default_tex_workers
+from build_manifest import BuildManifest, MANIFEST_NAME, write_if_changed
+from heatmap_render import heatmap_job, heatmap_path, render_heatmaps, default_output as default_heat_output, HEAT_OUTPUTS
+
+# One reporting engine for the summary-stat tables and heatmaps.
+# 01b-04b and 00b used to be near-identical copies; each is now one entry of
+# SETTINGS (output folder, desc_dict, grouping table, colormap and caption
+# text). run_settings processes any number of settings in one process: every
+# heatmap goes through one render pool and every PDF through one pdflatex
+# thread pool. Output file names are the ones the old scripts wrote.
+#
+#   python report_engine.py                     -> every setting
+#   python report_engine.py in_patient_macro    -> just the named setting(s)
+#   python report_engine.py --tables-only       -> LaTeX/PDF only (no matplotlib import)
+#   python report_engine.py --heatmaps-only     -> heatmap PNGs only
+#   python report_engine.py --profile           -> also write a per-stage run report (run_profile)
+#   python report_engine.py --heat-format=pdf   -> vector heatmaps (final | preview | pdf | svg)
+#   python report_engine.py --embed-heatmaps    -> with pdf heatmaps, add each one under its table PDF
+#
+# Tables and heatmaps are tracked as separate manifest entries, so either
+# mode can run on its own without marking the other output as up to date.
+
+# --- 1. SETTINGS ---
+OUTPUT_ROOT = os.environ.get("NP_OUTPUT_ROOT") or r"C:\Users\omarf\Dropbox\personal_files_omar_farrag\Research\projects\NYS_npPolicy\output\summary_stats"  # NP_OUTPUT_ROOT = another tree (e.g. bench_reports.py)
+FMT_CACHE = os.path.join(OUTPUT_ROOT, "_fmt_cache")  # preloaded LaTeX formats, shared by every setting
+
+IN_PATIENT_MACRO_DESC = {
+    "hcahps_100_score": ("Overall HCAHPS Score", "Score: 0-100 linear mean score representing patient satisfaction. Higher is better."),
+    "hcahps_grp1": ("HCAHPS: Staff Communication", "Score: 0-100 composite for Staff Communication (Nurses and Doctors). Higher is better."),
+    "hcahps_grp2": ("HCAHPS: Patient Help", "Score: 0-100 composite for Providing Patient Help (Responsiveness & Meds). Higher is better."),
+    "hcahps_grp3": ("HCAHPS: Environment", "Score: 0-100 composite for Facility Environment (Cleanliness & Quietness). Higher is better."),
+    "hcahps_grp4": ("HCAHPS: Global Rating", "Score: 0-100 composite for Global Rating and Recommendation. Higher is better."),
+    "h_hosp_rating_9_10": ("HCAHPS: Rating 9 or 10", "Rate: Percentage of patients rating the hospital a 9 or 10 overall. Higher is better."),
+    "h_hosp_rating_0_6": ("HCAHPS: Rating 0 to 6", "Rate: Percentage of patients rating the hospital a 0 to 6 overall. Lower is better."),
+    "hac_total_score": ("HAC Penalty Score", "Score: 1-10 Hospital-Acquired Condition index. Higher means worse safety (penalized > 6.75)."),
+    "rrp_excess_ratio_ami": ("AMI Readmission Ratio", "Ratio: Observed divided by Expected (O/E) readmissions. >1.0 triggers penalties."),
+    "rrp_excess_ratio_hf": ("HF Readmission Ratio", "Ratio: Observed divided by Expected (O/E) readmissions. >1.0 triggers penalties."),
+    "rrp_excess_ratio_pn": ("Pneumonia Readmission Ratio", "Ratio: Observed divided by Expected (O/E) readmissions. >1.0 triggers penalties."),
+    "mortality_rate_ami": ("30-Day AMI Mortality", "Rate: 30-Day risk-standardized mortality rate. Lower is better."),
+    "mortality_rate_hf": ("30-Day HF Mortality", "Rate: 30-Day risk-standardized mortality rate. Lower is better."),
+    "mortality_rate_pn": ("30-Day PN Mortality", "Rate: 30-Day risk-standardized mortality rate. Lower is better."),
+    "mspb_score": ("Medicare Spending Per Beneficiary", "Ratio: Hospital spending divided by the national median (1.0 = Average). Lower is more efficient."),
+    "hvbp_tps_score": ("Value-Based Purchasing Score", "Score: 0-100 Total Performance Score across efficiency and quality. Higher is better."),
+    "partd_opioid_rate": ("Opioid Prescribing Rate", "Rate: Percentage of total Part D claims for opioids by affiliated staff."),
+    "partb_em_upcode_rate": ("E&M Upcode Rate", "Rate: Percentage of E&M visits billed as high-intensity Level 4/5 by affiliated staff."),
+    "partb_low_value_rate": ("Low-Value Care Rate", "Rate: Percentage of services categorized as 'Choosing Wisely' discouraged."),
+    "partb_imaging_adv_rate": ("Advanced Imaging Rate", "Rate: Percentage of imaging claims representing CT/MRI/PET vs standard x-ray."),
+    "mips_final_score": ("Facility Avg: MIPS Final Score", "Score: 0-100 weighted facility average of affiliated providers' MIPS composite score."),
+    "mips_quality_score": ("Facility Avg: MIPS Quality", "Score: 0-100 weighted facility average of affiliated providers' MIPS Quality domain."),
+    "mips_pi_score": ("Facility Avg: MIPS PI", "Score: 0-100 weighted facility avg of MIPS Promoting Interoperability (EHR) domain."),
+    "mips_ia_score": ("Facility Avg: MIPS Improvement", "Score: 0-100 weighted facility average of affiliated providers' MIPS Improvement Activities domain."),
+    "mips_cost_score": ("Facility Avg: MIPS Cost", "Score: 0-100 weighted facility average of affiliated providers' MIPS Cost domain."),
+    "pct_np": ("Workforce %: NPs", "Percentage: NPs divided by total billing MD/DO/PA/NPs at the facility."),
+    "pct_md": ("Workforce %: MD/DOs", "Percentage: MD/DOs divided by total billing MD/DO/PA/NPs at the facility."),
+    "pct_pa": ("Workforce %: PAs", "Percentage: PAs divided by total billing MD/DO/PA/NPs at the facility."),
+    "hopd_op_8": ("HOPD Metric: OP-8", "Rate: MRI Lumbar Spine for Low Back Pain without prior conservative therapy."),
+    "hopd_op_10": ("HOPD Metric: OP-10", "Rate: Abdomen CT with Contrast Material. Lower is better."),
+    "hopd_op_13": ("HOPD Metric: OP-13", "Rate: Cardiac Imaging for Preoperative Risk Assessment. Lower is better."),
+    "hopd_op_18b": ("HOPD Metric: OP-18b", "Time: Median time from ED arrival to ED departure (in minutes). Lower is better."),
+    "hopd_op_22": ("HOPD Metric: OP-22", "Rate: Percentage of patients who left the ED without being seen. Lower is better."),
+    "hopd_op_32": ("HOPD Metric: OP-32", "Rate: Unplanned hospital visits within 7 days of outpatient colonoscopy. Lower is better."),
+    "hopd_op_36": ("HOPD Metric: OP-36", "Rate: Unplanned hospital visits within 7 days of outpatient surgery. Lower is better.")
+}
+
+IN_PATIENT_MICRO_DESC = {
+    "partd_generic_rate": ("Generic Prescribing Rate", "Rate: Proportion of total Part D prescriptions filled with generic drugs. Higher implies cost efficiency."),
+    "partd_opioid_rate": ("Opioid Prescribing Rate", "Rate: Proportion of total Part D claims that are Schedule II/III opioids."),
+    "partb_em_upcode_rate": ("Provider E&M Upcode Rate", "Rate: Proportion of total E&M visits billed at the highest intensity (Level 4/5)."),
+    "mips_final_score": ("MIPS Final Score", "Score: 0-100 composite payment adjustment score. Higher reflects better overall clinical value."),
+    "mips_quality_score": ("MIPS Quality Domain", "Score: 0-100 performance on evidence-based quality measures."),
+    "mips_pi_score": ("MIPS Promoting Interoperability", "Score: 0-100 performance on EHR integration and patient data access."),
+    "mips_ia_score": ("MIPS Improvement Activities", "Score: 0-100 performance on practice improvements like care coordination."),
+    "mips_cost_score": ("MIPS Cost Domain", "Score: 0-100 performance on total cost of care / resource use."),
+    "bene_avg_risk_scre": ("Average Patient Risk Score (HCC)", "Score: Hierarchical Condition Category (HCC) risk score. Higher implies a more complex/sicker panel."),
+    "tot_benes": ("Total Beneficiaries Treated", "Count: Total number of unique Medicare beneficiaries treated by the provider."),
+    "tot_sbmtd_chrg": ("Total Submitted Charges", "Financial: Total dollars billed to Medicare by the provider.")
+}
+
+OUT_PATIENT_MACRO_DESC = {
+    "asc_rate_1": ("ASC-1: Patient Burns Rate", "Rate: Percentage of patients experiencing a burn prior to discharge. Lower is better."),
+    "asc_rate_2": ("ASC-2: Patient Falls Rate", "Rate: Percentage of patients experiencing a fall within the ASC. Lower is better."),
+    "asc_rate_8": ("ASC-8: Influenza Vaccination Coverage", "Rate: Percentage of healthcare personnel vaccinated for influenza. Higher is better."),
+    "oas_100_score": ("Overall OAS CAHPS Score", "Score: 0-100 linear mean score representing patient satisfaction at the ASC. Higher is better."),
+    "oas_grp1": ("OAS CAHPS: Communication", "Score: 0-100 composite for Patient Communication."),
+    "oas_grp2": ("OAS CAHPS: Care & Cleanliness", "Score: 0-100 composite for Professional Care and Facility Cleanliness."),
+    "oas_grp3": ("OAS CAHPS: Prep & Discharge", "Score: 0-100 composite for Preparation and Discharge."),
+    "oas_rating_9_10": ("OAS CAHPS: Rating 9 or 10", "Rate: Percentage of patients rating the ASC a 9 or 10 overall. Higher is better."),
+    "oas_rating_0_6": ("OAS CAHPS: Rating 0 to 6", "Rate: Percentage of patients rating the ASC a 0 to 6 overall. Lower is better."),
+    "fac_mips_final_score": ("Facility Avg: MIPS Final Score", "Score: 0-100 weighted facility average of affiliated providers' MIPS composite score."),
+    "fac_mips_quality_score": ("Facility Avg: MIPS Quality", "Score: 0-100 weighted facility average of affiliated providers' MIPS Quality domain."),
+    "fac_mips_ia_score": ("Facility Avg: MIPS Improvement", "Score: 0-100 weighted facility average of affiliated providers' MIPS Improvement Activities domain."),
+    "fac_mips_pi_score": ("Facility Avg: MIPS PI", "Score: 0-100 weighted facility avg of MIPS Promoting Interoperability (EHR) domain."),
+    "fac_mips_cost_score": ("Facility Avg: MIPS Cost", "Score: 0-100 weighted facility average of affiliated providers' MIPS Cost domain.")
+}
+
+OUT_PATIENT_MICRO_DESC = {
+    "mips_final_score": ("MIPS Final Score", "Score: 0-100 composite payment adjustment score. Higher reflects better overall clinical value."),
+    "mips_quality_score": ("MIPS Quality Domain", "Score: 0-100 performance on evidence-based quality measures."),
+    "mips_pi_score": ("MIPS Promoting Interoperability", "Score: 0-100 performance on EHR integration and patient data access."),
+    "mips_ia_score": ("MIPS Improvement Activities", "Score: 0-100 performance on practice improvements like care coordination."),
+    "mips_cost_score": ("MIPS Cost Domain", "Score: 0-100 performance on total cost of care / resource use."),
+    "tot_benes": ("Total Beneficiaries Treated", "Count: Total number of unique Medicare beneficiaries treated by the provider."),
+    "tot_sbmtd_chrg": ("Total Submitted Charges", "Financial: Total dollars billed to Medicare by the provider.")
+}
+
+PROVTYPE_NOTES = "NP Law categories represent Restricted (supervision), Reduced (collaborative), and Full (independent practice). Categorization reflects the regulatory environment as of 2023."
+
+# Authority x group tables ({var}_by_auth_ownership.csv / {var}_by_auth_provtype.csv)
+GROUPINGS = {
+    "ownership": {"kind": "by_auth_ownership", "column": "own_category", "levels": OWN_LEVELS, "title": "Hospital Ownership",
+                  "caption": "by Authority and Ownership", "label": "own", "notes": "Categorization reflects the regulatory environment as of 2023."},
+    "provtype": {"kind": "by_auth_provtype", "column": "prov_type", "levels": PROV_LEVELS, "title": "Provider Type",
+                 "caption": "by Authority and Provider Type", "label": "provtype", "notes": PROVTYPE_NOTES},
+}
+
+SETTINGS = {
+    "in_patient_macro": {"base_dir": os.path.join(OUTPUT_ROOT, "in_patient", "macro_stats"), "desc_dict": IN_PATIENT_MACRO_DESC,
+                         "grouping": "ownership", "timeline_cmap": "Purples", "timeline_heatmap": "{var}_timeline_heatmap.png",
+                         "timeline_caption": "", "timeline_notes": "", "full_sample": False},
+    "in_patient_micro": {"base_dir": os.path.join(OUTPUT_ROOT, "in_patient", "micro_stats"), "desc_dict": IN_PATIENT_MICRO_DESC,
+                         "grouping": "provtype", "timeline_cmap": "Oranges", "timeline_heatmap": "{var}_timeline_heatmap.png",
+                         "timeline_caption": " (Overall Providers)", "timeline_notes": " Aggregated across all provider types.", "full_sample": False},
+    "out_patient_macro": {"base_dir": os.path.join(OUTPUT_ROOT, "out_patient", "macro_stats"), "desc_dict": OUT_PATIENT_MACRO_DESC,
+                          "grouping": None, "timeline_cmap": "Greens", "timeline_heatmap": "{var}_heatmap.png",
+                          "timeline_caption": "", "timeline_notes": "", "full_sample": True},
+    "out_patient_micro": {"base_dir": os.path.join(OUTPUT_ROOT, "out_patient", "micro_stats"), "desc_dict": OUT_PATIENT_MICRO_DESC,
+                          "grouping": "provtype", "timeline_cmap": "Oranges", "timeline_heatmap": "{var}_timeline_heatmap.png",
+                          "timeline_caption": " (Overall Providers)", "timeline_notes": " Aggregated across all provider types.", "full_sample": False},
+    "demographics": {"base_dir": os.path.join(OUTPUT_ROOT, "demographics"), "demographics": "national"},
+}
+
+# Provider-count tables from the 00/00d demographics do-files (national 00b, NYS 00e)
+DEMOGRAPHIC_STYLES = {
+    "national": {"frame": "minipage", "label": False, "full_caption": "Full Sample Unique Provider Count", "year_caption": "Yearly Active Provider Count",
+                 "full_notes": "Counts represent total unique human providers across the panel (based on their most recent observed year).",
+                 "year_notes": "Yearly counts represent active billing providers per year (duplicates dropped per NPI-Year)."},
+    "nys": {"frame": "threeparttable", "label": True, "full_caption": "Full Sample Unique NYS Provider Count", "year_caption": "Yearly Active NYS Provider Count",
+            "full_notes": "Counts represent unique billing providers in New York across the panel.",
+            "year_notes": "Yearly counts represent active billing providers per year in New York."},
+}
+
+REPORT_MODES = ["all", "tables", "heatmaps"]
+
+PORTRAIT_DOC = "\\documentclass[12pt]{article}\n\\usepackage{booktabs}\n\\usepackage{geometry}\n\\usepackage{caption}\n\\geometry{margin=1in}\n\\begin{document}\n\\thispagestyle{empty}\n\\vspace*{2cm}\n"
+LANDSCAPE_DOC = "\\documentclass[12pt, landscape]{article}\n\\usepackage{booktabs}\n\\usepackage{geometry}\n\\usepackage{caption}\n\\usepackage{graphicx}\n\\geometry{margin=1in}\n\\begin{document}\n\\thispagestyle{empty}\n\\vspace*{2cm}\n"
+
+
+# Everything that shapes an output; a change to any of them rebuilds the affected tables
+CODE_FILES = [__file__, csv_ingest.__file__, label_codes.__file__, latex_tables.__file__, heatmap_render.__file__]
+
+
+def default_mode():
+    env_mode = os.environ.get("NP_REPORT_MODE", "").strip().lower()
+    return env_mode if env_mode in REPORT_MODES else "all"
+
+
+def standalone(table_tex, landscape=False, figure=None):
+    # figure: an extra float (heatmap_figure) placed after the table; portrait pages then need graphicx too
+    doc = LANDSCAPE_DOC if landscape else PORTRAIT_DOC
+    if figure:
+        if not landscape: doc = doc.replace("\\usepackage{caption}\n", "\\usepackage{caption}\n\\usepackage{graphicx}\n")
+        table_tex = f"{table_tex}\n{figure}"
+    return doc + f"{table_tex}\n\\end{{document}}"
+
+
+def heatmap_figure(path):
+    # Forward slashes keep Windows paths valid inside \includegraphics
+    return ("\\begin{figure}[htbp]\n    \\centering\n"
+            f"    \\includegraphics[width=\\textwidth,height=0.75\\textheight,keepaspectratio]{{{path.replace(os.sep, '/')}}}\n"
+            "\\end{figure}")
+
+
+# --- 2. TITLE & DICTIONARY ENGINE ---
+def get_clean_title(var_name, desc_dict):
+    is_delta = var_name.startswith("d_")
+    base_var = var_name[2:] if is_delta else var_name
+
+    if base_var in desc_dict:
+        clean, desc = desc_dict[base_var]
+    else:
+        clean = base_var.replace("_", " ").title()
+        desc = f"Variable: {base_var}"
+
+    if is_delta:
+        return f"Change in {clean}", True, f"Outcome represents year-over-year absolute change. Baseline Metric: {desc}"
+    return clean, False, desc
+
+
+# --- 3. LATEX GENERATORS ---
+def generate_group_latex(df, grouping, clean_title, var_name, universal_val, desc):
+    labels, cells = format_block(df, rows=AUTH_LEVELS, cols=grouping["levels"])
+    return latex_table(f"Summary of {tex_escape(clean_title)} {grouping['caption']}", grouping["levels"], emit_rows(labels, cells),
+                       label=f"tab:{var_name}_{grouping['label']}", panel_title=grouping["title"], footer=national_row(universal_val, len(grouping["levels"])),
+                       notes=f"{tex_escape(desc)} {grouping['notes']}")
+
+
+def generate_timeline_latex(df, uni_dict, clean_title, var_name, desc, caption_suffix="", notes_suffix=""):
+    years = list(df.columns)
+    labels, cells = format_block(df)
+    nat_vals = [uni_dict.get(int(y), float("nan")) for y in years]
+    return latex_table(f"Timeline of {tex_escape(clean_title)} by Authority{caption_suffix}", [str(y) for y in years], emit_rows(labels, cells),
+                       label=f"tab:{var_name}_timeline", footer=national_row(nat_vals, len(years)), resize=True,
+                       notes=f"{tex_escape(desc)} Categorization reflects static 2023 status.{notes_suffix}", notes_width="\\textwidth")
+
+
+def generate_fullsample_latex(df, uni_val, clean_title, var_name, desc):
+    by_auth = df.drop_duplicates("np_authority").set_index("np_authority")[["mean_val"]]
+    labels, cells = format_block(by_auth, rows=AUTH_LEVELS)
+    return latex_table(f"Overall {tex_escape(clean_title)} by Authority (2015--2024)", ["Whole Sample Mean"], emit_rows(labels, cells),
+                       label=f"tab:{var_name}_full", footer=national_row(uni_val, 1),
+                       notes=f"{tex_escape(desc)} Full sample aggregate.", notes_width="0.6\\textwidth")
+
+
+def generate_demographic_latex(df, filename, style):
+    # Returns (latex, landscape) for one provider-count CSV, or None if the file is not one of them
+    prefix = "Inpatient" if "inpatient" in filename else "Outpatient ASC"
+    if "auth" in filename: row_col, levels, row_name, title = "np_authority", AUTH_LEVELS, "State NP Authority", "By Authority and Provider Type"
+    elif "own" in filename: row_col, levels, row_name, title = "own_category", OWN_LEVELS, "Hospital Ownership", "By Ownership and Provider Type"
+    elif "gender" in filename: row_col, levels, row_name, title = "is_female", GENDER_LEVELS, "Provider Gender", "By Gender and Provider Type"
+    else: return None
+
+    decode_frame(df)
+    label = f"tab:{filename}" if style["label"] else None
+    if "full" in filename:
+        pv = df.pivot_table(index=row_col, columns='prov_type', values='provider_count', aggfunc='sum', observed=True)
+        labels, cells = format_block(pv, fmt=",")
+        latex = latex_table(f"{style['full_caption']}: {prefix} {title}", list(pv.columns), emit_rows(labels, cells), stub=row_name, label=label,
+                            frame=style["frame"], notes=style["full_notes"], notes_width="0.6\\textwidth")
+        return latex, False
+    if "year" in filename:
+        pv = df.pivot_table(index=['prov_type', row_col], columns='year', values='provider_count', aggfunc='sum', observed=True)
+        landscape = style["frame"] == "threeparttable"
+        latex = latex_table(f"{style['year_caption']}: {prefix} {title}", [str(y) for y in pv.columns], emit_panels(pv, PROV_LEVELS, levels), stub=row_name,
+                            label=label, frame=style["frame"], resize=True, landscape=landscape, notes=style["year_notes"], notes_width="\\textwidth")
+        return latex, True
+    return None
+
+
+# --- 4. ONE SETTING ---
+def run_outcome_setting(cfg, heat_jobs, pdflatex_found=True, tex_batch=None, tex_keep_combined=False, mode="all", heat_output="final", embed_heatmaps=False):
+    base_dir = cfg["base_dir"]
+    csv_dir = os.path.join(base_dir, "tables_csv")
+    tex_dir = os.path.join(base_dir, "tables_tex")
+    pdf_dir = os.path.join(base_dir, "tables_pdf")
+    heat_dir = os.path.join(base_dir, "heatmaps")
+    os.makedirs(tex_dir, exist_ok=True)
+    os.makedirs(pdf_dir, exist_ok=True)
+    os.makedirs(heat_dir, exist_ok=True)
+
+    grouping = GROUPINGS[cfg["grouping"]] if cfg["grouping"] else None
+    with run_profile.stage("read_csv", csv_dir): tables = CsvTables(csv_dir)
+    var_names = tables.var_names([grouping["kind"], "by_auth_year"] if grouping else ["by_auth_year"])
+    tex_pool = TexCompilePool(pdf_dir, batch=tex_batch, keep_combined=tex_keep_combined, fmt_dir=FMT_CACHE)
+    manifest = BuildManifest(os.path.join(base_dir, MANIFEST_NAME), code_files=CODE_FILES)
+    manifest.add_known_hashes(tables.file_hashes)
+    want_tables, want_heat = mode != "heatmaps", mode != "tables"
+    # A non-default output mode is part of the heatmap's identity, so switching modes redraws it
+    heat_tag = [] if heat_output == "final" else [heat_output]
+
+    def embeds(png_out):
+        # Only vector PDFs can go into a table, and only if they exist or are drawn this run
+        return embed_heatmaps and heat_output == "pdf" and pdflatex_found and (want_heat or os.path.exists(png_out))
+
+    def stale(key, inputs, tex_out, png_out, extra, embed=False):
+        # (tables stale, heatmap stale) for one output group; png_out is None when there is no heatmap
+        tables_stale = want_tables and not manifest.is_fresh(key, inputs, tex_out, extra=extra + ["embed"] if embed else extra)
+        heat_stale = want_heat and png_out is not None and not manifest.is_fresh(f"{key}_heatmap", inputs, [png_out], extra=extra + heat_tag)
+        return tables_stale, heat_stale
+
+    for var_name in var_names:
+        clean_title, is_delta, desc = get_clean_title(var_name, cfg["desc_dict"])
+        desc_entry = [clean_title, desc]
+
+        # Universal Dictionaries
+        uni_val = "-"
+        uni_file = tables.path(var_name, "universal")
+        if tables.has(var_name, "universal"):
+            u_df = tables.get(var_name, "universal")
+            if not u_df.empty: uni_val = f"{u_df['mean_val'].iloc[0]:.3f}"
+
+        uni_year_dict = {}
+        uni_yr_file = tables.path(var_name, "universal_by_year")
+        if tables.has(var_name, "universal_by_year"):
+            uy_df = tables.get(var_name, "universal_by_year")
+            uni_year_dict = dict(zip(uy_df['year'], uy_df['mean_val']))
+
+        # --------------------------------------------------
+        # A. AUTHORITY x GROUP TABLE (Full Sample)
+        # --------------------------------------------------
+        if grouping:
+            group_file = tables.path(var_name, grouping["kind"])
+            group_key = f"{var_name}_{cfg['grouping']}"
+            group_png = heatmap_path(heat_dir, f"{group_key}_heatmap.png", heat_output)
+            group_embed = embeds(group_png)
+            group_outputs = [os.path.join(tex_dir, f"{group_key}.tex")]
+            if pdflatex_found: group_outputs.append(os.path.join(pdf_dir, f"{group_key}.pdf"))
+            group_inputs = [group_file, uni_file]
+            tables_stale, heat_stale = stale(group_key, group_inputs, group_outputs, group_png, desc_entry, group_embed) if tables.has(var_name, grouping["kind"]) else (False, False)
+            if tables_stale or heat_stale:
+                with run_profile.stage("pivot_table", group_key):
+                    df_group = tables.get(var_name, grouping["kind"])
+                    pivot_group = df_group.pivot_table(index='np_authority', columns=grouping["column"], values='mean_val', aggfunc='mean', observed=True)
+
+                if heat_stale:
+                    heat_jobs.append(heatmap_job(pivot_group, group_png, clean_title, desc, grouping["title"], "Blues", is_delta, "square", heat_output))
+                    manifest.record(f"{group_key}_heatmap", group_inputs, extra=desc_entry + heat_tag)
+
+                if tables_stale:
+                    with run_profile.stage("latex", group_key, outputs=group_outputs[:1]):
+                        tex_group = generate_group_latex(pivot_group, grouping, clean_title, var_name, uni_val, desc)
+                        write_if_changed(group_outputs[0], tex_group)
+                    if pdflatex_found: tex_pool.submit(group_key, standalone(tex_group, figure=heatmap_figure(group_png) if group_embed else None))
+                    manifest.record(group_key, group_inputs, extra=desc_entry + ["embed"] if group_embed else desc_entry)
+
+        # --------------------------------------------------
+        # B. TIMELINE TABLE (Authority x Year)
+        # --------------------------------------------------
+        time_file = tables.path(var_name, "by_auth_year")
+        time_key = f"{var_name}_timeline"
+        time_png = heatmap_path(heat_dir, cfg["timeline_heatmap"].format(var=var_name), heat_output)
+        time_embed = embeds(time_png)
+        time_outputs = [os.path.join(tex_dir, f"{time_key}.tex")]
+        if pdflatex_found: time_outputs.append(os.path.join(pdf_dir, f"{time_key}.pdf"))
+        time_inputs = [time_file, uni_yr_file]
+        tables_stale, heat_stale = stale(time_key, time_inputs, time_outputs, time_png, desc_entry, time_embed) if tables.has(var_name, "by_auth_year") else (False, False)
+        if tables_stale or heat_stale:
+            with run_profile.stage("pivot_table", time_key):
+                df_time = tables.get(var_name, "by_auth_year")
+                pivot_time = df_time.pivot_table(index='np_authority', columns='year', values='mean_val', aggfunc='mean', observed=True)
+
+            if heat_stale:
+                heat_jobs.append(heatmap_job(pivot_time, time_png, clean_title, desc, "Year", cfg["timeline_cmap"], is_delta, "timeline", heat_output))
+                manifest.record(f"{time_key}_heatmap", time_inputs, extra=desc_entry + heat_tag)
+
+            if tables_stale:
+                with run_profile.stage("latex", time_key, outputs=time_outputs[:1]):
+                    tex_time = generate_timeline_latex(pivot_time, uni_year_dict, clean_title, var_name, desc, cfg["timeline_caption"], cfg["timeline_notes"])
+                    write_if_changed(time_outputs[0], tex_time)
+                if pdflatex_found: tex_pool.submit(time_key, standalone(tex_time, landscape=True, figure=heatmap_figure(time_png) if time_embed else None))
+                manifest.record(time_key, time_inputs, extra=desc_entry + ["embed"] if time_embed else desc_entry)
+
+        # --------------------------------------------------
+        # C. FULL SAMPLE TABLE (Authority only)
+        # --------------------------------------------------
+        full_file = tables.path(var_name, "by_authority")
+        full_key = f"{var_name}_full_sample"
+        full_outputs = [os.path.join(tex_dir, f"{full_key}.tex")]
+        if pdflatex_found: full_outputs.append(os.path.join(pdf_dir, f"{full_key}.pdf"))
+        if cfg["full_sample"] and tables.has(var_name, "by_authority") and stale(full_key, [full_file, uni_file], full_outputs, None, desc_entry)[0]:
+            with run_profile.stage("latex", full_key, outputs=full_outputs[:1]):
+                tex_full = generate_fullsample_latex(tables.get(var_name, "by_authority"), uni_val, clean_title, var_name, desc)
+                write_if_changed(full_outputs[0], tex_full)
+            if pdflatex_found: tex_pool.submit(full_key, standalone(tex_full))
+            manifest.record(full_key, [full_file, uni_file], extra=desc_entry)
+
+    return tex_pool, manifest
+
+
+def run_demographic_setting(cfg, tex_batch=None, tex_keep_combined=False):
+    csv_dir = os.path.join(cfg["base_dir"], "tables_csv")
+    pdf_dir = os.path.join(cfg["base_dir"], "tables_pdf")
+    os.makedirs(pdf_dir, exist_ok=True)
+    tex_pool = TexCompilePool(pdf_dir, batch=tex_batch, keep_combined=tex_keep_combined, combined_name="demographics_appendix", fmt_dir=FMT_CACHE)
+
+    for file in glob.glob(os.path.join(csv_dir, "*.csv")):
+        filename = os.path.basename(file).replace(".csv", "")
+        with run_profile.stage("read_csv", filename): df = pd.read_csv(file)
+        with run_profile.stage("latex", filename): table = generate_demographic_latex(df, filename, DEMOGRAPHIC_STYLES[cfg["demographics"]])
+        if table: tex_pool.submit(filename, standalone(*table))
+    return tex_pool, None
+
+
+# --- 5. MANY SETTINGS, SHARED POOLS ---
+def run_settings(names, pdflatex_found=True, tex_workers=None, tex_batch=None, tex_keep_combined=False, heat_workers=None, mode=None, profile=None,
+                 heat_format=None, embed_heatmaps=False):
+    mode = mode or default_mode()
+    heat_format = heat_format or default_heat_output()
+    if heat_format not in HEAT_OUTPUTS:
+        raise ValueError(f"Unknown heat_format {heat_format!r}; use one of {list(HEAT_OUTPUTS)}.")
+    if embed_heatmaps and heat_format != "pdf":
+        print(f"[WARNING] Heatmaps can only be embedded as PDF (heat_format=\"pdf\"), not {heat_format}; table PDFs stay table-only.")
+    run_profile.start(enabled=profile)
+    print(f"Report engine ready in {time.perf_counter() - _START:.2f}s (mode: {mode}, heatmaps: {heat_format}; plotting libraries load only if heatmaps are drawn).")
+
+    heat_jobs, builds = [], []
+    for name in names:
+        cfg = SETTINGS[name]
+        print(f"--- {name} ---")
+        if "demographics" in cfg:
+            if mode != "heatmaps": builds.append(run_demographic_setting(cfg, tex_batch, tex_keep_combined))
+        else:
+            builds.append(run_outcome_setting(cfg, heat_jobs, pdflatex_found, tex_batch, tex_keep_combined, mode, heat_format, embed_heatmaps))
+
+    # Every heatmap through one render pool, every PDF through one pdflatex thread pool
+    render_heatmaps(heat_jobs, workers=heat_workers)
+    with ThreadPoolExecutor(max_workers=tex_workers or default_tex_workers()) as executor:
+        for tex_pool, manifest in builds:
+            failures = tex_pool.run(executor=executor) if pdflatex_found else []
+            if manifest is None: continue
+            for job_name, _ in failures: manifest.forget(job_name)
+            manifest.save()
+    run_profile.finish(OUTPUT_ROOT)
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    cli_mode = "tables" if "--tables-only" in args else "heatmaps" if "--heatmaps-only" in args else None
+    names = [a for a in args if not a.startswith("--")]
+    cli_heat = next((a.split("=", 1)[1] for a in args if a.startswith("--heat-format=")), None)
+    run_settings(names or list(SETTINGS), mode=cli_mode, profile=True if "--profile" in args else None,
+                 heat_format=cli_heat, embed_heatmaps="--embed-heatmaps" in args)
+    print("=== ALL SUMMARY-STAT REPORTS COMPLETE ===")
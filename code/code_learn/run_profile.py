@@ -0,0 +1,148 @@
+import os
+import sys
+import json
+import time
+import threading
+from contextlib import contextmanager, nullcontext
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Opt-in per-stage instrumentation for the reporting scripts.
+# start() switches it on for one run (NP_PROFILE=1 or profile=True in a
+# script); every read_csv / pivot_table / LaTeX emit / sns.heatmap / savefig /
+# pdflatex step then lands as one record with wall time, CPU time, peak RSS
+# and the bytes it wrote. finish() writes the JSON run report to
+# <out_dir>/run_reports/ and prints stage totals plus the N slowest items.
+# While it is off, stage() hands back one shared no-op context and add()
+# returns immediately, so the hooks cost next to nothing.
+#
+# CPU and RSS are process-wide: items measured on the pdflatex threads only
+# carry wall time and bytes, heatmaps drawn in worker processes report the
+# worker's own CPU. The run totals include CPU used by child processes
+# (pdflatex) where the OS reports it.
+
+_NOOP = nullcontext()
+_profile = None
+
+
+# --- 1. SETTINGS & PROBES ---
+def default_enabled():
+    return os.environ.get("NP_PROFILE", "") == "1"
+
+
+def default_top_n():
+    env_top = os.environ.get("NP_PROFILE_TOP", "")
+    return int(env_top) if env_top.strip().isdigit() else 10
+
+
+def peak_rss_mb():
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024  # bytes on macOS, KiB on Linux
+    if psutil is not None:
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss) / (1024 * 1024)
+    return None
+
+
+def _cpu_with_children():
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+
+def _bytes(outputs):
+    return sum(os.path.getsize(p) for p in outputs if os.path.exists(p))
+
+
+# --- 2. ONE RUN ---
+class RunProfile:
+
+    def __init__(self, name):
+        self.name = name
+        self.started = time.strftime("%Y-%m-%dT%H:%M:%S")
+        self.records = []
+        self._lock = threading.Lock()
+        self._wall0 = time.perf_counter()
+        self._cpu0 = _cpu_with_children()
+
+    def add(self, stage, item, wall, cpu=None, outputs=(), rss_mb=None):
+        record = {"stage": stage, "item": item, "wall": wall, "cpu": cpu, "peak_rss_mb": rss_mb, "bytes": _bytes(outputs) if outputs else 0}
+        with self._lock:
+            self.records.append(record)
+
+    @contextmanager
+    def stage(self, stage, item=None, outputs=()):
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            self.add(stage, item, time.perf_counter() - wall, time.process_time() - cpu, outputs, peak_rss_mb())
+
+    def stage_totals(self):
+        totals = {}
+        for r in self.records:
+            t = totals.setdefault(r["stage"], {"count": 0, "wall": 0.0, "cpu": None, "bytes": 0})
+            t["count"] += 1
+            t["wall"] += r["wall"]
+            if r["cpu"] is not None: t["cpu"] = (t["cpu"] or 0.0) + r["cpu"]
+            t["bytes"] += r["bytes"]
+        return totals
+
+    def report(self):
+        return {"run": self.name, "started": self.started, "argv": sys.argv,
+                "wall_seconds": time.perf_counter() - self._wall0, "cpu_seconds": _cpu_with_children() - self._cpu0,
+                "peak_rss_mb": peak_rss_mb(), "stages": self.stage_totals(), "items": self.records}
+
+    def save(self, out_dir):
+        report_dir = os.path.join(out_dir, "run_reports")
+        os.makedirs(report_dir, exist_ok=True)
+        path = os.path.join(report_dir, f"{self.name}_{time.strftime('%Y%m%d_%H%M%S')}.json")
+        with open(path, 'w') as f: json.dump(self.report(), f, indent=2)
+        return path
+
+    def print_summary(self, top_n):
+        report = self.report()
+        rss = "n/a" if report["peak_rss_mb"] is None else f"{report['peak_rss_mb']:.0f} MB"
+        print(f"\n=== RUN PROFILE: {self.name} ({report['wall_seconds']:.1f}s wall, {report['cpu_seconds']:.1f}s CPU, peak RSS {rss}) ===")
+        for stage, t in sorted(report["stages"].items(), key=lambda kv: -kv[1]["wall"]):
+            cpu = "-" if t["cpu"] is None else f"{t['cpu']:.2f}s"
+            print(f"   {stage:<14} {t['count']:>5} x  {t['wall']:8.2f}s wall  {cpu:>9} CPU  {t['bytes'] / 1024:10.0f} KB out")
+        print(f"Top {top_n} slowest items:")
+        for r in sorted(self.records, key=lambda r: -r["wall"])[:top_n]:
+            print(f"   {r['wall']:7.2f}s  {r['stage']:<14} {r['item']}")
+
+
+# --- 3. MODULE-LEVEL HOOKS (no-ops unless a run was started) ---
+def start(name=None, enabled=None):
+    global _profile
+    enabled = default_enabled() if enabled is None else enabled
+    name = name or os.path.splitext(os.path.basename(sys.argv[0] or "run"))[0]
+    _profile = RunProfile(name) if enabled else None
+    return _profile
+
+
+def stage(stage, item=None, outputs=()):
+    return _NOOP if _profile is None else _profile.stage(stage, item, outputs)
+
+
+def add(stage, item, wall, cpu=None, outputs=(), rss_mb=None):
+    if _profile is not None:
+        _profile.add(stage, item, wall, cpu, outputs, rss_mb)
+
+
+def finish(out_dir, top_n=None):
+    global _profile
+    if _profile is None:
+        return None
+    path = _profile.save(out_dir)
+    _profile.print_summary(top_n or default_top_n())
+    print(f"Run report written to {path}")
+    _profile = None
+    return path
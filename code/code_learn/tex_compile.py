@@ -0,0 +1,308 @@
+import os
+import time
+import shutil
+import hashlib
+import threading
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import run_profile
+
+try:
+    from pypdf import PdfReader, PdfWriter
+except ImportError:
+    PdfReader = PdfWriter = None
+
+# Shared pdflatex scheduler for the table scripts.
+# Standalone documents are queued while the loop runs, then compiled
+# concurrently, each job in its own scratch directory so parallel runs never
+# fight over the same .aux/.log files.
+#
+# Batch mode: jobs that share a preamble are stitched into ONE document (one
+# table per page), compiled with a single pdflatex run and split back into
+# the per-table PDFs (needs pypdf). A batch that fails falls back to
+# compiling its tables one by one, so a bad table is still pinpointed.
+#
+# Preloaded formats: every distinct preamble is dumped once into a .fmt file
+# (mylatexformat) cached in <out_dir>/_fmt_cache, keyed by the preamble text
+# and the pdflatex version. Tables are then compiled against that format, so
+# the packages are not loaded again for every table, nor on later runs while
+# the preamble is unchanged. If a format cannot be built, or a table fails
+# against it, that table is compiled the classic way.
+
+CLUTTER_EXTS = ['.aux', '.log', '.tex']
+FMT_DIR = "_fmt_cache"
+
+_formats = {}  # (fmt_dir, preamble) -> (fmt path or None, "built" / "cached" / "failed"), once per run
+_formats_lock = threading.Lock()
+_tex_version = None
+
+
+# --- 1. SETTINGS ---
+def default_workers():
+    env_workers = os.environ.get("NP_TEX_WORKERS", "")
+    if env_workers.strip().isdigit() and int(env_workers) > 0:
+        return int(env_workers)
+    return max(1, os.cpu_count() or 1)
+
+
+def default_batch():
+    return os.environ.get("NP_TEX_BATCH", "") == "1"
+
+
+def default_preload():
+    return os.environ.get("NP_TEX_FMT", "") != "0"
+
+
+def split_standalone(doc):
+    head, body = doc.split("\\begin{document}", 1)
+    body = body.rsplit("\\end{document}", 1)[0]
+    return head + "\\begin{document}\n", body
+
+
+def _clear_clutter(job_name, out_dir):
+    for ext in CLUTTER_EXTS:
+        stale_file = os.path.join(out_dir, f"{job_name}{ext}")
+        if os.path.exists(stale_file): os.remove(stale_file)
+
+
+def _run_pdflatex(tex_path, build_dir, fmt_path=None):
+    cmd = ['pdflatex', '-interaction=nonstopmode', f'-output-directory={build_dir}', tex_path]
+    try:
+        if fmt_path:
+            # TeX looks for formats in the working directory, so a link next to the job is enough
+            _link_format(fmt_path, build_dir)
+            cmd.insert(1, f"-fmt={os.path.splitext(os.path.basename(fmt_path))[0]}")
+        subprocess.run(cmd, cwd=build_dir if fmt_path else None, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+    except subprocess.CalledProcessError as e:
+        return f"pdflatex exited with status {e.returncode}"
+    except OSError as e:
+        return f"pdflatex could not be started ({e})"
+    return None
+
+
+# --- 2. PRELOADED FORMATS (one per distinct preamble) ---
+def _link_format(fmt_path, build_dir):
+    target = os.path.join(build_dir, os.path.basename(fmt_path))
+    if os.path.exists(target): return
+    try:
+        os.link(fmt_path, target)
+    except OSError:
+        shutil.copyfile(fmt_path, target)
+
+
+def _pdflatex_version():
+    global _tex_version
+    if _tex_version is None:
+        try:
+            out = subprocess.run(['pdflatex', '--version'], capture_output=True, text=True).stdout
+            _tex_version = out.splitlines()[0] if out else ""
+        except OSError:
+            _tex_version = ""
+    return _tex_version
+
+
+def _build_format(preamble, fmt_dir):
+    key = hashlib.sha256((_pdflatex_version() + "\n" + preamble).encode('utf-8')).hexdigest()[:16]
+    fmt_name = f"preamble_{key}"
+    fmt_path = os.path.join(fmt_dir, f"{fmt_name}.fmt")
+    if os.path.exists(fmt_path):
+        return fmt_path, "cached"
+
+    start = time.perf_counter()
+    os.makedirs(fmt_dir, exist_ok=True)
+    build_dir = tempfile.mkdtemp(prefix=f"_build_{fmt_name}_", dir=fmt_dir)
+    with open(os.path.join(build_dir, f"{fmt_name}.tex"), 'w') as f: f.write(preamble + "\\end{document}\n")
+    # mylatexformat dumps everything up to \begin{document}; documents compiled
+    # against the format skip their own preamble up to the same point
+    try:
+        subprocess.run(['pdflatex', '-ini', '-interaction=nonstopmode', f'-jobname={fmt_name}', '&pdflatex', 'mylatexformat.ltx', f'{fmt_name}.tex'],
+                       cwd=build_dir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        os.replace(os.path.join(build_dir, f"{fmt_name}.fmt"), fmt_path)
+        status = "built"
+    except (subprocess.CalledProcessError, OSError):
+        fmt_path, status = None, "failed"
+    shutil.rmtree(build_dir, ignore_errors=True)
+    run_profile.add("pdflatex -ini", fmt_name, time.perf_counter() - start, outputs=[fmt_path] if fmt_path else ())
+    return fmt_path, status
+
+
+def load_format(preamble, fmt_dir):
+    # Built at most once per run per cache folder, even when several pools share it
+    with _formats_lock:
+        key = (fmt_dir, preamble)
+        if key not in _formats:
+            _formats[key] = _build_format(preamble, fmt_dir)
+        return _formats[key]
+
+
+# --- 3. SINGLE JOB ---
+def _compile_one(job_name, standalone_tex, out_dir, keep_tex=False, fmt_path=None):
+    start = time.perf_counter()
+    build_dir = tempfile.mkdtemp(prefix=f"_build_{job_name}_", dir=out_dir)
+    tex_path = os.path.join(build_dir, f"{job_name}.tex")
+    with open(tex_path, 'w') as f: f.write(standalone_tex)
+
+    error = _run_pdflatex(tex_path, build_dir, fmt_path)
+    if error is not None and fmt_path:
+        # Never lose a table to the format: the retry is exactly the old compile
+        error = _run_pdflatex(tex_path, build_dir)
+
+    # Keep whatever PDF TeX managed to produce, exactly like the old in-place compile did
+    pdf_path = os.path.join(build_dir, f"{job_name}.pdf")
+    if os.path.exists(pdf_path):
+        os.replace(pdf_path, os.path.join(out_dir, f"{job_name}.pdf"))
+
+    # On failure, leave the .tex/.log next to the PDFs for debugging
+    if error is not None:
+        for ext in CLUTTER_EXTS:
+            clutter_file = os.path.join(build_dir, f"{job_name}{ext}")
+            if os.path.exists(clutter_file): os.replace(clutter_file, os.path.join(out_dir, f"{job_name}{ext}"))
+    elif not keep_tex:
+        _clear_clutter(job_name, out_dir)
+
+    shutil.rmtree(build_dir, ignore_errors=True)
+    run_profile.add("pdflatex", job_name, time.perf_counter() - start, outputs=[os.path.join(out_dir, f"{job_name}.pdf")])
+    return job_name, error
+
+
+# --- 4. BATCHED JOB (one document per preamble) ---
+def _compile_batch(batch_name, preamble, jobs, out_dir, keep_combined=False, split=True, keep_tex=False, fmt_path=None):
+    start = time.perf_counter()
+    build_dir = tempfile.mkdtemp(prefix=f"_build_{batch_name}_", dir=out_dir)
+    tex_path = os.path.join(build_dir, f"{batch_name}.tex")
+
+    # Every table starts on a fresh page that reports page 1, as in its own PDF.
+    # The shipout counter of that page is written to <batch>.pages for splitting.
+    parts = [preamble, "\\newwrite\\tablepages\n\\immediate\\openout\\tablepages=\\jobname.pages\n"]
+    for job_name, body in jobs:
+        parts.append(f"\\clearpage\n\\setcounter{{page}}{{1}}\n\\write\\tablepages{{{job_name} \\the\\ReadonlyShipoutCounter}}\n{body}\n")
+    parts.append("\\end{document}\n")
+    with open(tex_path, 'w') as f: f.write("".join(parts))
+
+    pdf_path = os.path.join(build_dir, f"{batch_name}.pdf")
+    pages_path = os.path.join(build_dir, f"{batch_name}.pages")
+    if _run_pdflatex(tex_path, build_dir, fmt_path) is not None or not os.path.exists(pdf_path) or not os.path.exists(pages_path):
+        shutil.rmtree(build_dir, ignore_errors=True)
+        return None
+
+    with open(pages_path, 'r') as f:
+        starts = dict(line.split() for line in f if line.strip())
+    if set(starts) != {job_name for job_name, _ in jobs}:
+        shutil.rmtree(build_dir, ignore_errors=True)
+        return None
+
+    if split:
+        reader = PdfReader(pdf_path)
+        n_pages = len(reader.pages)
+        # Shift so the first table starts on page index 0, whatever the counter base
+        order = sorted(jobs, key=lambda job: int(starts[job[0]]))
+        first = int(starts[order[0][0]])
+        bounds = [int(starts[job_name]) - first for job_name, _ in order] + [n_pages]
+        for k, (job_name, _) in enumerate(order):
+            writer = PdfWriter()
+            for page_idx in range(bounds[k], max(bounds[k + 1], bounds[k] + 1)):
+                writer.add_page(reader.pages[page_idx])
+            with open(os.path.join(out_dir, f"{job_name}.pdf"), 'wb') as f: writer.write(f)
+            if not keep_tex: _clear_clutter(job_name, out_dir)
+
+    if keep_combined:
+        os.replace(pdf_path, os.path.join(out_dir, f"{batch_name}.pdf"))
+
+    shutil.rmtree(build_dir, ignore_errors=True)
+    run_profile.add("pdflatex", f"{batch_name} ({len(jobs)} tables)", time.perf_counter() - start,
+                    outputs=[os.path.join(out_dir, f"{job_name}.pdf") for job_name, _ in jobs])
+    return [(job_name, None) for job_name, _ in jobs]
+
+
+# --- 5. COMPILE POOL ---
+class TexCompilePool:
+
+    def __init__(self, out_dir, workers=None, batch=None, keep_combined=False, split=True, combined_name="combined_tables", keep_tex=False,
+                 preload=None, fmt_dir=None):
+        self.out_dir = out_dir
+        self.workers = workers or default_workers()
+        self.batch = default_batch() if batch is None else batch
+        self.keep_combined = keep_combined or not split
+        self.split = split
+        self.combined_name = combined_name
+        self.keep_tex = keep_tex
+        self.preload = default_preload() if preload is None else preload
+        self.fmt_dir = fmt_dir or os.path.join(out_dir, FMT_DIR)
+        self.formats = {}
+        self.jobs = []
+        self.failures = []
+
+    def submit(self, job_name, standalone_tex):
+        self.jobs.append((job_name, standalone_tex))
+
+    def _format_for(self, standalone_tex):
+        return self.formats.get(split_standalone(standalone_tex)[0])
+
+    def _preload_formats(self, executor):
+        preambles = list(dict.fromkeys(split_standalone(doc)[0] for _, doc in self.jobs))
+        loaded = list(executor.map(lambda preamble: load_format(preamble, self.fmt_dir), preambles))
+        self.formats = {preamble: fmt_path for preamble, (fmt_path, _) in zip(preambles, loaded)}
+        counts = {status: sum(s == status for _, s in loaded) for status in ["built", "cached", "failed"]}
+        print(f"LaTeX formats for {len(preambles)} preamble(s): {counts['built']} built, {counts['cached']} from {self.fmt_dir}, {counts['failed']} unavailable.")
+        if counts["failed"]:
+            print("[WARNING] Format dump failed (is mylatexformat installed?); those tables load their packages as before.")
+
+    def _run_batched(self, executor):
+        standalone = dict(self.jobs)
+        groups = {}
+        for job_name, standalone_tex in self.jobs:
+            preamble, body = split_standalone(standalone_tex)
+            groups.setdefault(preamble, []).append((job_name, body))
+
+        batches = []
+        for k, (preamble, jobs) in enumerate(groups.items()):
+            batch_name = self.combined_name if len(groups) == 1 else f"{self.combined_name}_{k + 1}"
+            batches.append((batch_name, preamble, jobs))
+        batch_results = list(executor.map(lambda b: _compile_batch(b[0], b[1], b[2], self.out_dir, self.keep_combined, self.split, self.keep_tex, self.formats.get(b[1])), batches))
+
+        results, retry = [], []
+        for (batch_name, _, jobs), batch_result in zip(batches, batch_results):
+            if batch_result is None:
+                print(f"[WARNING] Batched build {batch_name} failed; compiling its {len(jobs)} tables one by one.")
+                retry += [(job_name, standalone[job_name]) for job_name, _ in jobs]
+            else:
+                results += batch_result
+        results += list(executor.map(lambda job: _compile_one(job[0], job[1], self.out_dir, self.keep_tex, self._format_for(job[1])), retry))
+        return results, len(batches)
+
+    def run(self, executor=None):
+        # executor: an existing thread pool to share across several TexCompilePools
+        if not self.jobs:
+            return []
+        os.makedirs(self.out_dir, exist_ok=True)
+
+        batch = self.batch
+        if batch and self.split and PdfReader is None:
+            print("[WARNING] pypdf is not installed, so batched PDFs cannot be split; compiling tables one by one.")
+            batch = False
+
+        own_executor = executor is None
+        if own_executor: executor = ThreadPoolExecutor(max_workers=self.workers)
+        try:
+            if self.preload: self._preload_formats(executor)
+            if batch:
+                results, n_runs = self._run_batched(executor)
+            else:
+                results = list(executor.map(lambda job: _compile_one(job[0], job[1], self.out_dir, self.keep_tex, self._format_for(job[1])), self.jobs))
+                n_runs = len(self.jobs)
+        finally:
+            if own_executor: executor.shutdown()
+
+        self.failures = [(name, error) for name, error in results if error is not None]
+        n_total = len(self.jobs)
+        self.jobs = []
+
+        mode = f"{n_runs} batched pdflatex run(s)" if batch else (f"{self.workers} pdflatex workers" if own_executor else "the shared pdflatex pool")
+        print(f"Compiled {n_total - len(self.failures)}/{n_total} PDFs with {mode}.")
+        if self.failures:
+            print(f"[WARNING] {len(self.failures)} PDF(s) failed to compile (see .tex/.log in {self.out_dir}):")
+            for name, error in sorted(self.failures):
+                print(f"   -> {name}.tex: {error}")
+        return self.failures
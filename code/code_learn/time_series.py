@@ -0,0 +1,214 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+import run_profile
+from build_manifest import write_if_changed
+from grouping_sets import GroupingSets
+from grouped_stats import DATA_ROOT, OUTPUT_ROOT, dta_columns, _by_value, _authority, _own_category, _prov_type
+from quality_curves import GENDER_COLS, merge_ownership, female_num, grad_decade, _credential_type, _dept, _state
+
+# Year x dimension series for the 06a-06f time-series charts.
+# Each .do file reloads its cleaned panel and runs collapse (mean|sum) var,
+# by(year [dim]) once per variable, per dimension and per subgroup filter
+# (MD_DO / NP / PA / grad decade, or New York / Full Practice). Here the panel
+# is reduced ONCE to its finest cells (grouping_sets: year x every dimension
+# x every filter column, missing kept as its own level) with a non-missing
+# count and a sum per variable; every (filter, dimension) series is then a
+# roll-up of those cells, so nothing goes back to the rows. Like drop if missing(var) |
+# missing(dim) before the collapse, a series only counts rows where both are
+# present; a missing year stays its own point, as collapse by(year) keeps it.
+#
+# Every filter x dimension pair is produced (a superset of the charts each
+# script draws), with both stat types: sum and mean = sum / n. One tidy table
+# per script / setting, written as series_<script>.csv:
+#   filter, dim, level, level_label, year, var, n, sum, mean
+#
+#   python time_series.py               -> every script
+#   python time_series.py 06a 06e       -> just the named script(s)
+#   python time_series.py --profile     -> also write a per-stage run report (run_profile)
+
+# --- 1. DEFINITIONS (mirror the .do files) ---
+HCAHPS_PANEL = os.path.join(os.path.dirname(DATA_ROOT), "outputs_while_cleaning", "cleaned_data", "phase2_hcahps", "hcahps_final_panel.dta")
+
+PROV_OVERLAP_MEANS = ["bene_avg_risk_scre", "partb_em_upcode_rate", "partd_opioid_rate", "partd_opioid_strong_rate", "partd_generic_rate",
+                      "partd_high_cost_rate", "tot_sbmtd_chrg", "tot_pymt_amt", "partd_cst_total", "mips_final_score", "mips_quality_score",
+                      "mips_cost_score", "mips_pi_score"]  # $prov_overlap_means
+HCAHPS_VARS = ["hcahps_100_score", "hcahps_grp1", "hcahps_grp2", "hcahps_grp3", "hcahps_grp4", "h_hosp_rating_9_10", "h_hosp_rating_0_6"]
+IN_FAC_VARS = HCAHPS_VARS + ["hac_total_score", "rrp_excess_ratio_ami", "rrp_excess_ratio_hf", "rrp_excess_ratio_pn", "mortality_rate_ami",
+                             "mortality_rate_hf", "mortality_rate_pn", "mspb_score", "hvbp_tps_score", "fac_mips_final_score", "fac_mips_quality_score",
+                             "fac_mips_pi_score", "fac_mips_ia_score", "fac_mips_cost_score", "hopd_op_8", "hopd_op_10", "hopd_op_13", "hopd_op_18b",
+                             "hopd_op_22", "hopd_op_32", "hopd_op_36"]
+OUT_FAC_VARS = ["oas_100_score", "oas_grp1", "oas_grp2", "oas_grp3", "oas_rating_9_10", "oas_rating_0_6", "asc_rate_1", "asc_rate_2", "asc_rate_8",
+                "fac_mips_final_score", "fac_mips_quality_score", "fac_mips_pi_score", "fac_mips_ia_score", "fac_mips_cost_score"]
+MIPS = ["mips_final_score", "mips_quality_score", "mips_pi_score", "mips_ia_score", "mips_cost_score"]
+# 06c: prov_vars plus $prov_overlap_means, : list uniq
+NYS_PROVIDER_VARS = list(dict.fromkeys(["partd_generic_rate", "partd_opioid_rate", "partb_em_upcode_rate", "bene_avg_risk_scre", "tot_benes", "tot_sbmtd_chrg"]
+                                       + MIPS + ["total_rvu", "total_services", "total_medicare_payment"] + PROV_OVERLAP_MEANS))
+COUNT_VARS = {"count_md": 1, "count_np": 2, "count_pa": 3}  # gen count_md = (prov_type == 1) ...
+
+# forvalues p = 0/7 subsets (folder names), and the 06e/06f comparison benchmarks
+PROVIDER_FILTERS = {"all_providers": None, "MD_DO": ("prov_type", 1), "NP": ("prov_type", 2), "PA": ("prov_type", 3),
+                    "Pre_1990": ("grad_decade", 1), "Grads_1990s": ("grad_decade", 2), "Grads_2000s": ("grad_decade", 3), "Grads_2010s": ("grad_decade", 4)}
+HCAHPS_FILTERS = {"national": None, "new_york": ("state_str", "NY"), "full_practice": ("np_authority", 3)}
+
+LEVEL_LABELS = {
+    "prov_type": {1: "MD/DO", 2: "NP", 3: "PA"},
+    "is_female": {0: "Male", 1: "Female"},
+    "female_num": {0: "Male", 1: "Female"},
+    "is_primary_care": {0: "Specialty/Other", 1: "Primary Care"},
+    "dept_cat": {1: "Specialty", 2: "Gen Med", 3: "Primary Care"},
+    "grad_decade": {1: "Pre-1990", 2: "1990s", 3: "2000s", 4: "2010s+"},
+    "own_category": {1: "Gov", 2: "For-Profit", 3: "Non-Profit"},
+    "np_authority": {1: "Restricted", 2: "Reduced", 3: "Full Practice"},
+    "is_urban": {0: "Rural", 1: "Urban"},
+}
+
+PROVIDER_DATA = {"in_patient": "master_provider_inpatient_2013_2023.dta", "out_patient": "master_provider_outpatient_asc_2015_2023.dta"}
+FACILITY_DATA = {"in_patient": "master_facility_inpatient_2013_2023.dta", "out_patient": "master_facility_outpatient_asc_2015_2024.dta"}
+FACILITY_INPATIENT = FACILITY_DATA["in_patient"]
+
+# taxonomy: which .do file's variable construction the panel gets (see build_panel)
+SERIES = {
+    "06a": {"taxonomy": "06a", "data": PROVIDER_DATA, "out_dir": ["time_series", "provider_analysis"], "filters": PROVIDER_FILTERS,
+            "dims": ["prov_type", "is_female", "is_primary_care", "grad_decade", "own_category", "np_authority"],
+            "vars": {"in_patient": ["partd_generic_rate", "partd_opioid_rate", "partb_em_upcode_rate"] + MIPS + ["bene_avg_risk_scre", "tot_benes", "tot_sbmtd_chrg"],
+                     "out_patient": MIPS + ["tot_benes", "tot_sbmtd_chrg"]}},
+    "06b": {"taxonomy": "facility", "data": FACILITY_DATA, "out_dir": ["time_series", "facility_analysis"], "filters": {"all": None},
+            "dims": ["own_category", "np_authority"], "vars": {"in_patient": IN_FAC_VARS, "out_patient": OUT_FAC_VARS}},
+    "06c": {"taxonomy": "06c", "data": PROVIDER_DATA, "out_dir": ["time_series_nys", "provider_analysis"], "filters": PROVIDER_FILTERS, "ny_only": True,
+            "dims": ["prov_type", "grad_decade", "female_num", "dept_cat", "own_category"],
+            "vars": {s: NYS_PROVIDER_VARS for s in PROVIDER_DATA}},
+    "06d": {"taxonomy": "facility", "data": FACILITY_DATA, "out_dir": ["time_series_nys", "facility_analysis"], "filters": {"all": None}, "ny_only": True,
+            "dims": ["own_category"], "vars": {"in_patient": IN_FAC_VARS, "out_patient": OUT_FAC_VARS}},
+    "06e": {"taxonomy": "hcahps", "data": {"in_patient": HCAHPS_PANEL}, "out_dir": ["time_series", "hcahps_extended"], "filters": HCAHPS_FILTERS,
+            "dims": ["own_category", "np_authority", "is_urban"], "vars": {"in_patient": HCAHPS_VARS}},
+    "06f": {"taxonomy": "hcahps", "data": {"in_patient": HCAHPS_PANEL}, "out_dir": ["time_series_nys", "hcahps_extended"], "filters": HCAHPS_FILTERS,
+            "dims": ["own_category", "is_urban"], "vars": {"in_patient": HCAHPS_VARS}},
+}
+
+
+# --- 2. GROUPING-SETS ENGINE ---
+def rollup(sets, filters, dims, time="year"):
+    # Every (filter, dim) series from the cells: keep if filter, drop if missing(dim), collapse by(year dim)
+    cells, variables, parts = sets.cells, sets.columns, []
+    for fname, flt in filters.items():
+        fmask = np.ones(len(cells), dtype=bool) if flt is None else (cells[flt[0]] == flt[1]).to_numpy()
+        for dim in [None] + list(dims):
+            if flt is not None and dim == flt[0]: continue
+            mask = fmask if dim is None else fmask & cells[dim].notna().to_numpy()
+            if not mask.any(): continue
+            frame, stats = sets.aggregate([time] + ([dim] if dim else []), mask=mask, dropna=False)
+            g_n, g_sum = stats["obs"], stats["sum"]
+            row, col = np.nonzero(g_n > 0)
+            frame = frame.iloc[row].reset_index(drop=True)
+            parts.append(pd.DataFrame({
+                "filter": fname, "dim": dim or "overall",
+                "level": frame[dim].to_numpy("float64") if dim else np.nan,
+                "year": frame[time].to_numpy("float64"),
+                "var": np.array(variables, dtype=object)[col],
+                "n": g_n[row, col].astype("int64"), "sum": g_sum[row, col], "mean": g_sum[row, col] / g_n[row, col]}))
+    if not parts:
+        return pd.DataFrame(columns=["filter", "dim", "level", "level_label", "year", "var", "n", "sum", "mean"])
+    out = pd.concat(parts, ignore_index=True)
+    labels = pd.Series([LEVEL_LABELS.get(d, {}).get(lv, "") if d != "overall" else "" for d, lv in zip(out["dim"], out["level"])], dtype=object)
+    out.insert(3, "level_label", labels.to_numpy())
+    out["level"], out["year"] = out["level"].astype("Int64"), out["year"].astype("Int64")
+    return out
+
+
+# --- 3. PANELS ---
+def _read(path, wanted):
+    available = dta_columns(path)
+    cols = [c for c in available if c in wanted]
+    with run_profile.stage("read_stata", os.path.basename(path)):
+        df = pd.read_stata(path, columns=cols, convert_missing=False, preserve_dtypes=True)
+    print(f"Read {len(df)} rows x {len(cols)} columns from {path}.")
+    return df
+
+
+def _dedupe(df, panels):
+    panel = next((c for c in panels if c in df.columns), None)
+    return df.drop_duplicates([panel, "year"]).reset_index(drop=True) if panel else df
+
+
+def build_panel(cfg, setting):
+    # Cleaned panel for one script / setting: the taxonomy its .do file builds, NYS filter, duplicates drop
+    taxonomy, variables = cfg["taxonomy"], cfg["vars"][setting]
+    path = cfg["data"][setting] if os.path.isabs(cfg["data"][setting]) else os.path.join(DATA_ROOT, cfg["data"][setting])
+    wanted = ["npi", "ccn", "asc_id", "year", "cms_state", "state", "ownership", "credential", "cms_specialty", "grad_year", "RUCA1", "is_urban"]
+    df = _read(path, wanted + GENDER_COLS + variables)
+
+    if taxonomy == "facility":
+        df = _dedupe(df, ["ccn"] if setting == "in_patient" else ["asc_id", "ccn"])
+    state = next((c for c in ("cms_state", "state") if c in df.columns), None)
+    df["state_str"] = _by_value(df[state], _state) if state else ""
+    if cfg.get("ny_only"):
+        df = df[df["state_str"] == "NY"].reset_index(drop=True)
+        print(f"NYS observations kept: {len(df)}")
+    df["np_authority"] = _by_value(df["state_str"], _authority)
+
+    if setting == "in_patient":
+        if taxonomy in ("06a", "06c"): df = merge_ownership(df, FACILITY_INPATIENT)
+        df["own_category"] = _by_value(df["ownership"], _own_category) if "ownership" in df.columns else np.nan
+    else:
+        df["own_category"] = np.nan
+
+    spec = df["cms_specialty"] if "cms_specialty" in df.columns else pd.Series("", index=df.index)
+    if taxonomy == "06a":
+        df["prov_type"] = _by_value(spec, _prov_type)
+        for var, code in COUNT_VARS.items(): df[var] = (df["prov_type"] == code).astype("float64")
+        df["is_female"] = female_num(df, fill_unknown=False)
+        df["is_primary_care"] = _by_value(spec, lambda t: t.str.upper().str.contains("FAMILY PRACTICE|GENERAL PRACTICE|INTERNAL MEDICINE").astype("float64").to_numpy())
+        df["grad_decade"] = grad_decade(df)
+        df = _dedupe(df, ["npi"])
+    elif taxonomy == "06c":
+        df["prov_type"] = _by_value(df["credential"], _credential_type) if "credential" in df.columns else np.nan
+        df["dept_cat"] = _by_value(spec, _dept)
+        df["female_num"] = female_num(df)
+        df["grad_decade"] = grad_decade(df)
+    elif taxonomy == "hcahps":
+        if "is_urban" not in df.columns:
+            # gen is_urban = (RUCA1 <= 3) if !missing(RUCA1); without the RUCA crosswalk the geography series are skipped, as in the .do
+            ruca = df["RUCA1"].to_numpy("float64") if "RUCA1" in df.columns else np.full(len(df), np.nan)
+            df["is_urban"] = np.where(np.isnan(ruca), np.nan, (ruca <= 3).astype("float64"))
+    return df
+
+
+# --- 4. ONE SCRIPT ---
+def series_table(df, cfg, setting):
+    variables = [v for v in cfg["vars"][setting] if v in df.columns]
+    if cfg["taxonomy"] == "06a": variables += list(COUNT_VARS)
+    dims = [d for d in cfg["dims"] if d in df.columns]
+    keys = list(dict.fromkeys(["year"] + dims + [f[0] for f in cfg["filters"].values() if f]))
+    with run_profile.stage("grouping_sets", f"{len(variables)} vars x {len(keys)} keys"):
+        sets = GroupingSets([keys], variables).update(df)
+    with run_profile.stage("rollup", f"{len(sets.cells)} cells"):
+        return rollup(sets, cfg["filters"], dims)
+
+
+def run_series(names, profile=None):
+    run_profile.start(enabled=profile)
+    for name in names:
+        cfg = SERIES[name]
+        for setting in cfg["data"]:
+            df = build_panel(cfg, setting)
+            table = series_table(df, cfg, setting)
+            out_dir = os.path.join(OUTPUT_ROOT, setting, *cfg["out_dir"])
+            os.makedirs(out_dir, exist_ok=True)
+            path = os.path.join(out_dir, f"series_{name}.csv")
+            with run_profile.stage("write_csv", f"series_{name}", outputs=[path]):
+                changed = write_if_changed(path, table.to_csv(index=False, na_rep="", lineterminator="\n"))
+            n_series = len(table.groupby(["filter", "dim", "var"])) if len(table) else 0
+            print(f"[{name} {setting}] {n_series} series, {len(table)} points -> {path}{'' if changed else ' (unchanged)'}.")
+    run_profile.finish(OUTPUT_ROOT)
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    names = [a for a in args if not a.startswith("--")]
+    unknown = [n for n in names if n not in SERIES]
+    if unknown:
+        sys.exit(f"Unknown script(s) {unknown}; choose from {list(SERIES)}.")
+    run_series(names or list(SERIES), profile=True if "--profile" in args else None)